@@ -0,0 +1,102 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+
+class CheckpointStore:
+    """
+    Durable record of in-flight agent runs in a SQLite (WAL) file.
+
+    One row per run holds the last completed state and a JSON snapshot of the
+    run's outputs; each save replaces the row in a single transaction, so a crash
+    leaves either the previous checkpoint or the new one, never a mix.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._cancelled = set()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            "task_id TEXT PRIMARY KEY, state TEXT NOT NULL, prompt TEXT NOT NULL, "
+            "snapshot TEXT NOT NULL, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def save(self, task_id: str, state: str, prompt: str, snapshot: dict):
+        now = time.time()
+        with self._lock, self._db:
+            if task_id in self._cancelled:
+                return
+            self._db.execute(
+                "INSERT INTO checkpoints (task_id, state, prompt, snapshot, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(task_id) DO UPDATE SET state = excluded.state, prompt = excluded.prompt, "
+                "snapshot = excluded.snapshot, updated_at = excluded.updated_at",
+                (task_id, state, prompt, json.dumps(snapshot), now, now)
+            )
+
+    def load(self, task_id: str):
+        """
+        Return {'task_id', 'state', 'prompt', 'snapshot', 'updated_at'} for a run, or None.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT task_id, state, prompt, snapshot, updated_at FROM checkpoints WHERE task_id = ?",
+                (task_id,)
+            ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list_runs(self) -> list[dict]:
+        """All checkpointed runs, oldest first."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT task_id, state, prompt, snapshot, updated_at FROM checkpoints ORDER BY created_at"
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def delete(self, task_id: str):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM checkpoints WHERE task_id = ?", (task_id,))
+
+    def cancel(self, task_id: str):
+        """
+        Delete a run's checkpoint and drop its later saves, so a save still running
+        on a worker thread when the run was cancelled can't bring it back.
+        """
+        with self._lock, self._db:
+            self._cancelled.add(task_id)
+            self._db.execute("DELETE FROM checkpoints WHERE task_id = ?", (task_id,))
+
+    @staticmethod
+    def _to_dict(row) -> dict:
+        return {
+            "task_id": row[0],
+            "state": row[1],
+            "prompt": row[2],
+            "snapshot": json.loads(row[3]),
+            "updated_at": row[4],
+        }
+
+
+_store_instance = None
+_store_lock = threading.Lock()
+
+
+def get_checkpoint_store(checkpoint_config: dict):
+    """Get the process-wide checkpoint store, or None when checkpointing is disabled."""
+    global _store_instance
+    if not checkpoint_config.get('enabled', False):
+        return None
+    with _store_lock:
+        if _store_instance is None:
+            _store_instance = CheckpointStore(checkpoint_config.get('path', 'backend/checkpoints.sqlite3'))
+        return _store_instance
@@ -0,0 +1,203 @@
+import re
+import math
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+# Lines worth keeping when code has to be elided: they describe the file's shape.
+_SIGNATURE_PATTERN = re.compile(
+    r"^\s*(async\s+def|def|class|import|from|function|export|public|private|protected|func|package|module|interface|type)\b"
+)
+
+
+class TokenCounter:
+    """
+    Counts prompt tokens with a Hugging Face tokenizer, or estimates them
+    (~4 characters per token) when no tokenizer is available. The tokenizer may
+    be set later, from another thread, once it has loaded.
+    """
+    def __init__(self, tokenizer=None):
+        self.tokenizer = tokenizer
+
+    @property
+    def exact(self) -> bool:
+        return self.tokenizer is not None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        tokenizer = self.tokenizer
+        if tokenizer is not None:
+            return len(tokenizer.encode(text, add_special_tokens=False).ids)
+        return math.ceil(len(text) / 4)
+
+    def count_many(self, texts: list[str]) -> list[int]:
+        tokenizer = self.tokenizer
+        if tokenizer is not None and texts:
+            return [len(encoding.ids) for encoding in tokenizer.encode_batch(texts, add_special_tokens=False)]
+        return [self.count(text) for text in texts]
+
+
+@dataclass
+class Section:
+    """
+    One variable part of a prompt. shrink(text, max_tokens) must return text that
+    fits the given budget; sections without one are dropped when they don't fit.
+    """
+    name: str
+    text: str
+    shrink: Optional[Callable[[str, int], str]] = None
+
+
+@dataclass
+class PackedPrompt:
+    text: str
+    budget: int
+    total_tokens: int
+    section_tokens: dict = field(default_factory=dict)
+    shrunk: list = field(default_factory=list)
+
+    def summary(self) -> str:
+        parts = ", ".join(f"{name} {tokens}" for name, tokens in self.section_tokens.items())
+        shrunk = f"; trimmed {', '.join(self.shrunk)}" if self.shrunk else ""
+        return f"{parts}{shrunk}"
+
+
+class ContextPacker:
+    """
+    Fills a prompt template under a token budget. Sections are packed in the
+    order given, so put the ones the model needs most first.
+    """
+    def __init__(self, counter: TokenCounter, budget_tokens: int = 3000, comment_max_chars: int = 600,
+                 focus_radius: int = 8, max_snippet_tokens: int = 300):
+        self.counter = counter
+        self.budget_tokens = budget_tokens
+        self.comment_max_chars = comment_max_chars
+        self.focus_radius = focus_radius
+        self.max_snippet_tokens = max_snippet_tokens
+
+    @classmethod
+    def from_config(cls, packing_config: dict) -> "ContextPacker":
+        from ..connectors.resources import get_token_counter
+        return cls(
+            get_token_counter(packing_config.get('tokenizer')),
+            budget_tokens=packing_config.get('budget_tokens', 3000),
+            comment_max_chars=packing_config.get('comment_max_chars', 600),
+            focus_radius=packing_config.get('focus_radius', 8),
+            max_snippet_tokens=packing_config.get('retrieval', {}).get('max_snippet_tokens', 300),
+        )
+
+    def pack(self, template: str, fixed: dict, sections: list[Section]) -> PackedPrompt:
+        empty = {section.name: "" for section in sections}
+        base_tokens = self.counter.count(template.format(**fixed, **empty))
+        remaining = self.budget_tokens - base_tokens
+
+        values, section_tokens, shrunk = {}, {"template": base_tokens}, []
+        for section in sections:
+            text = section.text or ""
+            tokens = self.counter.count(text)
+            if tokens > remaining:
+                text = section.shrink(text, max(remaining, 0)) if section.shrink else ""
+                tokens = self.counter.count(text)
+                shrunk.append(section.name)
+            values[section.name] = text
+            section_tokens[section.name] = tokens
+            remaining -= tokens
+
+        text = template.format(**fixed, **values)
+        return PackedPrompt(
+            text=text,
+            budget=self.budget_tokens,
+            total_tokens=self.budget_tokens - remaining,
+            section_tokens=section_tokens,
+            shrunk=shrunk,
+        )
+
+    def elide_code(self, code: str, max_tokens: int, focus_lines=()) -> str:
+        """
+        Keep the lines around focus_lines (1-based), then signatures and imports,
+        then the rest from the top, replacing everything that doesn't fit with
+        an elision marker.
+        """
+        lines = code.splitlines()
+        focus = set()
+        for line_no in focus_lines:
+            focus.update(range(max(line_no - 1 - self.focus_radius, 0), min(line_no + self.focus_radius, len(lines))))
+
+        def rank(index):
+            if index in focus:
+                return 0
+            return 1 if _SIGNATURE_PATTERN.match(lines[index]) else 2
+
+        costs = self.counter.count_many([line + "\n" for line in lines])
+        marker_cost = self.counter.count("... (999 lines elided)\n")
+        kept, used = set(), 0
+        for index in sorted(range(len(lines)), key=lambda i: (rank(i), i)):
+            # Every kept line may open a new gap that needs a marker.
+            if used + costs[index] + marker_cost > max_tokens:
+                continue
+            kept.add(index)
+            used += costs[index] + marker_cost
+
+        output, gap = [], 0
+        for index, line in enumerate(lines):
+            if index in kept:
+                if gap:
+                    output.append(f"... ({gap} lines elided)")
+                    gap = 0
+                output.append(line)
+            else:
+                gap += 1
+        if gap:
+            output.append(f"... ({gap} lines elided)")
+        return "\n".join(output)
+
+    def format_comments(self, comments: list[dict]) -> str:
+        """One entry per distinct comment, with its location, each capped at comment_max_chars."""
+        seen, entries = set(), []
+        for comment in comments:
+            body = (comment.get('body') or "").strip()
+            normalized = " ".join(body.lower().split())
+            if not normalized or normalized in seen:
+                continue
+            seen.add(normalized)
+            if len(body) > self.comment_max_chars:
+                body = body[:self.comment_max_chars].rstrip() + " ..."
+            line = comment.get('line') or comment.get('original_line')
+            location = f"{comment['path']}:{line}" if comment.get('path') and line else comment.get('path')
+            entries.append(f"- [{location}] {body}" if location else f"- {body}")
+        return "\n".join(entries)
+
+    def trim_lines(self, text: str, max_tokens: int) -> str:
+        """Keep whole leading lines that fit, noting how many were dropped."""
+        lines = text.splitlines()
+        costs = self.counter.count_many([line + "\n" for line in lines])
+        note_cost = self.counter.count("(999 more omitted)")
+        kept, used = [], 0
+        for line, cost in zip(lines, costs):
+            if used + cost + note_cost > max_tokens:
+                break
+            kept.append(line)
+            used += cost
+        if len(kept) < len(lines):
+            kept.append(f"({len(lines) - len(kept)} more omitted)")
+        return "\n".join(kept)
+
+    def format_snippets(self, snippets: list[str], exclude: str = "") -> str:
+        """Distinct retrieved snippets that aren't already part of the prompt."""
+        seen, blocks = set(), []
+        for snippet in snippets:
+            snippet = snippet.strip()
+            if not snippet or snippet in seen or (exclude and snippet in exclude):
+                continue
+            seen.add(snippet)
+            if self.counter.count(snippet) > self.max_snippet_tokens:
+                snippet = self.elide_code(snippet, self.max_snippet_tokens)
+            blocks.append(snippet)
+        return "\n\n---\n\n".join(blocks)
+
+    def trim_snippets(self, text: str, max_tokens: int) -> str:
+        """Drop whole snippets from the end until the rest fits."""
+        blocks = text.split("\n\n---\n\n") if text else []
+        while blocks and self.counter.count("\n\n---\n\n".join(blocks)) > max_tokens:
+            blocks.pop()
+        return "\n\n---\n\n".join(blocks)
@@ -1,30 +1,57 @@
+import logging
 import time
 import os
 import uuid
+import shutil
+import asyncio
 from dotenv import load_dotenv
 from .state_machine import AgentState, AgentStateMachine
+from .plan_parser import PlanItem, extract_file_paths, extract_interfaces, extract_work_items, is_test_path
+from .test_reconciler import unresolved_names
+from .test_runner import TestReport, TestRunner, broken_test_file, failure_comments, file_durations
+from .patcher import apply_blocks, closest_region, parse_edit_blocks, splice_region, strip_code_fence
+from .context_packer import ContextPacker, Section
 from ..connectors.llm_connector import LlamaConnector
 from ..connectors.docker_connector import DockerConnector
 from ..connectors.git_connector import GitConnector
 from ..connectors.github_connector import GithubConnector
-from ..config.config_loader import (
-    get_config, get_agent_config, get_git_config, get_file_paths,
-    get_language_config, get_prompt_template, get_status_message
-)
+from ..connectors.async_executor import AsyncConnectorFacade, get_executor
+from ..config.config_loader import get_config
+from ..observability.logs import new_trace_id, set_trace_id
+from ..observability.metrics import RUNS, STATE_DURATION, observe_duration
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 
 class MomentumAgent:
-    def __init__(self, websocket_manager=None):
+    def __init__(self, websocket_manager=None, task_id: str = None, review_waiter=None, checkpoint_store=None):
+        # One config snapshot per run, so a hot reload never changes a run midway.
+        self.config = get_config().snapshot()
         self.state_machine = AgentStateMachine()
         self.websocket_manager = websocket_manager
+        self.review_waiter = review_waiter
+        self.checkpoint_store = checkpoint_store
+        self.task_id = task_id or uuid.uuid4().hex
+        self.trace_id = new_trace_id()  # tags this run's logs and events, across parking and restarts
         self.workspace_dir = None
         self.plan = ""
         self.feature_branch = ""
         self.pull_request_info = {}
         self.review_comments = []
+        self.seen_comment_ids = set()
+        self.written_files = set()
+        self.file_contents = {}
+        self.code_files = []  # source files generated from the plan; the first is the one tested
+        self.speculative_test = ""  # test written from the plan while the code was being generated
+        self.failing_tests = []  # test names that failed on the last run; run first next time
+        self.test_durations = {}  # seconds per test file, for balancing shards
+        self.test_regenerations = 0  # times the test file was rewritten because it failed to load
         self.fix_attempts = 0
-        self.max_fix_attempts = get_agent_config()['max_fix_attempts']
+        self.max_fix_attempts = self.config.get_section('agent')['max_fix_attempts']
+        self.context_packer = ContextPacker.from_config(self.config.get_section('context_packing'))
+        self.vector_db = None  # created on first retrieval, only when enabled
+        self.worktree_indexed = False
 
         try:
             self.llm_connector = LlamaConnector()
@@ -34,226 +61,839 @@ class MomentumAgent:
             if not repo_url:
                 raise ValueError("GIT_REPO_URL must be set in .env")
             self.git_connector = GitConnector(repo_url=repo_url)
+            # Blocking git/docker/GitHub calls run on bounded pools, off the event loop.
+            self.connectors = AsyncConnectorFacade(
+                git=self.git_connector,
+                docker=self.docker_connector,
+                github=self.github_connector
+            )
         except Exception as e:
-            print(f"Error initializing connectors: {e}")
+            logger.error(f"Error initializing connectors: {e}")
             self.state_machine.set_state(AgentState.ERROR)
             if self.websocket_manager:
                 # Note: Cannot use await in __init__, will broadcast error during first run
-                print("Error will be broadcast during agent run")
+                logger.debug("Error will be broadcast during agent run")
 
-    async def broadcast_status(self, state: str, message: str):
+    async def broadcast_status(self, state: str, message: str, event_type: str = "status", file_path: str = None):
         if self.websocket_manager:
-            payload = {"state": state, "message": message}
+            payload = {"task_id": self.task_id, "trace_id": self.trace_id, "type": event_type, "state": state, "message": message}
+            if file_path:
+                payload["file"] = file_path
             await self.websocket_manager.broadcast(payload)
 
-    async def run(self, user_prompt: str):
-        curr_state = self.state_machine.get_state()
-        print(f"Starting agent run from state: {curr_state}")
+    def token_streamer(self, state_name: str, file_path: str = None):
+        """
+        Build an on_token callback that forwards streamed LLM tokens to the UI.
+        Tokens of concurrent generations are told apart by file_path.
+        """
+        async def on_token(token: str):
+            await self.broadcast_status(state_name, token, event_type="token", file_path=file_path)
+        return on_token
+
+    def output_streamer(self, state_name: str):
+        """
+        Build an on_output callback for sandbox commands. It is called from a docker
+        pool thread, so chunks are handed to the event loop rather than awaited.
+        """
+        loop = asyncio.get_running_loop()
+
+        def on_output(chunk: str):
+            asyncio.run_coroutine_threadsafe(self.broadcast_status(state_name, chunk, event_type="output"), loop)
+        return on_output
+
+    async def write_workspace_file(self, file_path: str, content: str):
+        """
+        Write a file into the sandbox and remember it so only agent-written paths are committed.
+        """
+        await self.connectors.docker.write_file_to_container(file_path, content)
+        self.written_files.add(file_path)
+        self.file_contents[file_path] = content
+
+    async def write_workspace_files(self, files: dict):
+        """
+        Write several files into the sandbox in one batch and remember them.
+        """
+        await self.connectors.docker.write_files_to_container(files)
+        self.written_files.update(files)
+        self.file_contents.update(files)
+
+    def snapshot(self) -> dict:
+        """
+        Everything needed to continue the run in another process.
+        Generated files are included because the sandbox does not survive a restart.
+        """
+        return {
+            "plan": self.plan,
+            "feature_branch": self.feature_branch,
+            "pull_request_info": self.pull_request_info,
+            "review_comments": self.review_comments,
+            "seen_comment_ids": sorted(self.seen_comment_ids),
+            "file_contents": self.file_contents,
+            "code_files": self.code_files,
+            "speculative_test": self.speculative_test,
+            "failing_tests": self.failing_tests,
+            "test_durations": self.test_durations,
+            "test_regenerations": self.test_regenerations,
+            "fix_attempts": self.fix_attempts,
+            "workspace_dir": self.workspace_dir,
+            "trace_id": self.trace_id,
+        }
+
+    @classmethod
+    def from_checkpoint(cls, checkpoint: dict, websocket_manager=None, review_waiter=None, checkpoint_store=None):
+        agent = cls(websocket_manager, checkpoint['task_id'], review_waiter, checkpoint_store)
+        snapshot = checkpoint['snapshot']
+        agent.plan = snapshot['plan']
+        agent.feature_branch = snapshot['feature_branch']
+        agent.pull_request_info = snapshot['pull_request_info']
+        agent.review_comments = snapshot['review_comments']
+        agent.seen_comment_ids = set(snapshot['seen_comment_ids'])
+        agent.file_contents = snapshot['file_contents']
+        agent.written_files = set(agent.file_contents)
+        agent.code_files = snapshot.get('code_files', [])
+        agent.speculative_test = snapshot.get('speculative_test', "")
+        agent.failing_tests = snapshot.get('failing_tests', [])
+        agent.test_durations = snapshot.get('test_durations', {})
+        agent.test_regenerations = snapshot.get('test_regenerations', 0)
+        agent.fix_attempts = snapshot['fix_attempts']
+        agent.trace_id = snapshot.get('trace_id', agent.trace_id)
+        # The previous process's worktree is stale; free the disk it holds.
+        if snapshot.get('workspace_dir'):
+            shutil.rmtree(snapshot['workspace_dir'], ignore_errors=True)
+        if agent.state_machine.get_state() != AgentState.ERROR:
+            agent.state_machine.set_state(AgentState[checkpoint['state']])
+        return agent
+
+    async def save_checkpoint(self, prompt: str):
+        if self.checkpoint_store is not None:
+            state = self.state_machine.get_state().name
+            await asyncio.to_thread(self.checkpoint_store.save, self.task_id, state, prompt, self.snapshot())
+
+    async def clear_checkpoint(self):
+        if self.checkpoint_store is not None:
+            await asyncio.to_thread(self.checkpoint_store.delete, self.task_id)
+
+    async def cleanup(self):
+        """
+        Release the run's container and temporary clone.
+        """
+        docker_connector = getattr(self, 'docker_connector', None)
+        if docker_connector and docker_connector.container:
+            await self.connectors.docker.stop_and_remove_container()
+        if self.workspace_dir:
+            await self.connectors.git.cleanup()
+            self.workspace_dir = None
+            self.worktree_indexed = False
 
-        while curr_state not in [AgentState.DONE, AgentState.ERROR]:
-            try:
-                await self.execute_state(curr_state, user_prompt)
-            except Exception as e:
-                print(f"An error occured in state {curr_state.name}: {e}")
-                await self.broadcast_status("ERROR", get_status_message('general', 'error').format(state=curr_state.name, error=e))
-                self.state_machine.set_state(AgentState.ERROR)
+    def _language_config(self, file_path: str):
+        return self.config.language_for_extension(os.path.splitext(file_path)[1])
 
-            curr_state = self.state_machine.get_state()
-        
-        print(f"Agent run finished with state: {curr_state.name}")
-        await self.broadcast_status("DONE", get_status_message('general', 'workflow_complete'))
+    @property
+    def primary_code_file(self) -> str:
+        return self.code_files[0] if self.code_files else self.config.get_section('file_system')['default_code_file']
 
+    def _plan_paths(self) -> list[str]:
+        return extract_file_paths(self.plan, self.config.extensions)
+
+    async def ensure_worktree(self):
+        """
+        Recreate the feature branch worktree after the run was parked or restored from a checkpoint.
+        """
         if self.workspace_dir:
-            self.git_connector.cleanup()
+            return
+        if self.pull_request_info:
+            self.workspace_dir = await self.connectors.git.checkout_branch(self.feature_branch)
+        else:
+            # Nothing was pushed yet, so start a fresh branch; the generated files are rewritten below.
+            self.workspace_dir = await self.connectors.git.clone_repo()
+            self.feature_branch = f"{self.config.get_section('git')['branch_prefix']}{uuid.uuid4().hex[:6]}"
+            if self.workspace_dir and not await self.connectors.git.create_branch(self.feature_branch):
+                raise Exception(f"Failed to create branch {self.feature_branch}")
+        if not self.workspace_dir:
+            raise Exception(f"Failed to check out a worktree for {self.feature_branch}")
+        await self.connectors.git.add_sparse_paths(self._plan_paths())
+
+    async def ensure_workspace(self):
+        """
+        Make sure the run has its worktree and a sandbox holding every file it has written.
+        """
+        await self.ensure_worktree()
         if self.docker_connector.container:
-            self.docker_connector.stop_and_remove_container()
-        
+            return
+        language_config = self._language_config(self.primary_code_file)
+        image = await self.connectors.docker.resolve_image(self.workspace_dir, language_config)
+        await self.connectors.docker.start_container(self.workspace_dir, image=image)
+        await self.connectors.docker.write_files_to_container(self.file_contents)
+
+    def _plan_work_items(self) -> list[PlanItem]:
+        """
+        The source files to generate, one per file the plan names (capped at
+        agent.code_generation.max_files), or the default code file.
+        """
+        max_files = self.config.get_section('agent').get('code_generation', {}).get('max_files', 8)
+        work_items = extract_work_items(self.plan, self.config.extensions)[:max_files]
+        return work_items or [PlanItem(self.config.get_section('file_system')['default_code_file'], [self.plan])]
+
+    def _read_worktree_files(self, paths: list) -> dict:
+        """Current contents of the given files in the run's worktree; missing files are left out."""
+        contents = {}
+        for path in paths:
+            target = os.path.join(self.workspace_dir, *path.split('/'))
+            if os.path.isfile(target):
+                with open(target, encoding='utf-8', errors='replace') as file:
+                    contents[path] = file.read()
+        return contents
+
+    async def generate_file(self, state_name: str, item: PlanItem, work_items: list, semaphore: asyncio.Semaphore) -> str:
+        """
+        Generate one planned file. Siblings are named in the prompt so imports line up.
+        Files that already exist are edited rather than rewritten.
+        """
+        language_config = self._language_config(item.path)
+        other_files = [other.path for other in work_items if other.path != item.path]
+        if item.existing is not None:
+            return await self.modify_file(state_name, item, other_files, semaphore)
+        prompt = self.config.prompt('code_generation')['template'].format(
+            language=language_config['name'].title() if language_config else "Python",
+            plan=self.plan,
+            file_path=item.path,
+            steps="\n\n".join(item.steps),
+            other_files="\n".join(f"- {path}" for path in other_files) or "(none)",
+        )
+        async with semaphore:
+            await self.broadcast_status(state_name, self.config.status_message('code_generation', 'asking_llm').format(
+                file_path=item.path
+            ))
+            generated_code = await self.llm_connector.generate_text(
+                prompt, on_token=self.token_streamer(state_name, file_path=item.path), prompt_type='code_generation'
+            )
+        if not generated_code:
+            raise Exception(f"LLM failed to generate production code for {item.path}.")
+        return generated_code
+
+    async def modify_file(self, state_name: str, item: PlanItem, other_files: list, semaphore: asyncio.Semaphore) -> str:
+        """
+        Apply the plan to an existing file through search/replace edits, so code the
+        plan doesn't touch is kept as it is.
+        """
+        language_config = self._language_config(item.path)
+        steps = "\n\n".join(item.steps)
+        packer = self.context_packer
+        async with semaphore:
+            prompt = await self.pack_prompt(state_name, 'code_modification', {
+                'language': language_config['name'].title() if language_config else "code",
+                'markdown_lang': language_config['markdown_lang'] if language_config else "",
+                'file_path': item.path,
+                'other_files': "\n".join(f"- {path}" for path in other_files) or "(none)",
+            }, [
+                Section('steps', steps, packer.trim_lines),
+                Section('original_code', item.existing, packer.elide_code),
+                Section('plan', self.plan, packer.trim_lines),
+            ])
+            await self.broadcast_status(state_name, self.config.status_message('code_generation', 'modifying_file').format(
+                file_path=item.path
+            ))
+            response = await self.llm_connector.generate_text(
+                prompt, on_token=self.token_streamer(state_name, file_path=item.path), prompt_type='code_modification'
+            )
+        blocks = [block for block in parse_edit_blocks(response, item.path)
+                  if (block.path[2:] if block.path.startswith('./') else block.path) == item.path]
+        content, applied, _ = await self.apply_file_edits(state_name, item.path, item.existing, blocks, steps)
+        if not applied:
+            raise Exception(f"LLM produced no applicable edits for {item.path}.")
+        return content
+
+    def _test_language(self, file_path: str):
+        """(language name, test framework, markdown language, test command) for a source file."""
+        language_config = self._language_config(file_path)
+        if language_config:
+            return (language_config['name'].title(), language_config['test_framework'],
+                    language_config['markdown_lang'], language_config['test_command'])
+        return 'the specified language', 'a common testing framework', '', "pytest"  # default fallback
+
+    async def generate_test_file(self, state_name: str):
+        """
+        Write the test file for the primary code file: the speculative one when it
+        reconciles with the code, otherwise one generated from the code.
+        """
+        file_path = self.primary_code_file
+        code_to_test = await self.connectors.docker.read_file_from_container(file_path)
+
+        if not code_to_test:
+            raise Exception(f"Could not read file {file_path} to generate tests.")
+
+        language_name, test_framework, markdown_lang, _ = self._test_language(file_path)
+
+        generated_test = None
+        try:
+            speculative_test = await self.state_machine.join_substep('speculative_tests', default=self.speculative_test)
+        except Exception as e:
+            await self.broadcast_status(state_name, self.config.status_message('testing', 'speculative_failed').format(error=e))
+            speculative_test = ""
+        if speculative_test:
+            generated_test = await self.reconcile_speculative_test(state_name, speculative_test, code_to_test)
+        self.speculative_test = ""
+
+        if not generated_test:
+            packer = self.context_packer
+            snippets = await self.related_snippets(code_to_test, exclude=code_to_test)
+            test_gen_prompt = await self.pack_prompt(state_name, 'test_generation', {
+                'language': language_name,
+                'test_framework': test_framework,
+                'markdown_lang': markdown_lang,
+            }, [
+                Section('code', code_to_test, lambda text, max_tokens: packer.elide_code(text, max_tokens)),
+                Section('context', snippets, packer.trim_snippets),
+            ])
+
+            await self.broadcast_status(state_name, self.config.status_message('testing', 'asking_llm').format(test_framework=test_framework))
+            generated_test = await self.llm_connector.generate_text(
+                test_gen_prompt, on_token=self.token_streamer(state_name), prompt_type='test_generation'
+            )
+
+        if not generated_test:
+            raise Exception("LLM failed to generate test code.")
+
+        test_path = self.config.get_section('file_system')['default_test_file']
+        await self.broadcast_status(state_name, self.config.status_message('testing', 'writing_test').format(test_path=test_path))
+        await self.write_workspace_file(test_path, generated_test)
+
+    async def run_tests(self, state_name: str) -> TestReport:
+        """
+        Run the workspace's tests: sharded with JUnit results when the language has a
+        test_runner, otherwise its plain test_command with only the output tail kept.
+        """
+        test_path = self.config.get_section('file_system')['default_test_file']
+        language_config = self._language_config(self.primary_code_file) or {}
+        _, test_framework, _, test_command = self._test_language(self.primary_code_file)
+        runner_config = self.config.get_section('test_runner')
+        runner = TestRunner(self.connectors.docker, language_config, runner_config, on_output=self.output_streamer(state_name))
+
+        if not runner_config.get('enabled', True) or not runner.supported:
+            await self.broadcast_status(state_name, self.config.status_message('testing', 'running_tests').format(test_framework=test_framework))
+            exit_code, output = await self.connectors.docker.run_command(test_command, on_output=self.output_streamer(state_name))
+            return TestReport(exit_code=exit_code, output=output, structured=False)
+
+        test_files = await runner.discover()
+        if test_path not in test_files:
+            test_files.append(test_path)
+        if self.failing_tests:
+            await self.broadcast_status(state_name, self.config.status_message('testing', 'rerunning_failures').format(
+                count=len(self.failing_tests)
+            ))
+        await self.broadcast_status(state_name, self.config.status_message('testing', 'running_tests').format(test_framework=test_framework))
+        report = await runner.run(test_files, self.failing_tests, self.test_durations)
+        self.test_durations.update(file_durations(report.cases))
+        return report
+
+    async def generate_speculative_test(self, item: PlanItem) -> str:
+        """
+        Write the test file from the plan alone, so it can run concurrently with
+        code generation. TESTING reconciles it with the real code.
+        """
+        state_name = AgentState.TESTING.name
+        test_path = self.config.get_section('file_system')['default_test_file']
+        language_name, test_framework, markdown_lang, _ = self._test_language(item.path)
+        interfaces = extract_interfaces(self.plan)
+        prompt = self.config.prompt('speculative_test_generation')['template'].format(
+            language=language_name,
+            test_framework=test_framework,
+            markdown_lang=markdown_lang,
+            file_path=item.path,
+            plan=self.plan,
+            steps="\n\n".join(item.steps),
+            interfaces="\n".join(interfaces) or "(none declared)",
+        )
+        await self.broadcast_status(state_name, self.config.status_message('testing', 'speculative_started').format(
+            test_framework=test_framework
+        ))
+        self.speculative_test = await self.llm_connector.generate_text(
+            prompt, on_token=self.token_streamer(state_name, file_path=test_path), prompt_type='speculative_test_generation'
+        )
+        return self.speculative_test
+
+    async def reconcile_speculative_test(self, state_name: str, test_code: str, code_to_test: str) -> str:
+        """
+        Check a speculative test against the generated code. Python tests whose imports
+        all resolve are kept without another LLM call; otherwise the model either
+        confirms the test ("OK") or returns a corrected one.
+        """
+        code_files = {path: self.file_contents.get(path, "") for path in self.code_files}
+        code_files[self.primary_code_file] = code_to_test
+        missing = unresolved_names(test_code, code_files)
+        if missing == []:
+            await self.broadcast_status(state_name, self.config.status_message('testing', 'speculative_kept'))
+            return test_code
+
+        await self.broadcast_status(state_name, self.config.status_message('testing', 'reconciling').format(
+            names=", ".join(missing) if missing else "unchecked"
+        ))
+        language_name, test_framework, markdown_lang, _ = self._test_language(self.primary_code_file)
+        packer = self.context_packer
+        prompt = await self.pack_prompt(state_name, 'test_reconciliation', {
+            'language': language_name,
+            'test_framework': test_framework,
+            'markdown_lang': markdown_lang,
+            'missing': "\n".join(f"- {name}" for name in missing or []) or "(not checked)",
+        }, [
+            Section('test', test_code),
+            Section('code', code_to_test, lambda text, max_tokens: packer.elide_code(text, max_tokens)),
+        ])
+        reconciled = await self.llm_connector.generate_text(
+            prompt, on_token=self.token_streamer(state_name), prompt_type='test_reconciliation', temperature=0
+        )
+        if reconciled.strip().upper() == "OK":
+            await self.broadcast_status(state_name, self.config.status_message('testing', 'speculative_kept'))
+            return test_code
+        return reconciled
+
+    def _fix_targets(self) -> dict:
+        """
+        Group the feedback by the file it should be fixed in: the file a comment is
+        on, when this run wrote it, otherwise the primary code file. Before the PR
+        exists the feedback is failing tests, which go to the code; fix_file shows
+        the test file alongside it so a wrong test can be fixed instead.
+        """
+        targets = {}
+        for comment in self.review_comments:
+            path = comment.get('path')
+            if not path or path not in self.written_files or (not self.pull_request_info and is_test_path(path)):
+                path = self.primary_code_file
+            targets.setdefault(path, []).append(comment)
+        return targets
+
+    async def fix_file(self, state_name: str, target_file: str, comments: list) -> dict:
+        """Fix one file for the feedback aimed at it. Returns the updated files."""
+        language_config = self._language_config(target_file)
+        language_name = language_config['name'].title() if language_config else "code"
+        markdown_lang = language_config['markdown_lang'] if language_config else ""
+
+        await self.broadcast_status(state_name, self.config.status_message('fixing', 'reading_code').format(file=target_file))
+        original_code = await self.connectors.docker.read_file_from_container(target_file)
+
+        if not original_code:
+            raise Exception(f"Could not read the file {target_file} to apply fixes.")
+
+        packer = self.context_packer
+        combined_feedback = packer.format_comments(comments)
+        focus_lines = [
+            comment.get('line') or comment.get('original_line') for comment in comments
+            if comment.get('path') == target_file and (comment.get('line') or comment.get('original_line'))
+        ]
+        snippets = await self.related_snippets(combined_feedback, exclude=original_code)
+        fixed = {'language': language_name, 'markdown_lang': markdown_lang, 'file_path': target_file}
+        diff_mode = self.config.get_section('agent').get('fixing', {}).get('mode', 'diff') == 'diff'
+        # Failing tests this run wrote may be wrong themselves, so they are shown and
+        # editable too. Only edit blocks can touch a second file.
+        test_file = next((comment['path'] for comment in comments if comment.get('path') != target_file
+                          and comment.get('path') in self.written_files and is_test_path(comment['path'])), None)
+        test_code = await self.connectors.docker.read_file_from_container(test_file) if test_file else ""
+        diff_mode = diff_mode or bool(test_code)
+        if not diff_mode:
+            # A rewrite replaces the whole file, so it must see the whole file; elided
+            # lines would be deleted. Files too large for that are fixed with edits.
+            template = self.config.prompt('code_fixing')['template']
+            whole_file = template.format(**fixed, original_code=original_code, feedback="", context="")
+            if packer.counter.count(whole_file) > packer.budget_tokens:
+                diff_mode = True
+                await self.broadcast_status(state_name, self.config.status_message('fixing', 'rewrite_too_large').format(
+                    file=target_file
+                ))
+        if diff_mode:
+            tests_template = self.config.prompt('code_fixing_diff')['tests']
+            test_focus = [comment.get('line') for comment in comments if comment.get('path') == test_file and comment.get('line')]
+
+            def tests_section(code: str) -> str:
+                return tests_template.format(test_path=test_file, markdown_lang=markdown_lang, test_code=code) if code else ""
+
+            def shrink_tests(text: str, max_tokens: int) -> str:
+                overhead = packer.counter.count(tests_section(" "))
+                return tests_section(packer.elide_code(test_code, max_tokens - overhead, test_focus)) if max_tokens > overhead else ""
+
+            sections = [
+                Section('feedback', combined_feedback, packer.trim_lines),
+                Section('original_code', original_code,
+                        lambda text, max_tokens: packer.elide_code(text, max_tokens, focus_lines)),
+                Section('tests', tests_section(test_code), shrink_tests),
+                Section('context', snippets, packer.trim_snippets),
+            ]
+        else:
+            sections = [
+                Section('original_code', original_code),  # packed first and known to fit, never shrunk
+                Section('feedback', combined_feedback, packer.trim_lines),
+                Section('context', snippets, packer.trim_snippets),
+            ]
+        fixer_prompt = await self.pack_prompt(state_name, 'code_fixing_diff' if diff_mode else 'code_fixing', fixed, sections)
+
+        await self.broadcast_status(state_name, self.config.status_message('fixing', 'asking_llm'))
+        corrected_code = await self.llm_connector.generate_text(
+            fixer_prompt, on_token=self.token_streamer(state_name, file_path=target_file),
+            prompt_type='code_fixing_diff' if diff_mode else 'code_fixing', temperature=0
+        )
+
+        if not corrected_code:
+            raise Exception("LLM failed to generate a corrected version of the code.")
+
+        await self.broadcast_status(state_name, self.config.status_message('fixing', 'applying_fixes'))
+        if diff_mode:
+            updated_files = await self.apply_fix_edits(state_name, target_file, original_code, corrected_code, combined_feedback)
+        else:
+            updated_files = {target_file: corrected_code}
+        return updated_files
+
+    async def apply_fix_edits(self, state_name: str, target_file: str, original_code: str,
+                              response: str, feedback: str) -> dict:
+        """
+        Apply the search/replace edits (or unified diff) from a fixing response to the
+        files this run wrote. An edit that doesn't match even fuzzily gets only its
+        region regenerated. Returns the updated files.
+        """
+        blocks = parse_edit_blocks(response, target_file)
+        if not blocks:
+            raise Exception("LLM response contained no edits to apply.")
+
+        updated, applied, failed = {}, 0, 0
+        for block in blocks:
+            block.path = block.path[2:] if block.path.startswith('./') else block.path
+        paths = list(dict.fromkeys(block.path for block in blocks))
+        current = await self.connectors.docker.read_files_from_container(
+            [path for path in paths if path != target_file and path in self.written_files]
+        )
+        current[target_file] = original_code
+        for path in paths:
+            file_blocks = [block for block in blocks if block.path == path]
+            if path != target_file and path not in self.written_files:
+                # Only files this run generated are committed, so leave the rest alone.
+                await self.broadcast_status(state_name, self.config.status_message('fixing', 'edit_skipped').format(file=path))
+                failed += len(file_blocks)
+                continue
+            content, file_applied, file_failed = await self.apply_file_edits(
+                state_name, path, current.get(path) or "", file_blocks, feedback
+            )
+            applied, failed = applied + file_applied, failed + file_failed
+            if content != original_code or path != target_file:
+                updated[path] = content
+
+        await self.broadcast_status(state_name, self.config.status_message('fixing', 'edits_applied').format(
+            applied=applied, total=len(blocks), files=", ".join(updated) or "none"
+        ))
+        if not updated:
+            raise Exception("None of the LLM's edits could be applied.")
+        return updated
+
+    async def apply_file_edits(self, state_name: str, path: str, content: str, blocks: list, feedback: str):
+        """
+        Apply one file's edits, regenerating the region of any that don't match.
+        Returns (new content, edits applied, edits that couldn't be applied).
+        """
+        threshold = self.config.get_section('agent').get('fixing', {}).get('fuzzy_threshold', 0.85)
+        result = apply_blocks(content, blocks, threshold)
+        content, applied, failed = result.content, len(result.applied), 0
+        for block in result.failed:
+            regenerated = await self.regenerate_hunk(state_name, path, content, block, feedback)
+            if regenerated is None:
+                failed += 1
+            else:
+                content, applied = regenerated, applied + 1
+        return content, applied, failed
+
+    async def regenerate_hunk(self, state_name: str, path: str, content: str, block, feedback: str):
+        """Ask the model to rewrite only the region an unmatched edit was aimed at."""
+        context_lines = self.config.get_section('agent').get('fixing', {}).get('hunk_context_lines', 6)
+        start, end = closest_region(content, block.search, context_lines)
+        await self.broadcast_status(state_name, self.config.status_message('fixing', 'regenerating_hunk').format(
+            file=path, start=start + 1, end=end
+        ))
+        language_config = self._language_config(path)
+        prompt = self.config.prompt('hunk_regeneration')['template'].format(
+            language=language_config['name'].title() if language_config else "code",
+            markdown_lang=language_config['markdown_lang'] if language_config else "",
+            file_path=path,
+            start=start + 1,
+            end=end,
+            region="\n".join(content.splitlines()[start:end]),
+            search=block.search,
+            replace=block.replace,
+            feedback=feedback,
+        )
+        region = strip_code_fence(await self.llm_connector.generate_text(
+            prompt, on_token=self.token_streamer(state_name, file_path=path), prompt_type='hunk_regeneration',
+            use_cache=False
+        ))
+        if not region.strip():
+            return None
+        return splice_region(content, start, end, region)
+
+    async def related_snippets(self, query: str, exclude: str = "") -> str:
+        """
+        Snippets from the indexed worktree related to the query, formatted for a
+        prompt's {context} section. Empty when retrieval is disabled.
+        """
+        retrieval_config = self.config.get_section('context_packing').get('retrieval', {})
+        if not retrieval_config.get('enabled', False) or not query:
+            return ""
+        from ..connectors.vector_db_connector import VectorDBConnector
+
+        executor = get_executor('vector')
+        repo_key = self.git_connector.repo_url
+        if self.vector_db is None:
+            self.vector_db = await executor.run(VectorDBConnector)
+        if not self.worktree_indexed:
+            await executor.run(self.vector_db.populate_from_directory, self.workspace_dir, repo_key=repo_key)
+            self.worktree_indexed = True
+        snippets = await executor.run(
+            self.vector_db.query_codebase, query, retrieval_config.get('n_results', 8), repo_key
+        )
+        return self.context_packer.format_snippets(snippets, exclude=exclude)
+
+    async def pack_prompt(self, state_name: str, prompt_type: str, fixed: dict, sections: list) -> str:
+        template = self.config.prompt(prompt_type)['template']
+        packed = self.context_packer.pack(template, fixed, sections)
+        await self.broadcast_status(state_name, self.config.status_message('context', 'packed').format(
+            prompt=prompt_type, total=packed.total_tokens, budget=packed.budget, sections=packed.summary()
+        ))
+        return packed.text
+
+    async def has_new_review_activity(self) -> bool:
+        comments = await self.connectors.github.get_pr_review_comments(self.pull_request_info['number'])
+        return any(comment['id'] not in self.seen_comment_ids for comment in comments)
+
+    async def resume(self, user_prompt: str, reason: str = "review"):
+        """
+        Continue a parked run from AWAITING_REVIEW.
+        """
+        set_trace_id(self.trace_id)
+        self.state_machine.set_state(AgentState.AWAITING_REVIEW)
+        await self.broadcast_status(
+            "AWAITING_REVIEW",
+            self.config.status_message('review', 'resumed').format(number=self.pull_request_info['number'], reason=reason)
+        )
+        await self.run(user_prompt)
+
+    async def finish_parked(self, reason: str):
+        self.state_machine.set_state(AgentState.DONE)
+        await self.clear_checkpoint()
+        await self.broadcast_status("DONE", self.config.status_message('review', 'review_finished').format(reason=reason))
+
+    async def run(self, user_prompt: str):
+        set_trace_id(self.trace_id)
+        curr_state = self.state_machine.get_state()
+        logger.info(f"Starting agent run {self.task_id} from state: {curr_state}")
+
+        # Cleanup runs in finally so a cancelled run frees its sandbox immediately.
+        # A cancelled run (e.g. on shutdown) keeps its checkpoint and is resumed on the next start.
+        try:
+            if curr_state not in [AgentState.DONE, AgentState.ERROR]:
+                await self.save_checkpoint(user_prompt)
+            while curr_state not in [AgentState.DONE, AgentState.ERROR, AgentState.PARKED]:
+                try:
+                    with observe_duration(STATE_DURATION, with_outcome=True, state=curr_state.name):
+                        await self.execute_state(curr_state, user_prompt)
+                    await self.save_checkpoint(user_prompt)
+                except Exception as e:
+                    logger.error(f"An error occured in state {curr_state.name}: {e}", exc_info=True)
+                    await self.broadcast_status("ERROR", self.config.status_message('general', 'error').format(state=curr_state.name, error=e))
+                    self.state_machine.set_state(AgentState.ERROR)
+
+                curr_state = self.state_machine.get_state()
+
+            if curr_state == AgentState.PARKED:
+                # Release compute before registering so a quick wake-up can't race the cleanup.
+                await self.cleanup()
+                pr_number = self.pull_request_info['number']
+                self.review_waiter.park(pr_number, self, user_prompt)
+                RUNS.labels(final_state=curr_state.name).inc()
+                await self.broadcast_status("PARKED", self.config.status_message('review', 'parked').format(number=pr_number))
+                return
+
+            await self.clear_checkpoint()
+            RUNS.labels(final_state=curr_state.name).inc()
+            logger.info(f"Agent run finished with state: {curr_state.name}")
+            await self.broadcast_status("DONE", self.config.status_message('general', 'workflow_complete'))
+        finally:
+            await self.state_machine.cancel_substeps()
+            await self.cleanup()
+
     async def execute_state(self, state: AgentState, prompt: str):
         state_name = state.name
-        print(f"State executing: {state_name}")
-        await self.broadcast_status(state_name, get_status_message('general', 'state_executing').format(state=state_name))
+        logger.info(f"State executing: {state_name}")
+        await self.broadcast_status(state_name, self.config.status_message('general', 'state_executing').format(state=state_name))
+
+        if state == AgentState.STARTING:
+            self.state_machine.set_state(AgentState.PLANNING)
 
-        if state == AgentState.PLANNING:
-            await self.broadcast_status(state_name, get_status_message('planning', 'cloning'))
-            self.workspace_dir = self.git_connector.clone_repo()
+        elif state == AgentState.PLANNING:
+            await self.broadcast_status(state_name, self.config.status_message('planning', 'cloning'))
+            self.workspace_dir = await self.connectors.git.clone_repo()
+            if not self.workspace_dir:
+                raise Exception(f"Failed to clone {self.git_connector.repo_url}")
 
-            git_config = get_git_config()
+            git_config = self.config.get_section('git')
             self.feature_branch = f"{git_config['branch_prefix']}{uuid.uuid4().hex[:6]}"
-            await self.broadcast_status(state_name, get_status_message('planning', 'creating_branch').format(branch=self.feature_branch))
-            self.git_connector.create_branch(self.feature_branch)
+            await self.broadcast_status(state_name, self.config.status_message('planning', 'creating_branch').format(branch=self.feature_branch))
+            if not await self.connectors.git.create_branch(self.feature_branch):
+                raise Exception(f"Failed to create branch {self.feature_branch}")
 
-            await self.broadcast_status(state_name, get_status_message('planning', 'generating_plan'))
-            planning_prompt = get_prompt_template('planning')
+            await self.broadcast_status(state_name, self.config.status_message('planning', 'generating_plan'))
+            planning_prompt = self.config.prompt('planning')
             plan_prompt = f"{planning_prompt['system']}\n\n{planning_prompt['template'].format(task=prompt)}"
-            self.plan = self.llm_connector.generate_text(plan_prompt)
-            await self.broadcast_status(state_name, get_status_message('planning', 'plan_generated').format(plan=self.plan))
+            self.plan = await self.llm_connector.generate_text(
+                plan_prompt, on_token=self.token_streamer(state_name), prompt_type='planning', temperature=0
+            )
+            await self.broadcast_status(state_name, self.config.status_message('planning', 'plan_generated').format(plan=self.plan))
+
+            # Sparse worktrees only hold what the plan touches; widen them to match.
+            await self.connectors.git.add_sparse_paths(self._plan_paths())
             self.state_machine.set_state(AgentState.CODE_GENERATION)
 
         elif state == AgentState.CODE_GENERATION:
-            await self.broadcast_status(state_name, get_status_message('code_generation', 'starting_docker'))
-            self.docker_connector.start_container(self.workspace_dir)
-
-            await self.broadcast_status(state_name, get_status_message('code_generation', 'beginning_generation'))
-            
-            code_gen_template = get_prompt_template('code_generation')
-            code_gen_prompt = code_gen_template.format(
-                language="Python",
-                plan=self.plan
+            await self.ensure_worktree()
+            work_items = self._plan_work_items()
+            self.code_files = [item.path for item in work_items]
+            existing = await asyncio.to_thread(self._read_worktree_files, self.code_files)
+            for item in work_items:
+                item.existing = existing.get(item.path)
+            language_config = self._language_config(self.primary_code_file)
+
+            if self.config.get_section('agent').get('speculative_tests', {}).get('enabled', False):
+                # The tests only need the plan, so write them while the code is generated.
+                self.speculative_test = ""
+                self.state_machine.start_substep('speculative_tests', self.generate_speculative_test(work_items[0]))
+
+            await self.broadcast_status(state_name, self.config.status_message('code_generation', 'preparing_image'))
+            image = await self.connectors.docker.resolve_image(self.workspace_dir, language_config)
+
+            await self.broadcast_status(state_name, self.config.status_message('code_generation', 'starting_docker'))
+            await self.connectors.docker.start_container(self.workspace_dir, image=image)
+
+            await self.broadcast_status(state_name, self.config.status_message('code_generation', 'beginning_generation'))
+            await self.broadcast_status(state_name, self.config.status_message('code_generation', 'planned_files').format(
+                count=len(work_items), files=", ".join(self.code_files)
+            ))
+
+            generation_config = self.config.get_section('agent').get('code_generation', {})
+            semaphore = asyncio.Semaphore(generation_config.get('max_concurrency', 4))
+            results = await asyncio.gather(
+                *(self.generate_file(state_name, item, work_items, semaphore) for item in work_items),
+                return_exceptions=True
             )
-            
-            await self.broadcast_status(state_name, get_status_message('code_generation', 'asking_llm'))
-            generated_code = self.llm_connector.generate_text(code_gen_prompt)
-            
-            if not generated_code:
-                raise Exception("LLM failed to generate production code.")
-
-            file_path = get_file_paths()['default_code_file']
-            await self.broadcast_status(state_name, get_status_message('code_generation', 'writing_file').format(file_path=file_path))
-            self.docker_connector.write_file_to_container(file_path, generated_code)
-            
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+
+            generated = dict(zip(self.code_files, results))
+            await self.broadcast_status(state_name, self.config.status_message('code_generation', 'writing_files').format(
+                count=len(generated)
+            ))
+            await self.write_workspace_files(generated)
+
             self.state_machine.set_state(AgentState.TESTING)
 
         elif state == AgentState.TESTING:
-            await self.broadcast_status(state_name, get_status_message('testing', 'beginning_generation'))
-            
-            file_path = get_file_paths()['default_code_file']
-            code_to_test = self.docker_connector.read_file_from_container(file_path)
-
-            if not code_to_test:
-                 raise Exception(f"Could not read file {file_path} to generate tests.")
-
-            file_extension = os.path.splitext(file_path)[1]
-            
-            # Get language config based on file extension
-            language_name = None
-            test_framework = None
-            markdown_lang = None
-            
-            config = get_config()
-            for lang, lang_config in config.get_section('languages').items():
-                if lang_config['extension'] == file_extension:
-                    language_name = lang.title()
-                    test_framework = lang_config['test_framework']
-                    markdown_lang = lang_config['markdown_lang']
-                    break
-            
-            if not language_name:
-                language_name = 'the specified language'
-                test_framework = 'a common testing framework'
-                markdown_lang = ''
-
-            test_gen_template = get_prompt_template('test_generation')
-            test_gen_prompt = test_gen_template.format(
-                language=language_name,
-                test_framework=test_framework,
-                markdown_lang=markdown_lang,
-                code=code_to_test
-            )
-            
-            await self.broadcast_status(state_name, get_status_message('testing', 'asking_llm').format(test_framework=test_framework))
-            generated_test = self.llm_connector.generate_text(test_gen_prompt)
-
-            if not generated_test:
-                raise Exception("LLM failed to generate test code.")
-
-            test_path = get_file_paths()['default_test_file']
-            await self.broadcast_status(state_name, get_status_message('testing', 'writing_test').format(test_path=test_path))
-            self.docker_connector.write_file_to_container(test_path, generated_test)
-
-            # Get test command from language config
-            test_command = "pytest"  # default fallback
-            for lang, lang_config in config.get_section('languages').items():
-                if lang_config['extension'] == file_extension:
-                    test_command = lang_config['test_command']
-                    break
-            
-            await self.broadcast_status(state_name, get_status_message('testing', 'running_tests').format(test_framework=test_framework))
-            exit_code, output = self.docker_connector.run_command(test_command)
-
-            if exit_code == 0:
-                await self.broadcast_status(state_name, get_status_message('testing', 'tests_passed'))
+            await self.ensure_workspace()
+            test_path = self.config.get_section('file_system')['default_test_file']
+            if test_path not in self.file_contents:
+                await self.broadcast_status(state_name, self.config.status_message('testing', 'beginning_generation'))
+                await self.generate_test_file(state_name)
+
+            report = await self.run_tests(state_name)
+            counts = report.counts()
+            await self.broadcast_status(state_name, self.config.status_message('testing', 'report').format(
+                passed=counts['passed'], failed=counts['failed'] + counts['error'], skipped=counts['skipped'],
+                duration=round(report.duration, 1), shards=report.shards
+            ))
+
+            runner_config = self.config.get_section('test_runner')
+            broken = None if report.passed else broken_test_file(report, test_path)
+            if report.passed:
+                self.failing_tests = []
+                await self.broadcast_status(state_name, self.config.status_message('testing', 'tests_passed'))
                 self.state_machine.set_state(AgentState.AWAITING_REVIEW)
+            elif broken is not None and self.test_regenerations < runner_config.get('max_test_regenerations', 1):
+                # FIXING edits the code; a test that can't even load has to be written again.
+                self.test_regenerations += 1
+                self.failing_tests = []
+                self.file_contents.pop(test_path, None)
+                await self.broadcast_status(state_name, self.config.status_message('testing', 'test_broken').format(
+                    test_path=test_path, error=broken.message or broken.status
+                ))
+                self.state_machine.set_state(AgentState.TESTING)
             else:
-                raise Exception(get_status_message('testing', 'tests_failed').format(output=output.decode('utf-8')))
+                self.failing_tests = [case.name for case in report.failures]
+                self.review_comments = failure_comments(
+                    report, runner_config.get('max_failures', 5), runner_config.get('traceback_lines', 25)
+                )
+                await self.broadcast_status(state_name, self.config.status_message('testing', 'tests_failed').format(
+                    count=len(report.failures) or 1
+                ))
+                self.state_machine.set_state(AgentState.FIXING)
 
         elif state == AgentState.AWAITING_REVIEW:
             if not self.pull_request_info:
-                git_config = get_git_config()
-                await self.broadcast_status(state_name, get_status_message('review', 'committing'))
-                self.git_connector.commit_and_push(git_config['commit_messages']['feature'], self.feature_branch)
-                await self.broadcast_status(state_name, get_status_message('review', 'pushed').format(branch=self.feature_branch))
+                await self.ensure_workspace()
+                git_config = self.config.get_section('git')
+                await self.broadcast_status(state_name, self.config.status_message('review', 'committing'))
+                if not await self.connectors.git.commit_and_push(git_config['commit_messages']['feature'], self.feature_branch, sorted(self.written_files)):
+                    raise Exception(f"Failed to commit and push branch {self.feature_branch}")
+                await self.broadcast_status(state_name, self.config.status_message('review', 'pushed').format(branch=self.feature_branch))
                 
-                await self.broadcast_status(state_name, get_status_message('review', 'creating_pr'))
-                pr_config = get_config().get_section('pull_request')
-                self.pull_request_info = self.github_connector.create_pull_request(self.feature_branch, git_config['default_base_branch'], pr_config['title'], pr_config['body'])
-                await self.broadcast_status(state_name, get_status_message('review', 'pr_created').format(url=self.pull_request_info.get('html_url')))
-
-            await self.broadcast_status(state_name, get_status_message('review', 'waiting_review'))
-            self.review_comments = self.github_connector.get_pr_review_comments(self.pull_request_info['number'])
+                await self.broadcast_status(state_name, self.config.status_message('review', 'creating_pr'))
+                pr_config = self.config.get_section('pull_request')
+                self.pull_request_info = await self.connectors.github.create_pull_request(
+                    title=pr_config['title'],
+                    head_branch=self.feature_branch,
+                    base_branch=git_config['default_base_branch'],
+                    body=pr_config['body']
+                )
+                if not self.pull_request_info:
+                    raise Exception(f"Failed to create pull request for {self.feature_branch}")
+                # Checkpoint now so a restart never opens a second PR for this run.
+                await self.save_checkpoint(prompt)
+                await self.broadcast_status(state_name, self.config.status_message('review', 'pr_created').format(url=self.pull_request_info.get('html_url')))
+
+            await self.broadcast_status(state_name, self.config.status_message('review', 'waiting_review'))
+            comments = await self.connectors.github.get_pr_review_comments(self.pull_request_info['number'])
+            self.review_comments = [comment for comment in comments if comment['id'] not in self.seen_comment_ids]
 
             if self.review_comments:
-                await self.broadcast_status(state_name, get_status_message('review', 'comments_found').format(count=len(self.review_comments)))
+                self.seen_comment_ids.update(comment['id'] for comment in self.review_comments)
+                await self.broadcast_status(state_name, self.config.status_message('review', 'comments_found').format(count=len(self.review_comments)))
+                await self.ensure_workspace()
                 self.state_machine.set_state(AgentState.FIXING)
+            elif self.review_waiter is not None:
+                self.state_machine.set_state(AgentState.PARKED)
             else:
-                await self.broadcast_status(state_name, get_status_message('review', 'no_comments'))
+                await self.broadcast_status(state_name, self.config.status_message('review', 'no_comments'))
                 self.state_machine.set_state(AgentState.DONE)
 
         elif state == AgentState.FIXING:
-            agent_config = get_agent_config()
+            agent_config = self.config.get_section('agent')
             if self.fix_attempts >= agent_config['max_fix_attempts']:
                 raise Exception("Maximum fix attempts reached. Halting to prevent infinite loop.")
-            
-            self.fix_attempts += 1
-            await self.broadcast_status(state_name, get_status_message('fixing', 'starting_attempt').format(attempt=self.fix_attempts))
-
-            target_file = get_file_paths()['default_code_file']
-            file_extension = os.path.splitext(target_file)[1]
-
-            # Get language config based on file extension
-            language_name = "code"
-            markdown_lang = ""
-            
-            config = get_config()
-            for lang, lang_config in config.get_section('languages').items():
-                if lang_config['extension'] == file_extension:
-                    language_name = lang.title()
-                    markdown_lang = lang_config['markdown_lang']
-                    break
-
-            combined_feedback = "\n".join([comment['body'] for comment in self.review_comments])
-
-            await self.broadcast_status(state_name, get_status_message('fixing', 'reading_code').format(file=target_file))
-            original_code = self.docker_connector.read_file_from_container(target_file)
-
-            if not original_code:
-                raise Exception(f"Could not read the file {target_file} to apply fixes.")
-
-            fixer_template = get_prompt_template('code_fixing')
-            fixer_prompt = fixer_template.format(
-                language=language_name,
-                markdown_lang=markdown_lang,
-                original_code=original_code,
-                feedback=combined_feedback
-            )
 
-            await self.broadcast_status(state_name, get_status_message('fixing', 'asking_llm'))
-            corrected_code = self.llm_connector.generate_text(fixer_prompt)
+            await self.ensure_workspace()
+            self.fix_attempts += 1
+            await self.broadcast_status(state_name, self.config.status_message('fixing', 'starting_attempt').format(attempt=self.fix_attempts))
 
-            if not corrected_code:
-                raise Exception("LLM failed to generate a corrected version of the code.")
+            for target_file, comments in self._fix_targets().items():
+                await self.write_workspace_files(await self.fix_file(state_name, target_file, comments))
 
-            await self.broadcast_status(state_name, get_status_message('fixing', 'applying_fixes'))
-            self.docker_connector.write_file_to_container(target_file, corrected_code)
+            self.review_comments = []
+            if not self.pull_request_info:
+                # Failing tests before the PR exists: re-test; the feature commit comes after.
+                await self.broadcast_status(state_name, self.config.status_message('fixing', 'retesting'))
+                self.state_machine.set_state(AgentState.TESTING)
+                return
 
-            await self.broadcast_status(state_name, get_status_message('fixing', 'committing_fixes'))
-            git_config = get_git_config()
+            await self.broadcast_status(state_name, self.config.status_message('fixing', 'committing_fixes'))
+            git_config = self.config.get_section('git')
             commit_message = git_config['commit_messages']['fix'].format(attempt=self.fix_attempts)
-            self.git_connector.commit_and_push(commit_message, self.feature_branch)
+            if not await self.connectors.git.commit_and_push(commit_message, self.feature_branch, sorted(self.written_files)):
+                raise Exception(f"Failed to commit and push branch {self.feature_branch}")
 
-            self.review_comments = []
-            await self.broadcast_status(state_name, get_status_message('fixing', 'fixes_pushed'))
+            await self.broadcast_status(state_name, self.config.status_message('fixing', 'fixes_pushed'))
             self.state_machine.set_state(AgentState.AWAITING_REVIEW)
 
         else:
-            print(f"Unhandled state: {state_name}")
+            logger.warning(f"Unhandled state: {state_name}")
             self.state_machine.set_state(AgentState.DONE)
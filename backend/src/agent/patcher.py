@@ -0,0 +1,223 @@
+import re
+import difflib
+from dataclasses import dataclass, field
+
+_SEARCH = re.compile(r"^<{5,}\s*SEARCH\s*$")
+_DIVIDER = re.compile(r"^={5,}\s*$")
+_REPLACE = re.compile(r"^>{5,}\s*REPLACE\s*$")
+_HUNK_HEADER = re.compile(r"^@@ -\d+(?:,\d+)? \+\d+(?:,\d+)? @@")
+_FENCE = re.compile(r"^```")
+
+
+@dataclass
+class EditBlock:
+    """Replace the lines in `search` with the lines in `replace` in file `path`."""
+    path: str
+    search: str
+    replace: str
+
+
+@dataclass
+class PatchResult:
+    content: str
+    applied: list = field(default_factory=list)
+    failed: list = field(default_factory=list)
+
+
+def _looks_like_path(line: str) -> bool:
+    line = line.strip().strip('`*')
+    return bool(line) and ' ' not in line and ('/' in line or '.' in line)
+
+
+def parse_edit_blocks(text: str, default_path: str) -> list[EditBlock]:
+    """
+    Read search/replace blocks from a model response:
+
+        path/to/file.py
+        <<<<<<< SEARCH
+        old lines
+        =======
+        new lines
+        >>>>>>> REPLACE
+
+    The path line is optional and defaults to default_path. Responses that are
+    unified diffs instead are converted hunk by hunk.
+    """
+    lines = text.splitlines()
+    if not any(_SEARCH.match(line) for line in lines):
+        return parse_unified_diff(text, default_path)
+
+    blocks, index, path = [], 0, default_path
+    while index < len(lines):
+        line = lines[index]
+        if _SEARCH.match(line):
+            search, replace, index = [], [], index + 1
+            while index < len(lines) and not _DIVIDER.match(lines[index]):
+                search.append(lines[index])
+                index += 1
+            index += 1
+            while index < len(lines) and not _REPLACE.match(lines[index]):
+                replace.append(lines[index])
+                index += 1
+            blocks.append(EditBlock(path, "\n".join(search), "\n".join(replace)))
+        elif _looks_like_path(line) and not _FENCE.match(line):
+            path = line.strip().strip('`*')
+        index += 1
+    return blocks
+
+
+def parse_unified_diff(text: str, default_path: str) -> list[EditBlock]:
+    """Turn each hunk of a unified diff into an EditBlock (context and '-' lines -> '+' lines)."""
+    blocks, path = [], default_path
+    search = replace = None
+
+    def flush():
+        if search is not None and (search or replace):
+            blocks.append(EditBlock(path, "\n".join(search), "\n".join(replace)))
+
+    for line in text.splitlines():
+        if line.startswith('+++ '):
+            target = line[4:].strip().split('\t')[0]
+            if target != '/dev/null':
+                path = target[2:] if target.startswith(('a/', 'b/')) else target
+            continue
+        if line.startswith('--- ') or line.startswith('diff ') or line.startswith('index '):
+            continue
+        if _HUNK_HEADER.match(line):
+            flush()
+            search, replace = [], []
+            continue
+        if search is None:
+            continue
+        if line.startswith('-'):
+            search.append(line[1:])
+        elif line.startswith('+'):
+            replace.append(line[1:])
+        elif line.startswith('\\'):
+            continue  # "\ No newline at end of file"
+        else:
+            context = line[1:] if line.startswith(' ') else line
+            search.append(context)
+            replace.append(context)
+    flush()
+    return blocks
+
+
+def _indent(line: str) -> str:
+    return line[:len(line) - len(line.lstrip())]
+
+
+def _reindent(lines: list[str], old: str, new: str) -> list[str]:
+    """Shift lines from one leading indentation to another, e.g. when the model dropped a level."""
+    if old == new:
+        return lines
+    return [new + line[len(old):] if line.startswith(old) else line for line in lines]
+
+
+def find_block(content_lines: list[str], search_lines: list[str], threshold: float):
+    """
+    Locate search_lines in the file. Returns (start, end, indentation fix) or None.
+    Tries an exact match, then one that ignores surrounding whitespace, then the
+    most similar window of the same length if it scores at least threshold.
+    """
+    size = len(search_lines)
+    if size == 0 or size > len(content_lines):
+        return None
+    for start in range(len(content_lines) - size + 1):
+        if content_lines[start:start + size] == search_lines:
+            return start, start + size, None
+
+    stripped = [line.strip() for line in search_lines]
+    content_stripped = [line.strip() for line in content_lines]
+    for start in range(len(content_lines) - size + 1):
+        if content_stripped[start:start + size] == stripped:
+            return start, start + size, (_indent(search_lines[0]), _indent(content_lines[start]))
+
+    best, best_ratio = None, 0.0
+    search_text = "\n".join(stripped)
+    matcher = difflib.SequenceMatcher(autojunk=False)
+    matcher.set_seq2(search_text)
+    for start in range(len(content_lines) - size + 1):
+        matcher.set_seq1("\n".join(content_stripped[start:start + size]))
+        if matcher.real_quick_ratio() < best_ratio or matcher.quick_ratio() < best_ratio:
+            continue
+        ratio = matcher.ratio()
+        if ratio > best_ratio:
+            best, best_ratio = start, ratio
+    if best is not None and best_ratio >= threshold:
+        return best, best + size, (_indent(search_lines[0]), _indent(content_lines[best]))
+    return None
+
+
+def closest_region(content: str, search: str, context_lines: int):
+    """
+    Best guess (start, end) line range, 0-based and end-exclusive, for an edit
+    that didn't apply, widened by context_lines on each side. Used to regenerate
+    just that region.
+    """
+    content_lines = content.splitlines()
+    search_lines = [line.strip() for line in search.splitlines() if line.strip()]
+    if not content_lines:
+        return 0, 0
+    if not search_lines:
+        return max(len(content_lines) - context_lines, 0), len(content_lines)
+
+    size = min(len(search_lines), len(content_lines))
+    stripped = [line.strip() for line in content_lines]
+    matcher = difflib.SequenceMatcher(autojunk=False)
+    matcher.set_seq2("\n".join(search_lines))
+    best, best_ratio = 0, -1.0
+    for start in range(len(content_lines) - size + 1):
+        matcher.set_seq1("\n".join(stripped[start:start + size]))
+        ratio = matcher.ratio()
+        if ratio > best_ratio:
+            best, best_ratio = start, ratio
+    return max(best - context_lines, 0), min(best + size + context_lines, len(content_lines))
+
+
+def apply_block(content: str, block: EditBlock, threshold: float):
+    """Apply one edit to the file content; returns the new content or None if it didn't match."""
+    trailing_newline = content.endswith("\n")
+    content_lines = content.splitlines()
+    replace_lines = block.replace.splitlines()
+    if not block.search.strip():
+        # An empty SEARCH means "add this": to a new file, or at the end of an existing one.
+        new_lines = content_lines + replace_lines
+    else:
+        match = find_block(content_lines, block.search.splitlines(), threshold)
+        if match is None:
+            return None
+        start, end, indentation = match
+        if indentation is not None:
+            replace_lines = _reindent(replace_lines, *indentation)
+        new_lines = content_lines[:start] + replace_lines + content_lines[end:]
+    return "\n".join(new_lines) + ("\n" if trailing_newline or not content else "")
+
+
+def apply_blocks(content: str, blocks: list[EditBlock], threshold: float = 0.85) -> PatchResult:
+    """Apply edits in order; edits that don't match are collected in failed."""
+    result = PatchResult(content)
+    for block in blocks:
+        patched = apply_block(result.content, block, threshold)
+        if patched is None:
+            result.failed.append(block)
+        else:
+            result.content = patched
+            result.applied.append(block)
+    return result
+
+
+def splice_region(content: str, start: int, end: int, replacement: str) -> str:
+    """Replace lines [start, end) of content with replacement."""
+    trailing_newline = content.endswith("\n")
+    lines = content.splitlines()
+    new_lines = lines[:start] + replacement.splitlines() + lines[end:]
+    return "\n".join(new_lines) + ("\n" if trailing_newline else "")
+
+
+def strip_code_fence(text: str) -> str:
+    """Drop a single ``` fence wrapped around a model response, if there is one."""
+    lines = text.strip("\n").splitlines()
+    if len(lines) >= 2 and _FENCE.match(lines[0]) and _FENCE.match(lines[-1]):
+        lines = lines[1:-1]
+    return "\n".join(lines)
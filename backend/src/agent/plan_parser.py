@@ -0,0 +1,107 @@
+import re
+from dataclasses import dataclass, field
+
+# A numbered, bulleted-bold or headed line starts a new step of the plan.
+_STEP_START = re.compile(r"^\s*(?:\d+[.)]\s|#{1,6}\s|\*\*\s*step\b|step\s+\d+)", re.IGNORECASE)
+_TEST_PATH = re.compile(
+    r"(?:^|/)(?:tests?|__tests__|spec)/|(?:^|/)test_[^/]+$|_test\.\w+$|\.(?:test|spec)\.\w+$|Test\.java$|_spec\.rb$"
+)
+# Technology names that look like file names in prose ("built with Node.js").
+_NOT_FILES = frozenset({
+    'node.js', 'express.js', 'next.js', 'nuxt.js', 'vue.js', 'react.js', 'angular.js', 'ember.js',
+    'backbone.js', 'd3.js', 'three.js', 'chart.js', 'socket.io', 'nest.js', 'deno.js', 'p5.js',
+})
+
+
+@dataclass
+class PlanItem:
+    """
+    One file the plan asks for, with the plan steps that mention it. existing
+    holds the file's current contents when it is already in the repository.
+    """
+    path: str
+    steps: list = field(default_factory=list)
+    existing: str = None
+
+
+def extract_file_paths(plan: str, extensions) -> list[str]:
+    """
+    Pull repo-relative file paths named in a plan, in order of first mention.
+    Only paths ending in one of the given extensions (e.g. '.py') are returned,
+    and only path-like ones: in backticks or containing a directory separator,
+    so prose such as "Node.js" isn't taken for a file.
+    """
+    if not plan:
+        return []
+    ext_pattern = "|".join(re.escape(ext.lstrip('.')) for ext in sorted(set(extensions), key=len, reverse=True))
+    pattern = re.compile(rf"(?<![\w/.-])((?:[\w.-]+/)*[\w.-]+\.(?:{ext_pattern}))(?![\w])")
+
+    paths = []
+    for match in pattern.finditer(plan):
+        path = match.group(1)
+        backticked = plan[match.start() - 1:match.start()] == '`' and plan[match.end():match.end() + 1] == '`'
+        if path.startswith('./'):
+            path = path[2:]
+        if not backticked and '/' not in path:
+            continue
+        if path.lower() in _NOT_FILES or path.startswith('/') or '..' in path.split('/'):
+            continue
+        if path not in paths:
+            paths.append(path)
+    return paths
+
+
+def is_test_path(path: str) -> bool:
+    return _TEST_PATH.search(path) is not None
+
+
+def split_steps(plan: str) -> list[str]:
+    """Split a plan into its steps; text before the first step is its own block."""
+    steps, current = [], []
+    for line in plan.splitlines():
+        if _STEP_START.match(line) and current:
+            steps.append("\n".join(current).strip())
+            current = []
+        current.append(line)
+    if current:
+        steps.append("\n".join(current).strip())
+    return [step for step in steps if step]
+
+
+def extract_work_items(plan: str, extensions, include_tests: bool = False) -> list[PlanItem]:
+    """
+    Group the plan by the source files it names: one item per file, in order of
+    first mention, holding every step that mentions it. Test files are left out
+    unless include_tests is set.
+    """
+    if not plan:
+        return []
+    items = {}
+    for step in split_steps(plan):
+        for path in extract_file_paths(step, extensions):
+            if not include_tests and is_test_path(path):
+                continue
+            items.setdefault(path, PlanItem(path)).steps.append(step)
+    return list(items.values())
+
+
+_FENCED_BLOCK = re.compile(r"```[\w+-]*\n(.*?)```", re.DOTALL)
+_INLINE_CODE = re.compile(r"`([^`\n]+)`")
+_SIGNATURE_LINE = re.compile(r"^\s*(?:async\s+def|def|class|function|export|interface|type|func|public|fn)\b")
+
+
+def extract_interfaces(plan: str) -> list[str]:
+    """
+    Signatures the plan declares: definition lines inside fenced code blocks and
+    inline code that looks like a call or definition, e.g. `parse(text) -> dict`.
+    """
+    if not plan:
+        return []
+    interfaces = []
+    for block in _FENCED_BLOCK.findall(plan):
+        interfaces.extend(line.strip() for line in block.splitlines() if _SIGNATURE_LINE.match(line))
+    for span in _INLINE_CODE.findall(plan):
+        span = span.strip()
+        if '(' in span or _SIGNATURE_LINE.match(span):
+            interfaces.append(span)
+    return list(dict.fromkeys(interfaces))
@@ -0,0 +1,130 @@
+import logging
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ParkedRun:
+    pr_number: int
+    agent: Any
+    prompt: str
+    parked_at: float = field(default_factory=time.time)
+    last_polled: float = field(default_factory=time.time)
+    wake_reason: Optional[str] = None
+
+
+class ReviewWaiter:
+    """
+    Holds agent runs that are waiting on a pull request review.
+
+    A parked run owns no worker slot, container or worktree. It is woken by a
+    GitHub webhook for its PR, or by a slow poll when webhooks are not delivered,
+    and handed back to the scheduler through the resume callback.
+    """
+
+    def __init__(self, resume: Callable[[ParkedRun], Any], poll_interval: int = 300,
+                 max_park_seconds: int = 72 * 3600):
+        self.resume = resume
+        self.poll_interval = poll_interval
+        self.max_park_seconds = max_park_seconds
+        self._parked = {}
+        self._poller = None
+
+    @classmethod
+    def from_config(cls, agent_config: dict, resume: Callable[[ParkedRun], Any]) -> "ReviewWaiter":
+        parking_config = agent_config.get('review_parking', {})
+        return cls(
+            resume,
+            poll_interval=agent_config.get('review_wait_time', 300),
+            max_park_seconds=int(parking_config.get('max_park_hours', 72) * 3600),
+        )
+
+    def start(self):
+        """Start the fallback poller. Must be called from inside the running event loop."""
+        if self._poller is None:
+            self._poller = asyncio.create_task(self._poll_loop())
+
+    async def shutdown(self):
+        if self._poller is not None:
+            self._poller.cancel()
+            await asyncio.gather(self._poller, return_exceptions=True)
+            self._poller = None
+
+    def park(self, pr_number: int, agent, prompt: str) -> ParkedRun:
+        parked = ParkedRun(pr_number=pr_number, agent=agent, prompt=prompt)
+        self._parked[pr_number] = parked
+        logger.info(f"Parked run {agent.task_id} until PR #{pr_number} is reviewed")
+        return parked
+
+    def is_parked(self, pr_number: int) -> bool:
+        return pr_number in self._parked
+
+    def find(self, task_id: str) -> Optional[ParkedRun]:
+        """The parked run with this task id, if any."""
+        return next((parked for parked in self._parked.values() if parked.agent.task_id == task_id), None)
+
+    async def cancel(self, task_id: str) -> bool:
+        """Stop waiting for the run with this task id and finish it. Returns False if it isn't parked."""
+        parked = self.find(task_id)
+        if parked is None:
+            return False
+        return await self.close(parked.pr_number, "cancelled")
+
+    def notify(self, pr_number: int, reason: str) -> bool:
+        """
+        Wake the run parked on pr_number. Returns False if nothing is waiting on it
+        or the resume callback could not take it yet (it stays parked and is retried by the poller).
+        """
+        parked = self._parked.get(pr_number)
+        if parked is None:
+            return False
+        parked.wake_reason = reason
+        try:
+            self.resume(parked)
+        except Exception as e:
+            logger.warning(f"Could not resume run for PR #{pr_number} yet: {e}")
+            return False
+        self._parked.pop(pr_number, None)
+        logger.info(f"Resumed run {parked.agent.task_id} for PR #{pr_number} ({reason})")
+        return True
+
+    async def close(self, pr_number: int, reason: str) -> bool:
+        """Finish the run parked on pr_number without resuming it, e.g. when the PR is closed."""
+        parked = self._parked.pop(pr_number, None)
+        if parked is None:
+            return False
+        await parked.agent.finish_parked(reason)
+        return True
+
+    def stats(self) -> dict:
+        now = time.time()
+        return {
+            "parked": len(self._parked),
+            "poll_interval": self.poll_interval,
+            "runs": [
+                {"pr_number": p.pr_number, "task_id": p.agent.task_id, "parked_seconds": round(now - p.parked_at)}
+                for p in self._parked.values()
+            ],
+        }
+
+    async def _poll_loop(self):
+        while True:
+            await asyncio.sleep(min(self.poll_interval, 60))
+            now = time.time()
+            for pr_number, parked in list(self._parked.items()):
+                if now - parked.parked_at > self.max_park_seconds:
+                    await self.close(pr_number, "timed out waiting for review")
+                    continue
+                if parked.wake_reason is None and now - parked.last_polled < self.poll_interval:
+                    continue
+                parked.last_polled = now
+                try:
+                    # A previous wake-up that could not be scheduled is retried without polling.
+                    if parked.wake_reason is not None or await parked.agent.has_new_review_activity():
+                        self.notify(pr_number, parked.wake_reason or "poll")
+                except Exception as e:
+                    logger.error(f"Error polling review state for PR #{pr_number}: {e}")
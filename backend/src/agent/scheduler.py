@@ -0,0 +1,206 @@
+import logging
+import asyncio
+import itertools
+import math
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class JobStatus(Enum):
+    """
+    Lifecycle of a scheduled agent run.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class QueueFullError(Exception):
+    """
+    Raised when the scheduler queue is at capacity.
+    """
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Scheduler queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+@dataclass
+class Job:
+    runner: Callable[["Job"], Awaitable[Any]]
+    label: str = ""
+    priority: int = 5
+    task_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: JobStatus = JobStatus.QUEUED
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    task: Optional[asyncio.Task] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "task_id": self.task_id,
+            "label": self.label,
+            "priority": self.priority,
+            "status": self.status.value,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+
+class JobScheduler:
+    """
+    In-process scheduler with a bounded worker pool and a priority queue.
+    Lower priority numbers run first; submissions beyond max_queue_depth are rejected.
+    """
+
+    def __init__(self, max_workers: int = 2, max_queue_depth: int = 10,
+                 retry_after_seconds: int = 30, job_history: int = 200):
+        self.max_workers = max_workers
+        self.max_queue_depth = max_queue_depth
+        self.retry_after_seconds = retry_after_seconds
+        self.job_history = job_history
+
+        self._queue = None
+        self._workers = []
+        self._jobs = OrderedDict()
+        self._counter = itertools.count()
+        self._avg_duration = None
+
+    @classmethod
+    def from_config(cls, scheduler_config: dict) -> "JobScheduler":
+        return cls(
+            max_workers=scheduler_config.get('max_workers', 2),
+            max_queue_depth=scheduler_config.get('max_queue_depth', 10),
+            retry_after_seconds=scheduler_config.get('retry_after_seconds', 30),
+            job_history=scheduler_config.get('job_history', 200),
+        )
+
+    def start(self):
+        """Spawn the worker tasks. Must be called from inside the running event loop."""
+        if self._workers:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(self.max_workers)]
+        logger.info(f"Job scheduler started with {self.max_workers} workers")
+
+    async def shutdown(self):
+        for job in list(self._jobs.values()):
+            self.cancel(job.task_id)
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def queue_depth(self) -> int:
+        return sum(1 for job in self._jobs.values() if job.status == JobStatus.QUEUED)
+
+    def running_count(self) -> int:
+        return sum(1 for job in self._jobs.values() if job.status == JobStatus.RUNNING)
+
+    def _estimate_retry_after(self) -> int:
+        if self._avg_duration is None:
+            return self.retry_after_seconds
+        waves = (self.queue_depth() + 1) / self.max_workers
+        return max(1, math.ceil(waves * self._avg_duration))
+
+    def submit(self, runner: Callable[[Job], Awaitable[Any]], priority: int = 5, label: str = "",
+               task_id: Optional[str] = None, force: bool = False) -> Job:
+        """
+        Queue a job. Raises QueueFullError when the queue is at capacity, unless force is set
+        (used for work that was already accepted, e.g. runs restored from a checkpoint).
+        """
+        if self._queue is None:
+            raise RuntimeError("Scheduler not started. Call start() first")
+        if not isinstance(priority, int) or isinstance(priority, bool):
+            raise ValueError(f"Job priority must be an integer, got {priority!r}")
+        if not force and self.queue_depth() >= self.max_queue_depth:
+            raise QueueFullError(self._estimate_retry_after())
+
+        job = Job(runner=runner, label=label, priority=priority)
+        if task_id is not None:
+            job.task_id = task_id
+        self._queue.put_nowait((priority, next(self._counter), job))
+        # Registered only once it is queued, so a rejected job never holds a QUEUED slot.
+        self._jobs[job.task_id] = job
+        self._trim_history()
+        logger.debug(f"Queued job {job.task_id} (priority {priority}, depth {self.queue_depth()})")
+        return job
+
+    def get(self, task_id: str) -> Optional[Job]:
+        return self._jobs.get(task_id)
+
+    def cancel(self, task_id: str) -> bool:
+        """
+        Cancel a queued or running job. Returns False if it is unknown or already finished.
+        """
+        job = self._jobs.get(task_id)
+        if job is None or job.status not in (JobStatus.QUEUED, JobStatus.RUNNING):
+            return False
+
+        if job.status == JobStatus.QUEUED:
+            # Left in the heap and skipped by the worker that pops it.
+            job.status = JobStatus.CANCELLED
+            job.finished_at = time.time()
+        elif job.task is not None:
+            job.task.cancel()
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "max_queue_depth": self.max_queue_depth,
+            "queue_depth": self.queue_depth(),
+            "running": self.running_count(),
+            "avg_job_seconds": self._avg_duration,
+        }
+
+    def _trim_history(self):
+        finished = [task_id for task_id, job in self._jobs.items()
+                    if job.status not in (JobStatus.QUEUED, JobStatus.RUNNING)]
+        for task_id in finished[:max(0, len(self._jobs) - self.job_history)]:
+            del self._jobs[task_id]
+
+    async def _worker(self, worker_id: int):
+        while True:
+            _, _, job = await self._queue.get()
+            try:
+                if job.status == JobStatus.CANCELLED:
+                    continue
+                await self._run_job(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run_job(self, job: Job):
+        job.status = JobStatus.RUNNING
+        job.started_at = time.time()
+        job.task = asyncio.create_task(job.runner(job))
+
+        # asyncio.wait never raises the job's exception or cancellation into the worker.
+        await asyncio.wait({job.task})
+
+        job.finished_at = time.time()
+        if job.task.cancelled():
+            job.status = JobStatus.CANCELLED
+        elif job.task.exception() is not None:
+            job.status = JobStatus.FAILED
+            job.error = str(job.task.exception())
+        else:
+            job.status = JobStatus.DONE
+        job.task = None
+
+        duration = job.finished_at - job.started_at
+        self._avg_duration = duration if self._avg_duration is None else 0.8 * self._avg_duration + 0.2 * duration
+        logger.info(f"Job {job.task_id} finished with status {job.status.value} in {duration:.1f}s")
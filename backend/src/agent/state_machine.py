@@ -1,5 +1,9 @@
+import logging
+import asyncio
 from enum import Enum, auto
 
+logger = logging.getLogger(__name__)
+
 class AgentState(Enum):
     """
     The possivle states of Momentum agent during its execution workflow.
@@ -10,6 +14,7 @@ class AgentState(Enum):
     CODE_GENERATION = auto()
     TESTING = auto()
     AWAITING_REVIEW = auto()
+    PARKED = auto()
     FIXING = auto()
     DONE = auto()
     ERROR = auto()
@@ -21,16 +26,44 @@ class AgentStateMachine:
 
     def __init__(self):
         self.curr_state = AgentState.STARTING
+        # Work that overlaps state boundaries: name -> (state it started in, task).
+        self.substeps = {}
     
     def set_state(self, new_state: AgentState):
         """
         Set to a new state.
         """
-        print(f"Transitioning from {self.curr_state} to {new_state}")
+        logger.info(f"Transitioning from {self.curr_state} to {new_state}")
         self.curr_state = new_state
     
     def get_state(self) -> AgentState:
         """
         Get the current state.
         """
-        return self.curr_state
\ No newline at end of file
+        return self.curr_state
+
+    def start_substep(self, name: str, coroutine) -> asyncio.Task:
+        """
+        Run a coroutine alongside the current state. It keeps running across
+        transitions until a later state joins it with join_substep.
+        """
+        task = asyncio.create_task(coroutine, name=name)
+        self.substeps[name] = (self.curr_state, task)
+        logger.debug(f"Started sub-step {name} in {self.curr_state}")
+        return task
+
+    async def join_substep(self, name: str, default=None):
+        """
+        Wait for a sub-step and return its result, or default if it was never
+        started. A failed sub-step re-raises its exception here.
+        """
+        entry = self.substeps.pop(name, None)
+        if entry is None:
+            return default
+        return await entry[1]
+
+    async def cancel_substeps(self):
+        entries, self.substeps = list(self.substeps.values()), {}
+        for _, task in entries:
+            task.cancel()
+        await asyncio.gather(*(task for _, task in entries), return_exceptions=True)
@@ -0,0 +1,78 @@
+import ast
+import posixpath
+
+
+def _module_names(file_path: str) -> set[str]:
+    """Dotted names a test could import a file by: 'src/pkg/mod.py' -> {'src.pkg.mod', 'pkg.mod', 'mod'}."""
+    parts = posixpath.splitext(file_path)[0].split('/')
+    if parts[-1] == '__init__':
+        parts = parts[:-1]
+    return {".".join(parts[index:]) for index in range(len(parts))}
+
+
+def _defined_names(tree: ast.Module) -> set[str]:
+    names = set()
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for target in targets:
+                names.update(n.id for n in ast.walk(target) if isinstance(n, ast.Name))
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            names.update((alias.asname or alias.name).split('.')[0] for alias in node.names)
+    return names
+
+
+def unresolved_names(test_code: str, code_files: dict):
+    """
+    Names a Python test takes from the generated files that those files don't define,
+    e.g. ['src.new_feature.parse_config']. Returns None when the check can't be made
+    (non-Python files, source that doesn't parse, or a test that imports none of the
+    generated modules, so nothing ties it to them) and the caller falls back to the LLM.
+    """
+    if not code_files or not all(path.endswith('.py') for path in code_files):
+        return None
+    try:
+        test_tree = ast.parse(test_code)
+        modules = {}
+        for path, content in code_files.items():
+            defined = _defined_names(ast.parse(content))
+            for name in _module_names(path):
+                modules[name] = defined
+    except SyntaxError:
+        return None
+
+    missing = []
+    module_aliases = {}
+    imported = False
+    for node in ast.walk(test_tree):
+        if isinstance(node, ast.ImportFrom):
+            for alias in node.names:
+                submodule = f"{node.module}.{alias.name}" if node.module else alias.name
+                if submodule in modules:
+                    module_aliases[alias.asname or alias.name] = submodule  # from pkg import mod
+                elif node.module in modules:
+                    imported = True
+                    if alias.name != '*' and alias.name not in modules[node.module]:
+                        missing.append(f"{node.module}.{alias.name}")
+        elif isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.name in modules:
+                    module_aliases[alias.asname or alias.name] = alias.name
+    if not imported and not module_aliases:
+        return None
+
+    for node in ast.walk(test_tree):
+        if isinstance(node, ast.Attribute):
+            owner = node.value
+            dotted = []
+            while isinstance(owner, ast.Attribute):
+                dotted.insert(0, owner.attr)
+                owner = owner.value
+            if isinstance(owner, ast.Name):
+                dotted.insert(0, owner.id)
+                module = module_aliases.get(".".join(dotted))
+                if module is not None and node.attr not in modules[module]:
+                    missing.append(f"{module}.{node.attr}")
+    return sorted(set(missing))
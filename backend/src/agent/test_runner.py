@@ -0,0 +1,224 @@
+import re
+import shlex
+import time
+import posixpath
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+
+# pytest -k can't take parametrize ids ("test_x[1-2]"), so select by function name.
+_PARAM_SUFFIX = re.compile(r"\[.*\]$")
+# Errors that mean a test file couldn't even be loaded, as opposed to a test that ran and failed.
+_LOAD_ERROR = re.compile(r"collection failure|ImportError|ModuleNotFoundError|SyntaxError|IndentationError")
+
+
+@dataclass
+class TestCase:
+    name: str
+    classname: str = ""
+    file: str = ""
+    line: int = None
+    status: str = "passed"  # passed | failed | error | skipped
+    message: str = ""
+    details: str = ""
+    time: float = 0.0
+
+    @property
+    def failed(self) -> bool:
+        return self.status in ("failed", "error")
+
+    @property
+    def node(self) -> str:
+        return f"{self.classname}.{self.name}" if self.classname else self.name
+
+
+@dataclass
+class TestReport:
+    cases: list = field(default_factory=list)
+    exit_code: int = 0
+    output: str = ""
+    duration: float = 0.0
+    shards: int = 1
+    structured: bool = True  # False when no JUnit results were produced
+
+    @property
+    def failures(self) -> list:
+        return [case for case in self.cases if case.failed]
+
+    @property
+    def passed(self) -> bool:
+        if self.structured and self.cases:
+            return not self.failures and self.exit_code in (0, 5)
+        return self.exit_code == 0
+
+    def counts(self) -> dict:
+        counts = {"passed": 0, "failed": 0, "error": 0, "skipped": 0}
+        for case in self.cases:
+            counts[case.status] += 1
+        return counts
+
+
+def parse_junit_xml(text: str) -> list[TestCase]:
+    """Test cases from a JUnit XML report (<testsuites> or a bare <testsuite>)."""
+    try:
+        root = ET.fromstring(text)
+    except ET.ParseError:
+        return []
+    cases = []
+    for element in root.iter('testcase'):
+        case = TestCase(
+            name=element.get('name', ''),
+            classname=element.get('classname', ''),
+            file=element.get('file', ''),
+            line=int(element.get('line')) if (element.get('line') or '').isdigit() else None,
+            time=float(element.get('time') or 0),
+        )
+        for status in ('failure', 'error', 'skipped'):
+            child = element.find(status)
+            if child is not None:
+                case.status = 'failed' if status == 'failure' else status
+                case.message = child.get('message', '')
+                case.details = child.text or ''
+                break
+        cases.append(case)
+    return cases
+
+
+def trim_traceback(text: str, max_lines: int) -> str:
+    """Keep the end of a traceback, where the assertion and the failing line are."""
+    lines = [line for line in text.strip().splitlines() if line.strip()]
+    if len(lines) <= max_lines:
+        return "\n".join(lines)
+    return "\n".join([f"... ({len(lines) - max_lines} lines omitted)"] + lines[-max_lines:])
+
+
+def file_durations(cases: list) -> dict:
+    """Seconds per test file, for balancing the next run's shards."""
+    durations = {}
+    for case in cases:
+        if case.file:
+            durations[case.file] = durations.get(case.file, 0.0) + case.time
+    return durations
+
+
+def broken_test_file(report: TestReport, test_path: str):
+    """
+    The error case showing test_path itself failed to load (a syntax or import
+    error in the test, reported by pytest as a collection error), or None.
+    """
+    module = posixpath.splitext(test_path)[0].replace('/', '.')
+    for case in report.cases:
+        if case.status != 'error':
+            continue
+        if case.file != test_path and case.node != module and not case.node.startswith(module + "."):
+            continue
+        if _LOAD_ERROR.search(f"{case.message}\n{case.details}"):
+            return case
+    return None
+
+
+def failure_comments(report: TestReport, max_failures: int, traceback_lines: int) -> list[dict]:
+    """
+    Failing cases as review-comment-like dicts ({'body', 'path', 'line'}) so FIXING
+    can treat them like review feedback. Without JUnit results, the output tail is
+    the only feedback.
+    """
+    if not report.structured or not report.failures:
+        return [{"body": f"Tests failed (exit code {report.exit_code}):\n{trim_traceback(report.output, traceback_lines)}"}]
+    comments = []
+    for case in report.failures[:max_failures]:
+        body = f"Test {case.node} {case.status}: {case.message}".rstrip(": ")
+        if case.details:
+            body += "\n" + trim_traceback(case.details, traceback_lines)
+        comments.append({"body": body, "path": case.file or None, "line": case.line})
+    omitted = len(report.failures) - max_failures
+    if omitted > 0:
+        comments.append({"body": f"{omitted} more failing test(s) not shown."})
+    return comments
+
+
+class TestRunner:
+    """
+    Runs a language's tests inside the sandbox: test files are sharded across the
+    container's CPUs and each shard writes JUnit XML, which is read back as one
+    batch. Tests that failed last time run first, and stop at the first failure.
+    """
+    def __init__(self, docker, language_config: dict, runner_config: dict, on_output=None):
+        self.docker = docker  # async connector proxy
+        self.language_config = language_config
+        self.runner_config = runner_config
+        self.command_config = language_config.get('test_runner', {})
+        self.on_output = on_output
+        self.results_dir = runner_config.get('results_dir', '.momentum-test-results')
+
+    @property
+    def supported(self) -> bool:
+        return bool(self.command_config.get('command'))
+
+    async def discover(self) -> list[str]:
+        """Test files in the workspace matching the language's test_patterns."""
+        patterns = self.command_config.get('test_patterns', [])
+        if not patterns:
+            return []
+        names = " -o ".join(f"-name {shlex.quote(pattern)}" for pattern in patterns)
+        ignored = " ".join(f"-not -path {shlex.quote(f'./{d}/*')}" for d in self.runner_config.get('ignore_dirs', []))
+        _, output = await self.docker.run_command(["sh", "-c", f"find . -type f \\( {names} \\) {ignored}"])
+        return sorted(line[2:] if line.startswith('./') else line for line in output.splitlines() if line.strip())
+
+    async def cpu_count(self) -> int:
+        exit_code, output = await self.docker.run_command(["nproc"])
+        return int(output) if exit_code == 0 and output.strip().isdigit() else 1
+
+    @staticmethod
+    def shard(test_files: list[str], shards: int, durations: dict) -> list[list[str]]:
+        """Longest-first greedy split on last run's per-file durations (unknown files count as 1s)."""
+        buckets = [[] for _ in range(shards)]
+        loads = [0.0] * shards
+        for path in sorted(test_files, key=lambda p: durations.get(p, 1.0), reverse=True):
+            index = loads.index(min(loads))
+            buckets[index].append(path)
+            loads[index] += durations.get(path, 1.0)
+        return [bucket for bucket in buckets if bucket]
+
+    def _command(self, files: list[str], junit: str, extra: str = "") -> str:
+        return self.command_config['command'].format(
+            junit=shlex.quote(junit),
+            files=" ".join(shlex.quote(path) for path in files),
+            extra=extra,
+        )
+
+    async def _run_shards(self, shards: list[list[str]], extra: str = "") -> TestReport:
+        junit_paths = [posixpath.join(self.results_dir, f"junit-{index}.xml") for index in range(len(shards))]
+        script = [f"rm -rf {shlex.quote(self.results_dir)} && mkdir -p {shlex.quote(self.results_dir)}", "status=0"]
+        for index, files in enumerate(shards):
+            script.append(f"( {self._command(files, junit_paths[index], extra)} ) & pid{index}=$!")
+        for index in range(len(shards)):
+            script.append(f"wait $pid{index} || status=$?")
+        script.append("exit $status")
+
+        started = time.monotonic()
+        exit_code, output = await self.docker.run_command(["sh", "-c", "\n".join(script)], on_output=self.on_output)
+        results = await self.docker.read_files_from_container(junit_paths)
+        cases = [case for text in results.values() if text for case in parse_junit_xml(text)]
+        line_offset = self.command_config.get('line_offset', 0)
+        for case in cases:
+            if case.line is not None:
+                case.line += line_offset
+        return TestReport(cases, exit_code, output, time.monotonic() - started, len(shards),
+                          structured=any(results.values()))
+
+    async def run(self, test_files: list[str], previous_failures=(), durations: dict = None) -> TestReport:
+        """
+        Run the test files. previous_failures (test names from the last run) are run
+        on their own first with fail-fast; if any still fails, that report is returned
+        without running the rest.
+        """
+        if previous_failures and self.command_config.get('select'):
+            names = sorted({_PARAM_SUFFIX.sub('', name) for name in previous_failures})
+            select = self.command_config['select'].format(names=shlex.quote(" or ".join(names)))
+            extra = f"{self.command_config.get('fail_fast', '')} {select}".strip()
+            report = await self._run_shards([test_files], extra)
+            if report.structured and report.cases and not report.passed:
+                return report
+
+        shards = min(await self.cpu_count(), self.runner_config.get('max_shards', 4), len(test_files)) or 1
+        return await self._run_shards(self.shard(test_files, shards, durations or {}))
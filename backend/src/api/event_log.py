@@ -0,0 +1,305 @@
+import os
+import re
+import json
+import asyncio
+import time
+import queue
+import logging
+import itertools
+import threading
+from collections import OrderedDict, deque
+
+logger = logging.getLogger(__name__)
+
+_TASK_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+_TAIL_BLOCK = 64 * 1024
+
+
+def _tail_lines(path: str, count: int) -> list[str]:
+    """The last count lines of a file, read backwards in blocks instead of whole."""
+    with open(path, "rb") as log_file:
+        log_file.seek(0, os.SEEK_END)
+        position, data = log_file.tell(), b""
+        while position > 0 and data.count(b"\n") <= count:
+            step = min(_TAIL_BLOCK, position)
+            position -= step
+            log_file.seek(position)
+            data = log_file.read(step) + data
+    lines = data.decode("utf-8", errors="replace").splitlines()
+    return lines[-count:] if count else []
+
+
+class LogWriter:
+    """
+    Appends log lines on a background thread so the event loop never waits on
+    disk. Queued lines are grouped per file, so a burst costs one open per file.
+    """
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._pending = {}
+        self._written = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="event-log-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, path: str, text: str):
+        with self._written:
+            self._pending[path] = self._pending.get(path, 0) + 1
+        self._queue.put((path, text))
+
+    def wait_for(self, path: str, timeout: float = 10.0) -> bool:
+        """Block until every line queued for path is on disk."""
+        with self._written:
+            return self._written.wait_for(lambda: path not in self._pending, timeout)
+
+    def close(self):
+        """Write out everything still queued and stop the thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        closing = False
+        while not closing:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < 1000:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            closing = None in batch
+            self._write_batch([item for item in batch if item is not None])
+
+    def _write_batch(self, batch):
+        by_path = {}
+        for path, text in batch:
+            by_path.setdefault(path, []).append(text + "\n")
+        for path, lines in by_path.items():
+            try:
+                with open(path, "a", encoding="utf-8") as log_file:
+                    log_file.writelines(lines)
+            except OSError as e:
+                logger.error(f"Could not write event log {path}: {e}")
+            with self._written:
+                remaining = self._pending[path] - len(lines)
+                if remaining:
+                    self._pending[path] = remaining
+                else:
+                    del self._pending[path]
+                self._written.notify_all()
+
+
+class RunEventLog:
+    """
+    Append-only event log of one run: recent events in a ring buffer, every event
+    in a JSONL file so older history and restarts are still covered.
+    """
+    def __init__(self, path: str, buffer_size: int, writer: LogWriter):
+        self.path = path
+        self.writer = writer
+        self.buffer = deque(maxlen=buffer_size)
+        self.last_seq = 0
+        if os.path.exists(path):
+            for line in _tail_lines(path, buffer_size):
+                entry = self._parse(line)
+                if entry is not None:
+                    self.buffer.append(entry)
+                    self.last_seq = entry[0]["seq"]
+
+    @staticmethod
+    def _parse(line: str):
+        try:
+            return json.loads(line), line
+        except json.JSONDecodeError:
+            return None  # torn write from a crash
+
+    def append(self, message: dict):
+        self.last_seq += 1
+        event = {"seq": self.last_seq, "timestamp": time.time(), **message}
+        text = json.dumps(event)
+        self.buffer.append((event, text))
+        self.writer.write(self.path, text)
+        return event, text
+
+    def buffered(self, after: int) -> list[tuple]:
+        return [entry for entry in self.buffer if entry[0]["seq"] > after]
+
+    def covers(self, after: int) -> bool:
+        """Whether every event after seq `after` is still in the buffer."""
+        return not self.buffer or after >= self.buffer[0][0]["seq"] - 1
+
+    def read(self, after: int, limit: int = None, buffered=None) -> list[tuple]:
+        """
+        (event, serialized event) pairs with seq > after, oldest first. Events older
+        than the buffer come from disk; buffered is a snapshot of the buffer taken
+        under the log's lock (the disk part is read without it).
+        """
+        buffered = self.buffered(after) if buffered is None else buffered
+        if self.covers(after):
+            return buffered[:limit] if limit else buffered
+        self.writer.wait_for(self.path)
+        disk = itertools.takewhile(
+            lambda entry: not buffered or entry[0]["seq"] < buffered[0][0]["seq"], self._read_disk(after)
+        )
+        return list(itertools.islice(itertools.chain(disk, buffered), limit))
+
+    def _read_disk(self, after: int):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as log_file:
+            for line in log_file:
+                entry = self._parse(line.rstrip("\n"))
+                if entry is not None and entry[0]["seq"] > after:
+                    yield entry
+
+
+class EventLog:
+    """
+    Per-run event logs with sequence numbers, so clients can resume a stream
+    from the last event id they saw instead of re-running anything.
+
+    Appends are buffered in memory and written by a background thread. Logs not
+    written to for retention_hours are deleted every prune_interval seconds.
+    """
+    def __init__(self, directory: str, buffer_size: int = 500, max_runs: int = 200,
+                 retention_hours: float = 168, prune_interval: float = 3600):
+        self.directory = directory
+        self.buffer_size = buffer_size
+        self.max_runs = max_runs
+        self.retention_seconds = retention_hours * 3600
+        self._runs = OrderedDict()
+        self._lock = threading.Lock()
+        self.prune_interval = prune_interval
+        os.makedirs(directory, exist_ok=True)
+        self.writer = LogWriter()
+        self._closed = threading.Event()
+        self._pruner = threading.Thread(target=self._prune_loop, name="event-log-pruner", daemon=True)
+        self._pruner.start()
+
+    @staticmethod
+    def is_valid_task_id(task_id) -> bool:
+        return isinstance(task_id, str) and _TASK_ID_PATTERN.fullmatch(task_id) is not None
+
+    def _path(self, task_id: str) -> str:
+        return os.path.join(self.directory, f"{task_id}.jsonl")
+
+    def _cached(self, task_id: str):
+        """The run's log if it is in memory; never touches the disk. Call with the lock held."""
+        run_log = self._runs.get(task_id)
+        if run_log is not None:
+            self._runs.move_to_end(task_id)
+        return run_log
+
+    def is_loaded(self, task_id: str) -> bool:
+        with self._lock:
+            return task_id in self._runs
+
+    def load(self, task_id: str, create: bool = False):
+        """
+        Bring a run's log into memory, reading the tail of its file. Blocking: the
+        event loop goes through ensure_loaded. Returns the run's log, or None when
+        it has none and create is not set.
+        """
+        with self._lock:
+            run_log = self._cached(task_id)
+        if run_log is not None:
+            return run_log
+        path = self._path(task_id)
+        # an evicted run may still have lines queued; its tail must include them
+        self.writer.wait_for(path)
+        if not create and not os.path.exists(path):
+            return None
+        loaded = RunEventLog(path, self.buffer_size, self.writer)
+        with self._lock:
+            run_log = self._runs.setdefault(task_id, loaded)
+            self._runs.move_to_end(task_id)
+            while len(self._runs) > self.max_runs:
+                self._runs.popitem(last=False)
+        return run_log
+
+    async def ensure_loaded(self, task_ids, create: bool = False):
+        """Load the given runs' logs on a worker thread, so later lookups on the loop stay in memory."""
+        for task_id in task_ids:
+            if self.is_valid_task_id(task_id) and not self.is_loaded(task_id):
+                await asyncio.to_thread(self.load, task_id, create)
+
+    def append(self, message: dict):
+        """
+        Record a message and return (event, serialized event). Messages without a
+        valid task_id are passed through unrecorded. The run is loaded from disk if
+        it isn't in memory, so callers on the event loop ensure_loaded it first.
+        """
+        task_id = message.get("task_id")
+        if not self.is_valid_task_id(task_id):
+            return message, json.dumps(message)
+        with self._lock:
+            run_log = self._cached(task_id)
+            if run_log is not None:
+                return run_log.append(message)
+        run_log = self.load(task_id, create=True)
+        with self._lock:
+            return run_log.append(message)
+
+    def read_entries(self, task_id: str, after: int = 0, limit: int = None) -> list[tuple]:
+        """Logged entries after seq `after`, from memory and, for older ones, from disk. Blocking."""
+        if not self.is_valid_task_id(task_id):
+            return []
+        run_log = self.load(task_id)
+        if run_log is None:
+            return []
+        with self._lock:
+            buffered = run_log.buffered(after)
+        return run_log.read(after, limit, buffered)
+
+    def recent_entries(self, task_id: str, after: int = 0) -> tuple[list, bool]:
+        """
+        Only the buffered entries after seq `after`, for replays on the event loop,
+        and whether older ones were left out (those can be paged over HTTP). Runs
+        that aren't loaded have nothing to replay.
+        """
+        if not self.is_valid_task_id(task_id):
+            return [], False
+        with self._lock:
+            run_log = self._cached(task_id)
+            if run_log is None:
+                return [], False
+            return run_log.buffered(after), not run_log.covers(after)
+
+    def read(self, task_id: str, after: int = 0, limit: int = None) -> list[dict]:
+        return [event for event, _ in self.read_entries(task_id, after, limit)]
+
+    def last_seq(self, task_id: str) -> int:
+        if not self.is_valid_task_id(task_id):
+            return 0
+        run_log = self.load(task_id)
+        return run_log.last_seq if run_log else 0
+
+    def _prune_loop(self):
+        while not self._closed.wait(self.prune_interval):
+            try:
+                self.prune()
+            except Exception as e:
+                logger.error(f"Event log pruning failed: {e}")
+
+    def prune(self):
+        """Delete the logs of runs that haven't logged anything for retention_hours."""
+        cutoff = time.time() - self.retention_seconds
+        removed = 0
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not name.endswith(".jsonl"):
+                continue
+            try:
+                if os.path.getmtime(path) >= cutoff:
+                    continue
+                with self._lock:
+                    self._runs.pop(name[:-len(".jsonl")], None)
+                    os.remove(path)
+                removed += 1
+            except OSError:
+                continue
+        if removed:
+            logger.info(f"Pruned {removed} event log(s) older than {self.retention_seconds / 3600:g}h")
+
+    def close(self):
+        """Stop pruning and write out everything still queued."""
+        self._closed.set()
+        self.writer.close()
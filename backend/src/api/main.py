@@ -1,18 +1,52 @@
-from fastapi import FastAPI, Request, WebSocket
-from fastapi.responses import PlainTextResponse
-from fastapi.middleware.cors import CORSMiddleware
+import logging
+import os
+import json
 import asyncio
+from fastapi import FastAPI, Query, Request, WebSocket
+from fastapi.responses import PlainTextResponse, JSONResponse, Response
+from fastapi.middleware.cors import CORSMiddleware
 
 from ..agent.orchestrator import MomentumAgent
-from .websocket_manager import ConnectionManager
-from ..connectors.slack_connector import app_handler, slack_app
+from ..agent.scheduler import JobScheduler, QueueFullError
+from ..agent.review_waiter import ReviewWaiter
+from ..agent.checkpoint_store import get_checkpoint_store
+from .websocket_manager import WebSocketManager
+from .event_log import EventLog
+from ..connectors.slack_connector import get_app_handler, register_command
+from ..connectors.resources import warm_up, aclose_resources
+from ..connectors.container_pool import shutdown_container_pools
+from ..connectors.async_executor import executor_stats, shutdown_executors
+from ..connectors.llm_cache import get_llm_cache
+from ..connectors.github_connector import verify_webhook_signature, rate_limit_status
 from ..config.config_loader import get_config
+from ..observability.logs import configure_logging
+from ..observability.metrics import QUEUE_DEPTH, RUNNING_JOBS, render_latest
+
+logger = logging.getLogger(__name__)
 
 config = get_config()
+configure_logging(config.get_section('logging'))
 api_config = config.get_section('api')
 
 app = FastAPI()
-manager = ConnectionManager()
+websocket_config = api_config.get('websocket', {})
+event_log_config = api_config.get('event_log', {})
+event_log = EventLog(
+    event_log_config.get('directory', 'backend/event_logs'),
+    buffer_size=event_log_config.get('buffer_size', 500),
+    max_runs=event_log_config.get('max_runs', 200),
+    retention_hours=event_log_config.get('retention_hours', 168),
+    prune_interval=event_log_config.get('prune_interval', 3600)
+)
+manager = WebSocketManager(
+    max_queue=websocket_config.get('send_queue_size', 256),
+    send_timeout=websocket_config.get('send_timeout', 10),
+    event_log=event_log
+)
+scheduler_config = config.get_section('scheduler')
+scheduler = JobScheduler.from_config(scheduler_config)
+QUEUE_DEPTH.set_function(scheduler.queue_depth)
+RUNNING_JOBS.set_function(scheduler.running_count)
 
 origins = api_config['cors_origins']
 app.add_middleware(
@@ -23,42 +57,258 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-async def run_agent_and_notify(prompt: str):
-    agent = MomentumAgent(websocket_manager=manager)
+def resume_parked_run(parked):
+    # Raises QueueFullError when busy; the waiter keeps the run parked and retries.
+    return scheduler.submit(
+        lambda job: parked.agent.resume(parked.prompt, parked.wake_reason),
+        priority=scheduler_config['default_priority'],
+        label=f"review PR #{parked.pr_number} ({parked.agent.task_id})",
+        task_id=parked.agent.task_id
+    )
+
+agent_config = config.get_section('agent')
+review_waiter = ReviewWaiter.from_config(agent_config, resume_parked_run)
+parking_enabled = agent_config.get('review_parking', {}).get('enabled', False)
+checkpoint_store = get_checkpoint_store(config.get_section('checkpoints'))
+
+async def run_agent_and_notify(prompt: str, task_id: str):
+    agent = MomentumAgent(
+        websocket_manager=manager,
+        task_id=task_id,
+        review_waiter=review_waiter if parking_enabled else None,
+        checkpoint_store=checkpoint_store
+    )
     await agent.run(prompt)
 
+def resume_checkpointed_runs():
+    """
+    Pick up runs interrupted by the last shutdown from their last completed state.
+    """
+    if checkpoint_store is None:
+        return
+    for checkpoint in checkpoint_store.list_runs():
+        agent = MomentumAgent.from_checkpoint(
+            checkpoint,
+            websocket_manager=manager,
+            review_waiter=review_waiter if parking_enabled else None,
+            checkpoint_store=checkpoint_store
+        )
+        prompt = checkpoint['prompt']
+        if checkpoint['state'] == 'PARKED' and parking_enabled:
+            review_waiter.park(agent.pull_request_info['number'], agent, prompt)
+            continue
+        if checkpoint['state'] == 'PARKED':
+            runner = lambda job, agent=agent, prompt=prompt: agent.resume(prompt, "restart")
+        else:
+            runner = lambda job, agent=agent, prompt=prompt: agent.run(prompt)
+        scheduler.submit(
+            runner,
+            priority=scheduler_config['default_priority'],
+            label=prompt[:80],
+            task_id=checkpoint['task_id'],
+            force=True
+        )
+        logger.info(f"Resuming run {checkpoint['task_id']} from {checkpoint['state']}")
+
+event_loop = None  # the server's loop, for handing work over from other threads
+
+def submit_agent_run(prompt: str, priority: int):
+    return scheduler.submit(
+        lambda job: run_agent_and_notify(prompt, job.task_id),
+        priority=priority,
+        label=prompt[:80]
+    )
+
+@app.on_event("startup")
+async def startup():
+    global event_loop
+    event_loop = asyncio.get_running_loop()
+    scheduler.start()
+    review_waiter.start()
+    if config.get('config_watcher.enabled', False):
+        config.start_watching(config.get('config_watcher.poll_interval', 2))
+    if config.get('checkpoints.resume_on_startup', True):
+        resume_checkpointed_runs()
+    if config.get('resources.warm_up.enabled', False):
+        warm_up(config)
+
+@app.on_event("shutdown")
+async def shutdown():
+    config.stop_watching()
+    await review_waiter.shutdown()
+    await scheduler.shutdown()
+    await aclose_resources()
+    shutdown_container_pools()
+    shutdown_executors()
+    await manager.close_all()
+    await asyncio.to_thread(event_log.close)
+
 @app.get("/")
 def read_root():
     return {"Status": "Momentum Backend is Running"}
 
 @app.post(api_config['agent_run_endpoint'])
 async def run_agent_endpoint(request: Request):
-    data = await request.json()
-    prompt = data.get("prompt")
+    try:
+        data = await request.json()
+    except json.JSONDecodeError:
+        return PlainTextResponse("Request body must be JSON", status_code=400)
+    prompt = data.get("prompt") if isinstance(data, dict) else None
     if not prompt:
         return PlainTextResponse("No prompt provided", status_code=400)
-    
-    asyncio.create_task(run_agent_and_notify(prompt))
-    
-    return {"message": "Agent run started. Connect to WebSocket for live updates."}
+
+    priority = data.get("priority", scheduler_config['default_priority'])
+    if not isinstance(priority, int) or isinstance(priority, bool):
+        return PlainTextResponse("priority must be an integer", status_code=400)
+    try:
+        job = submit_agent_run(prompt, priority)
+    except QueueFullError as e:
+        return JSONResponse(
+            {"message": "Too many agent runs queued. Try again later.", "retry_after": e.retry_after},
+            status_code=429,
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+    return JSONResponse(
+        {"message": "Agent run queued. Connect to WebSocket for live updates.", **job.to_dict()},
+        status_code=202
+    )
+
+@app.get(api_config['agent_tasks_endpoint'])
+def scheduler_status():
+    return {**scheduler.stats(), "review_waiter": review_waiter.stats(), "websocket": manager.stats()}
+
+@app.get(api_config['agent_tasks_endpoint'] + "/{task_id}")
+def task_status(task_id: str):
+    job = scheduler.get(task_id)
+    parked = review_waiter.find(task_id)
+    if parked is not None:
+        # Its job finished when it parked; the run itself is still waiting on review.
+        status = job.to_dict() if job is not None else {"task_id": task_id}
+        return {**status, "status": "parked", "pr_number": parked.pr_number, "parked_at": parked.parked_at}
+    if job is None:
+        return PlainTextResponse("Unknown task id", status_code=404)
+    return job.to_dict()
+
+@app.get(api_config['agent_tasks_endpoint'] + "/{task_id}/events")
+def task_events(task_id: str, after: int = Query(0, ge=0), limit: int = Query(None, ge=1)):
+    page_size = event_log_config.get('page_size', 100)
+    limit = min(limit or page_size, page_size)
+    events = event_log.read(task_id, after, limit)
+    next_after = events[-1]['seq'] if events else after
+    return {
+        "task_id": task_id,
+        "events": events,
+        "next_after": next_after,
+        "has_more": next_after < event_log.last_seq(task_id),
+    }
+
+@app.post(api_config['agent_tasks_endpoint'] + "/{task_id}/cancel")
+async def cancel_task(task_id: str):
+    if await review_waiter.cancel(task_id):
+        job = scheduler.get(task_id)
+        result = {**(job.to_dict() if job is not None else {"task_id": task_id}), "status": "cancelled"}
+    elif scheduler.cancel(task_id):
+        result = scheduler.get(task_id).to_dict()
+    else:
+        return PlainTextResponse("Task not found or already finished", status_code=404)
+    if checkpoint_store is not None:
+        await asyncio.to_thread(checkpoint_store.cancel, task_id)
+    return result
+
+@app.get(api_config['executors_endpoint'])
+def executors_status():
+    return {"executors": executor_stats(), "github_rate_limits": rate_limit_status()}
+
+@app.get(api_config['llm_cache_endpoint'])
+def llm_cache_status():
+    cache = get_llm_cache(config.get('models.llm.cache', {}))
+    return cache.get_stats() if cache is not None else {"enabled": False}
+
+@app.get(api_config['metrics_endpoint'])
+async def metrics():
+    # async so the scheduler gauges are read on the event loop that owns the jobs
+    body, content_type = render_latest()
+    return Response(body, media_type=content_type)
+
+@app.post(api_config['github_webhook_endpoint'])
+async def github_webhook(request: Request):
+    body = await request.body()
+    secret = os.getenv("GITHUB_WEBHOOK_SECRET")
+    if not secret:
+        # Unsigned deliveries could wake or close any parked run; parked runs still get polled.
+        return PlainTextResponse("Webhooks are disabled: GITHUB_WEBHOOK_SECRET is not set", status_code=403)
+    if not verify_webhook_signature(secret, body, request.headers.get("X-Hub-Signature-256")):
+        return PlainTextResponse("Invalid signature", status_code=401)
+
+    event = request.headers.get("X-GitHub-Event", "")
+    try:
+        payload = json.loads(body or b"{}")
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return PlainTextResponse("Invalid JSON payload", status_code=400)
+    if not isinstance(payload, dict):
+        return PlainTextResponse("Invalid JSON payload", status_code=400)
+    pr_number = (payload.get("pull_request") or {}).get("number")
+    if pr_number is None or not review_waiter.is_parked(pr_number):
+        return {"handled": False}
+
+    if event == "pull_request" and payload.get("action") == "closed":
+        handled = await review_waiter.close(pr_number, "pull request closed")
+    elif event == "pull_request_review" and (payload.get("review") or {}).get("state") == "approved":
+        handled = await review_waiter.close(pr_number, "pull request approved")
+    elif event in ("pull_request_review", "pull_request_review_comment"):
+        handled = review_waiter.notify(pr_number, event)
+    else:
+        handled = False
+    return {"handled": handled}
 
 @app.websocket(api_config['websocket_endpoint'])
 async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+    # ?task_id=a,b limits the stream to those runs; clients can also send subscribe/unsubscribe messages.
+    # &after=<seq> replays logged events newer than the last one the client saw.
+    task_ids = [t for t in websocket.query_params.get("task_id", "").split(",") if t]
+    after = websocket.query_params.get("after")
+    await manager.connect(websocket, task_ids, int(after) if after and after.isdigit() else None)
     try:
         while True:
-            await websocket.receive_text()
+            await manager.handle_client_message(websocket, await websocket.receive_text())
     except Exception:
+        pass
+    finally:
         manager.disconnect(websocket)
 
 @app.post(api_config['slack_events_endpoint'])
 async def slack_events_endpoint(req: Request):
-    return await app_handler.handle(req)
+    return await get_app_handler().handle(req)
 
 slack_config = config.get_section('slack')
-@slack_app.command(slack_config['command'])
-async def handle_slack_command_for_agent(ack, body, say, logger):
+@register_command(slack_config['command'])
+def handle_slack_command(ack, body, say, client, logger):
+    """
+    Bolt runs listeners on its own worker threads, so the run is submitted on the
+    event loop that owns the scheduler and this thread waits for the outcome.
+    """
+    ack()
     prompt = body.get('text', '').strip()
-    if prompt:
-        logger.info(f"Triggering agent from Slack with prompt: {prompt}")
-        asyncio.create_task(run_agent_and_notify(prompt))
\ No newline at end of file
+    if not prompt:
+        say(slack_config['no_prompt_error'])
+        return
+
+    async def submit():
+        return submit_agent_run(prompt, scheduler_config['slack_priority'])
+
+    try:
+        job = asyncio.run_coroutine_threadsafe(submit(), event_loop).result(timeout=10)
+    except QueueFullError as e:
+        say(slack_config['busy_response'].format(retry_after=e.retry_after))
+        return
+    except Exception as e:
+        logger.error(f"Error queueing Slack agent run: {e}")
+        say(slack_config['error_response'])
+        return
+
+    logger.info(f"Queued Slack agent run {job.task_id} for user {body['user_id']}: {prompt}")
+    try:
+        client.chat_postMessage(channel=body['user_id'], text=slack_config['initial_response'].format(prompt=prompt))
+    except Exception as e:
+        logger.error(f"Error replying to Slack command: {e}")
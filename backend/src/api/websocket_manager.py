@@ -1,20 +1,200 @@
+import logging
 from fastapi import WebSocket
+from collections import deque
+import asyncio
 import json
+import time
+
+from ..observability.metrics import WEBSOCKET_CONNECTIONS, WEBSOCKET_DROPPED, WEBSOCKET_SEND_LAG
+
+logger = logging.getLogger(__name__)
+
+
+class ClientConnection:
+    """
+    One WebSocket client with its own bounded send queue and writer task, so a
+    slow or dead browser only ever delays itself.
+    """
+    def __init__(self, websocket: WebSocket, max_queue: int, send_timeout: float, task_ids=()):
+        self.websocket = websocket
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout
+        self.task_ids = set(task_ids) if task_ids else None  # None means every task
+        self.queue = deque()  # (message, text, enqueued_at)
+        self.ready = asyncio.Event()
+        self.dropped = 0
+        self.coalesced = 0
+        self.backlog = 0  # replayed history at the head of the queue, exempt from the bound
+        self.writer = None
+
+    def wants(self, task_id) -> bool:
+        return self.task_ids is None or task_id in self.task_ids
+
+    def enqueue(self, message: dict, text: str):
+        """
+        Queue a pre-serialized message. When the queue is full, streamed tokens are
+        merged into the previous token for the same task, then the oldest token
+        events are dropped, and only then the oldest status updates.
+        """
+        if len(self.queue) >= self.max_queue + self.backlog:
+            last_message, _, enqueued_at = self.queue[-1]
+            if message.get("type") == "token" and self._same_stream(last_message, message):
+                merged = {**last_message, "message": last_message["message"] + message["message"]}
+                self.queue[-1] = (merged, json.dumps(merged), enqueued_at)
+                self.coalesced += 1
+                return
+            self._drop_one()
+        self.queue.append((message, text, time.monotonic()))
+        self.ready.set()
+
+    def replay(self, entries):
+        """Queue logged history ahead of live traffic; it is never dropped."""
+        now = time.monotonic()
+        self.queue.extend((message, text, now) for message, text in entries)
+        self.backlog += len(entries)
+        if entries:
+            self.ready.set()
+
+    @staticmethod
+    def _same_stream(first: dict, second: dict) -> bool:
+        return (first.get("type") == "token" and first.get("task_id") == second.get("task_id")
+                and first.get("state") == second.get("state") and first.get("file") == second.get("file"))
+
+    def _drop_one(self):
+        for index in range(self.backlog, len(self.queue)):
+            if self.queue[index][0].get("type") == "token":
+                del self.queue[index]
+                break
+        else:
+            del self.queue[self.backlog]
+        self.dropped += 1
+        WEBSOCKET_DROPPED.inc()
+
+    async def run_writer(self, on_failure):
+        try:
+            while True:
+                await self.ready.wait()
+                while self.queue:
+                    _, text, enqueued_at = self.queue.popleft()
+                    self.backlog = max(self.backlog - 1, 0)
+                    await asyncio.wait_for(self.websocket.send_text(text), self.send_timeout)
+                    WEBSOCKET_SEND_LAG.observe(time.monotonic() - enqueued_at)
+                self.ready.clear()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Dead socket or a client too slow to take a single message in time.
+            logger.warning(f"Dropping WebSocket client: {e!r}")
+            on_failure(self)
+
 
 class WebSocketManager:
-    def __init__(self):
-        self.active_connections: list[WebSocket] = []
+    def __init__(self, max_queue: int = 256, send_timeout: float = 10.0, event_log=None):
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout
+        self.event_log = event_log
+        self.active_connections: dict[WebSocket, ClientConnection] = {}
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket, task_ids=(), after: int = None):
+        """
+        Register a client. With after set, the subscribed runs' logged events newer
+        than that sequence number are replayed before live updates.
+        """
         await websocket.accept()
-        self.active_connections.append(websocket)
-        print("WebSocket Client Connected")
+        if after is not None and self.event_log is not None:
+            await self.event_log.ensure_loaded(task_ids)
+        connection = ClientConnection(websocket, self.max_queue, self.send_timeout, task_ids)
+        connection.writer = asyncio.create_task(connection.run_writer(self._on_writer_failure))
+        self.active_connections[websocket] = connection
+        # No await between registering and replaying, so no live event can slip in between.
+        if after is not None:
+            self._replay(connection, task_ids, after)
+        WEBSOCKET_CONNECTIONS.set(len(self.active_connections))
+        logger.debug("WebSocket Client Connected")
+
+    def _replay(self, connection: ClientConnection, task_ids, after: int):
+        if self.event_log is None:
+            return
+        for task_id in task_ids:
+            entries, truncated = self.event_log.recent_entries(task_id, after)
+            if truncated:
+                # Older history is only paged over HTTP, never read from disk on the loop.
+                marker = {"type": "replay_truncated", "task_id": task_id, "after": after,
+                          "first_seq": entries[0][0]["seq"] if entries else after + 1}
+                entries = [(marker, json.dumps(marker))] + entries
+            connection.replay(entries)
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-        print("WebSocket Client Disconnected")
+        connection = self.active_connections.pop(websocket, None)
+        if connection is None:
+            return
+        if connection.writer is not None and connection.writer is not asyncio.current_task():
+            connection.writer.cancel()
+        WEBSOCKET_CONNECTIONS.set(len(self.active_connections))
+        logger.debug("WebSocket Client Disconnected")
+
+    def _on_writer_failure(self, connection: ClientConnection):
+        self.disconnect(connection.websocket)
+        asyncio.create_task(self._close_quietly(connection.websocket))
+
+    @staticmethod
+    async def _close_quietly(websocket: WebSocket):
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+
+    async def handle_client_message(self, websocket: WebSocket, text: str):
+        """
+        Apply a subscription request from a client:
+        {"action": "subscribe" | "unsubscribe", "task_ids": [...], "after": <seq, optional>}
+        """
+        connection = self.active_connections.get(websocket)
+        if connection is None:
+            return
+        try:
+            request = json.loads(text)
+        except json.JSONDecodeError:
+            return
+        if not isinstance(request, dict):
+            return
+        task_ids = set(request.get("task_ids") or [])
+        if request.get("action") == "subscribe":
+            replay = isinstance(request.get("after"), int)
+            if replay and self.event_log is not None:
+                await self.event_log.ensure_loaded(sorted(task_ids))
+            # No await between subscribing and replaying, so no live event can slip in between.
+            connection.task_ids = (connection.task_ids or set()) | task_ids
+            if replay:
+                self._replay(connection, sorted(task_ids), request["after"])
+        elif request.get("action") == "unsubscribe" and connection.task_ids is not None:
+            connection.task_ids -= task_ids
 
     async def broadcast(self, message: dict):
-        print(f"Broadcasting message: {message}")
-        for connection in self.active_connections:
-            await connection.send_text(json.dumps(message)) 
\ No newline at end of file
+        """
+        Hand the message to every interested client's queue without waiting on any socket.
+        Everything except streamed tokens is first recorded in the event log.
+        """
+        if self.event_log is not None and message.get("type") != "token":
+            await self.event_log.ensure_loaded([message.get("task_id")], create=True)
+            message, text = self.event_log.append(message)
+        else:
+            text = json.dumps(message)
+        task_id = message.get("task_id")
+        for connection in list(self.active_connections.values()):
+            if connection.wants(task_id):
+                connection.enqueue(message, text)
+
+    def stats(self) -> dict:
+        connections = list(self.active_connections.values())
+        return {
+            "connections": len(connections),
+            "queued": sum(len(c.queue) for c in connections),
+            "dropped": sum(c.dropped for c in connections),
+            "coalesced": sum(c.coalesced for c in connections),
+        }
+
+    async def close_all(self):
+        for websocket in list(self.active_connections):
+            self.disconnect(websocket)
+            await self._close_quietly(websocket)
@@ -1,85 +1,218 @@
 import yaml
 import os
+import string
+import threading
+import time
 from pathlib import Path
+from types import MappingProxyType
 from typing import Dict, Any, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
-class ConfigLoader:
+_MISSING = object()
+
+
+def _check_template(name: str, text: str):
+    """Fail on malformed format syntax (e.g. an unclosed brace) at load time."""
+    try:
+        list(string.Formatter().parse(text))
+    except ValueError as e:
+        raise ValueError(f"Invalid template {name}: {e}") from None
+
+
+def _freeze(value):
+    """Recursively turn dicts into read-only mappings and lists into tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _flatten(value, prefix: str, out: dict):
+    out[prefix] = value
+    if isinstance(value, MappingProxyType):
+        for key, item in value.items():
+            _flatten(item, f"{prefix}.{key}", out)
+
+
+class ConfigSnapshot:
     """
-    Centralized configuration loader for the Momentum agent.
-    Loads and validates configuration from YAML file.
+    Immutable, validated view of one version of the configuration.
+
+    Every dotted key path is precomputed, so lookups are a single dict access.
+    Languages are indexed by file extension and prompt/status templates are
+    syntax-checked up front, so a malformed template fails the load instead of a run.
     """
-    
-    def __init__(self, config_path: Optional[str] = None):
-        if config_path is None:
-            config_path = os.path.join(os.path.dirname(__file__), '..', '..', 'config.yaml')
-        
-        self.config_path = Path(config_path)
-        self._config = None
-        self._load_config()
-    
-    def _load_config(self):
-        """Load configuration from YAML file."""
-        try:
-            if not self.config_path.exists():
-                raise FileNotFoundError(f"Configuration file not found: {self.config_path}")
-            
-            with open(self.config_path, 'r', encoding='utf-8') as file:
-                self._config = yaml.safe_load(file)
-            
-            logger.info(f"Configuration loaded successfully from {self.config_path}")
-            self._validate_config()
-            
-        except Exception as e:
-            logger.error(f"Failed to load configuration: {e}")
-            raise
-    
-    def _validate_config(self):
+
+    def __init__(self, raw: Dict[str, Any], source: str = None, version: int = 1):
+        self.source = source
+        self.version = version
+        self.loaded_at = time.time()
+        self._validate(raw)
+
+        for name, prompt in raw['prompts'].items():
+            for key, text in prompt.items():
+                if isinstance(text, str):
+                    _check_template(f"prompts.{name}.{key}", text)
+        for category, messages in raw['status_messages'].items():
+            for key, text in messages.items():
+                _check_template(f"status_messages.{category}.{key}", text)
+        self._root = _freeze(raw)
+
+        self._flat = {}
+        for key, value in self._root.items():
+            _flatten(value, key, self._flat)
+
+        self._languages_by_extension = {}
+        for name, language in self._root['languages'].items():
+            extension = language.get('extension')
+            if extension:
+                self._languages_by_extension[extension] = MappingProxyType({'name': name, **language})
+        self.extensions = tuple(self._languages_by_extension)
+
+    @staticmethod
+    def _validate(raw):
         """Validate required configuration sections exist."""
+        if not isinstance(raw, dict):
+            raise ValueError("Configuration root must be a mapping")
         required_sections = [
-            'models', 'vector_db', 'file_system', 'git', 
+            'models', 'vector_db', 'file_system', 'git',
             'agent', 'languages', 'prompts', 'status_messages'
         ]
-        
+
         for section in required_sections:
-            if section not in self._config:
+            if section not in raw:
                 raise ValueError(f"Missing required configuration section: {section}")
-    
+
     def get(self, key_path: str, default: Any = None) -> Any:
         """
         Get configuration value using dot notation.
-        
+
         Args:
             key_path: Dot-separated path to the configuration value (e.g., 'models.embedding.name')
             default: Default value to return if key is not found
-            
+
         Returns:
             Configuration value or default
         """
-        try:
-            keys = key_path.split('.')
-            value = self._config
-            
-            for key in keys:
-                value = value[key]
-            
+        value = self._flat.get(key_path, _MISSING)
+        if value is not _MISSING:
             return value
-        
-        except (KeyError, TypeError):
-            if default is not None:
-                return default
-            raise KeyError(f"Configuration key not found: {key_path}")
-    
+        if default is not None:
+            return default
+        raise KeyError(f"Configuration key not found: {key_path}")
+
     def get_section(self, section: str) -> Dict[str, Any]:
         """Get entire configuration section."""
         return self.get(section, {})
-    
+
+    def language_for_extension(self, extension: str):
+        """Language record (with its 'name') for a file extension such as '.py', or None."""
+        return self._languages_by_extension.get(extension)
+
+    def prompt(self, prompt_type: str):
+        """The full prompt record, e.g. {'system': ..., 'template': ...}."""
+        return self.get(f'prompts.{prompt_type}')
+
+    def status_message(self, category: str, message_type: str) -> str:
+        return self.get(f'status_messages.{category}.{message_type}')
+
+
+class ConfigLoader:
+    """
+    Centralized configuration loader for the Momentum agent.
+    Loads and validates configuration from YAML file.
+
+    Each load produces a new ConfigSnapshot that replaces the previous one in a
+    single reference swap; callers that hold a snapshot keep a consistent view.
+    """
+
+    def __init__(self, config_path: Optional[str] = None):
+        if config_path is None:
+            config_path = os.path.join(os.path.dirname(__file__), '..', '..', 'config.yaml')
+
+        self.config_path = Path(config_path)
+        self._snapshot = None
+        self._mtime = None
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._stop_watching = threading.Event()
+        self._load_config()
+
+    def _load_config(self):
+        """Load configuration from YAML file."""
+        try:
+            if not self.config_path.exists():
+                raise FileNotFoundError(f"Configuration file not found: {self.config_path}")
+
+            with self._reload_lock:
+                mtime = self.config_path.stat().st_mtime
+                with open(self.config_path, 'r', encoding='utf-8') as file:
+                    raw = yaml.safe_load(file)
+                version = self._snapshot.version + 1 if self._snapshot else 1
+                snapshot = ConfigSnapshot(raw, source=str(self.config_path), version=version)
+                self._snapshot, self._mtime = snapshot, mtime
+
+            logger.info(f"Configuration loaded successfully from {self.config_path} (version {version})")
+
+        except Exception as e:
+            logger.error(f"Failed to load configuration: {e}")
+            raise
+
+    def snapshot(self) -> ConfigSnapshot:
+        """The current configuration version; hold on to it for a consistent view."""
+        return self._snapshot
+
+    def get(self, key_path: str, default: Any = None) -> Any:
+        """Get configuration value from the current snapshot using dot notation."""
+        return self._snapshot.get(key_path, default)
+
+    def get_section(self, section: str) -> Dict[str, Any]:
+        """Get entire configuration section."""
+        return self._snapshot.get_section(section)
+
     def reload(self):
         """Reload configuration from file."""
         self._load_config()
 
+    def reload_if_changed(self) -> bool:
+        """
+        Reload when the file's mtime changed. A file that fails to load or validate
+        is logged and the current snapshot stays in place.
+        """
+        try:
+            mtime = self.config_path.stat().st_mtime
+        except OSError:
+            return False
+        if mtime == self._mtime:
+            return False
+        try:
+            self._load_config()
+            return True
+        except Exception:
+            # Don't retry the same broken file on every poll; wait for the next edit.
+            self._mtime = mtime
+            return False
+
+    def start_watching(self, poll_interval: float = 2.0):
+        """Poll the config file in a daemon thread and swap in new snapshots."""
+        if self._watcher is not None:
+            return
+        self._stop_watching.clear()
+
+        def watch():
+            while not self._stop_watching.wait(poll_interval):
+                self.reload_if_changed()
+
+        self._watcher = threading.Thread(target=watch, name="config-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop_watching.set()
+        self._watcher = None
+
 # Global configuration instance
 _config_instance = None
 
@@ -90,43 +223,19 @@ def get_config() -> ConfigLoader:
         _config_instance = ConfigLoader()
     return _config_instance
 
-def reload_config():
-    """Reload the global configuration."""
-    global _config_instance
-    if _config_instance:
-        _config_instance.reload()
-    else:
-        _config_instance = ConfigLoader()
-
 # Convenience functions for common configuration access patterns
 def get_model_config(model_type: str) -> Dict[str, Any]:
     """Get model configuration for embedding or llm."""
     return get_config().get_section(f'models.{model_type}')
 
-def get_language_config(language: str) -> Dict[str, Any]:
-    """Get language-specific configuration."""
-    return get_config().get_section(f'languages.{language}')
-
-def get_prompt_template(prompt_type: str) -> str:
-    """Get prompt template."""
-    return get_config().get(f'prompts.{prompt_type}.template')
-
-def get_status_message(category: str, message_type: str) -> str:
-    """Get status message template."""
-    return get_config().get(f'status_messages.{category}.{message_type}')
-
 def get_file_paths() -> Dict[str, str]:
     """Get default file paths."""
     return get_config().get_section('file_system')
 
-def get_agent_config() -> Dict[str, Any]:
-    """Get agent behavior configuration."""
-    return get_config().get_section('agent')
-
 def get_git_config() -> Dict[str, Any]:
     """Get git configuration."""
     return get_config().get_section('git')
 
 def get_vector_db_config() -> Dict[str, Any]:
     """Get vector database configuration."""
-    return get_config().get_section('vector_db')
\ No newline at end of file
+    return get_config().get_section('vector_db')
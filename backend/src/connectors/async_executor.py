@@ -0,0 +1,136 @@
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from ..observability.metrics import CONNECTOR_CALL, observe_duration
+
+
+class BoundedExecutor:
+    """
+    Thread pool for one kind of blocking resource (git, docker, http) with
+    per-call timeouts and saturation counters.
+    """
+    def __init__(self, name: str, max_workers: int, default_timeout: float = None):
+        self.name = name
+        self.max_workers = max_workers
+        self.default_timeout = default_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-pool")
+        self._lock = threading.Lock()
+        self._counters = {"active": 0, "queued": 0, "completed": 0, "failed": 0,
+                          "timeouts": 0, "cancelled": 0, "peak_queued": 0}
+
+    def _bump(self, **deltas):
+        with self._lock:
+            for key, delta in deltas.items():
+                self._counters[key] += delta
+            self._counters["peak_queued"] = max(self._counters["peak_queued"], self._counters["queued"])
+
+    def _call(self, func, args, kwargs):
+        self._bump(queued=-1, active=1)
+        try:
+            with observe_duration(CONNECTOR_CALL, with_outcome=True, pool=self.name,
+                                  method=getattr(func, '__name__', 'call')):
+                result = func(*args, **kwargs)
+            self._bump(completed=1)
+            return result
+        except Exception:
+            self._bump(failed=1)
+            raise
+        finally:
+            self._bump(active=-1)
+
+    async def run(self, func, *args, timeout: float = None, **kwargs):
+        """
+        Run a blocking callable on this pool and await its result.
+
+        On timeout or cancellation a call that has not started yet is dropped; one
+        that is already running cannot be interrupted and finishes in the background.
+        """
+        self._bump(queued=1)
+        # Run in a copy of the caller's context so the run's trace id reaches the pool thread.
+        context = contextvars.copy_context()
+        future = self._executor.submit(context.run, self._call, func, args, kwargs)
+        timeout = timeout if timeout is not None else self.default_timeout
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            self._bump(timeouts=1)
+            if future.cancel():
+                self._bump(queued=-1)
+            raise TimeoutError(f"{self.name} call {getattr(func, '__name__', func)} timed out after {timeout}s")
+        except asyncio.CancelledError:
+            self._bump(cancelled=1)
+            if future.cancel():
+                self._bump(queued=-1)
+            raise
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+        stats["name"] = self.name
+        stats["max_workers"] = self.max_workers
+        stats["saturation"] = round(stats["active"] / self.max_workers, 2)
+        return stats
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class AsyncConnectorProxy:
+    """
+    Wraps a synchronous connector so every method call runs on a bounded pool.
+    `await proxy.method(*args, timeout=..)` — timeout is reserved for the pool.
+    """
+    def __init__(self, connector, executor: BoundedExecutor):
+        self._connector = connector
+        self._executor = executor
+
+    def __getattr__(self, name):
+        attr = getattr(self._connector, name)
+        if not callable(attr):
+            return attr
+
+        async def call(*args, timeout: float = None, **kwargs):
+            return await self._executor.run(attr, *args, timeout=timeout, **kwargs)
+        call.__name__ = name
+        return call
+
+
+class AsyncConnectorFacade:
+    """
+    Async view over the git, docker and GitHub connectors, each bound to its own pool.
+    """
+    def __init__(self, git=None, docker=None, github=None):
+        self.git = AsyncConnectorProxy(git, get_executor('git')) if git is not None else None
+        self.docker = AsyncConnectorProxy(docker, get_executor('docker')) if docker is not None else None
+        self.github = AsyncConnectorProxy(github, get_executor('http')) if github is not None else None
+
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(name: str) -> BoundedExecutor:
+    """Get the process-wide pool for a resource kind, sized from the `executors` config."""
+    with _executors_lock:
+        if name not in _executors:
+            from ..config.config_loader import get_config
+            pool_config = get_config().get_section('executors').get(name, {})
+            _executors[name] = BoundedExecutor(
+                name,
+                max_workers=pool_config.get('max_workers', 4),
+                default_timeout=pool_config.get('timeout'),
+            )
+        return _executors[name]
+
+
+def executor_stats() -> list[dict]:
+    with _executors_lock:
+        return [executor.stats() for executor in _executors.values()]
+
+
+def shutdown_executors():
+    with _executors_lock:
+        for executor in _executors.values():
+            executor.shutdown()
+        _executors.clear()
@@ -0,0 +1,69 @@
+import ast
+
+
+def _line_windows(lines: list[str], start: int, end: int, max_lines: int, max_chars: int, overlap: int):
+    """
+    Split lines[start:end] into windows bounded by max_lines and max_chars.
+    Yields (start, end) pairs of 0-based, end-exclusive line indexes.
+    """
+    window_start = start
+    while window_start < end:
+        window_end = window_start
+        size = 0
+        while window_end < end and window_end - window_start < max_lines:
+            size += len(lines[window_end])
+            if size > max_chars and window_end > window_start:
+                break
+            window_end += 1
+        yield window_start, window_end
+        if window_end >= end:
+            break
+        window_start = max(window_end - overlap, window_start + 1)
+
+
+def _python_spans(content: str, line_count: int):
+    """
+    Top-level function/class definitions (with decorators) and the module code
+    between them, as 0-based end-exclusive line spans.
+    """
+    tree = ast.parse(content)
+    spans = []
+    cursor = 0
+    for node in tree.body:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        first = min([node.lineno] + [d.lineno for d in node.decorator_list]) - 1
+        last = node.end_lineno
+        if first > cursor:
+            spans.append((cursor, first))
+        spans.append((first, last))
+        cursor = last
+    if cursor < line_count:
+        spans.append((cursor, line_count))
+    return spans
+
+
+def chunk_code(path: str, content: str, max_lines: int = 40, max_chars: int = 1200, overlap: int = 5):
+    """
+    Split a source file into embedding-sized chunks.
+
+    Python files are split on top-level function and class boundaries; anything
+    else (or any span that is still too large) falls back to overlapping line
+    windows. Yields (start_line, end_line, text) with 1-based inclusive lines.
+    """
+    lines = content.splitlines(keepends=True)
+    if not lines:
+        return
+
+    spans = [(0, len(lines))]
+    if path.endswith('.py'):
+        try:
+            spans = _python_spans(content, len(lines))
+        except (SyntaxError, ValueError):
+            pass
+
+    for span_start, span_end in spans:
+        for start, end in _line_windows(lines, span_start, span_end, max_lines, max_chars, overlap):
+            text = "".join(lines[start:end])
+            if text.strip():
+                yield start + 1, end, text
@@ -0,0 +1,249 @@
+import logging
+import time
+import threading
+import docker
+
+logger = logging.getLogger(__name__)
+
+
+class PooledContainer:
+    def __init__(self, container):
+        self.container = container
+        self.last_used = time.time()
+
+
+class ContainerPool:
+    """
+    Pool of pre-started sandbox containers for a single image.
+
+    Containers idle on `sleep infinity` with nothing mounted, so leasing one is a
+    health check instead of a cold start; the run's workspace is copied in by the
+    caller. Containers are single-use: released ones are destroyed and replaced
+    in the background, so nothing a run installs or writes reaches the next one.
+
+    A pool that hasn't leased anything for idle_timeout seconds scales down to no
+    idle containers unless keep_warm is set, so images that are no longer in use
+    (e.g. superseded dependency images) don't each hold warm containers.
+    """
+    def __init__(self, client, image: str, min_size: int = 1, max_size: int = 4, idle_timeout: int = 600,
+                 health_check_interval: int = 60, keep_warm: bool = False):
+        self.client = client
+        self.image = image
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.keep_warm = keep_warm
+        self.last_leased = time.time()
+
+        self._idle = []
+        self._leased = set()
+        self._creating = 0
+        self._checking = 0
+        self._cond = threading.Condition()
+        self._stopped = threading.Event()
+        self._wake = threading.Event()  # set to top up before the next health check is due
+        self._reaper = threading.Thread(target=self._reap_loop, name=f"container-pool-{image}", daemon=True)
+        self._reaper.start()
+
+    def _total(self) -> int:
+        return len(self._idle) + len(self._leased) + self._creating + self._checking
+
+    def _warm_size(self, now: float) -> int:
+        """Idle containers to keep ready: min_size while the pool is in use, else none."""
+        if self.keep_warm or now - self.last_leased <= self.idle_timeout:
+            return self.min_size
+        return 0
+
+    def _create(self):
+        run_kwargs = dict(
+            command="sleep infinity",
+            detach=True,
+            tty=True,
+            labels={"momentum.pool": self.image},
+        )
+        try:
+            container = self.client.containers.run(self.image, **run_kwargs)
+        except docker.errors.ImageNotFound:
+            logger.warning(f"Image {self.image} not found. Pulling from Docker Hub...")
+            self.client.images.pull(self.image)
+            container = self.client.containers.run(self.image, **run_kwargs)
+        logger.info(f"Warm container {container.short_id} started for pool {self.image}")
+        return container
+
+    def _is_healthy(self, container) -> bool:
+        try:
+            container.reload()
+            if container.status != "running":
+                return False
+            exit_code, _ = container.exec_run("true")
+            return exit_code == 0
+        except docker.errors.APIError:
+            return False
+
+    def _destroy(self, container):
+        try:
+            container.remove(force=True)
+            logger.debug(f"Removed pooled container {container.short_id}")
+        except docker.errors.APIError as e:
+            logger.error(f"Error removing pooled container: {e}")
+
+    def lease(self, timeout: float = 300):
+        """
+        Take a healthy container from the pool, starting one if under max_size.
+        Blocks up to timeout seconds when the pool is exhausted.
+        """
+        deadline = time.time() + timeout
+        with self._cond:
+            self.last_leased = time.time()
+        while True:
+            with self._cond:
+                while not self._idle and self._total() >= self.max_size:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise TimeoutError(f"No container available in pool {self.image}")
+                    self._cond.wait(remaining)
+
+                if self._idle:
+                    pooled = self._idle.pop()
+                else:
+                    pooled = None
+                    self._creating += 1
+
+            if pooled is None:
+                try:
+                    container = self._create()
+                finally:
+                    with self._cond:
+                        self._creating -= 1
+            elif self._is_healthy(pooled.container):
+                container = pooled.container
+            else:
+                self._destroy(pooled.container)
+                with self._cond:
+                    self._cond.notify()
+                continue
+
+            with self._cond:
+                self._leased.add(container.id)
+            self._wake.set()  # start warming its replacement
+            return container
+
+    def release(self, container):
+        """
+        Destroy a leased container and have the reaper start a fresh one in its place.
+        """
+        with self._cond:
+            self._leased.discard(container.id)
+        self._destroy(container)
+        with self._cond:
+            self._cond.notify()
+        self._wake.set()
+
+    def _top_up(self):
+        with self._cond:
+            # Keep the warm size ready to lease on top of the leased ones, within max_size.
+            warm = self._warm_size(time.time())
+            missing = max(0, min(warm - len(self._idle) - self._creating, self.max_size - self._total()))
+            self._creating += missing
+
+        for _ in range(missing):
+            try:
+                container = self._create()
+                with self._cond:
+                    self._idle.append(PooledContainer(container))
+                    self._cond.notify()
+            except docker.errors.DockerException as e:
+                logger.error(f"Error warming container for pool {self.image}: {e}")
+            finally:
+                with self._cond:
+                    self._creating -= 1
+
+    def _reap(self):
+        now = time.time()
+        to_check, to_destroy = [], []
+        with self._cond:
+            warm = self._warm_size(now)
+            surplus = len(self._idle) - warm
+            keep = []
+            # Oldest idle containers are reaped first; a pool out of use is emptied whatever their age.
+            for pooled in sorted(self._idle, key=lambda p: p.last_used):
+                if surplus > 0 and (warm == 0 or now - pooled.last_used > self.idle_timeout):
+                    to_destroy.append(pooled.container)
+                    surplus -= 1
+                else:
+                    keep.append(pooled)
+            self._idle = []
+            to_check = keep
+            self._checking = len(to_check)
+
+        for container in to_destroy:
+            self._destroy(container)
+        healthy = []
+        for pooled in to_check:
+            if self._is_healthy(pooled.container):
+                healthy.append(pooled)
+            else:
+                self._destroy(pooled.container)
+        with self._cond:
+            self._idle.extend(healthy)
+            self._checking = 0
+            self._cond.notify_all()
+
+    def _reap_loop(self):
+        while not self._stopped.is_set():
+            try:
+                self._reap()
+                self._top_up()
+            except Exception as e:
+                logger.error(f"Container pool maintenance failed: {e}")
+            self._wake.wait(self.health_check_interval)
+            self._wake.clear()
+
+    def shutdown(self):
+        self._stopped.set()
+        self._wake.set()
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for pooled in idle:
+            self._destroy(pooled.container)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_container_pool(client, image: str, pool_config: dict, keep_warm: bool = False) -> ContainerPool:
+    """
+    Get the process-wide pool for an image, creating it on first use. keep_warm
+    pins min_size warm containers even while the image goes unused.
+    """
+    with _pools_lock:
+        if image in _pools:
+            if keep_warm:
+                _pools[image].keep_warm = True
+        else:
+            _pools[image] = ContainerPool(
+                client, image,
+                min_size=pool_config.get('min_size', 1),
+                max_size=pool_config.get('max_size', 4),
+                idle_timeout=pool_config.get('idle_timeout', 600),
+                health_check_interval=pool_config.get('health_check_interval', 60),
+                keep_warm=keep_warm,
+            )
+        return _pools[image]
+
+
+def shutdown_container_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.shutdown()
+        _pools.clear()
+
+
+def shutdown_container_pool(image: str):
+    """Drain and stop the pool for one image, if it exists."""
+    with _pools_lock:
+        pool = _pools.pop(image, None)
+    if pool is not None:
+        pool.shutdown()
@@ -0,0 +1,166 @@
+import logging
+import io
+import os
+import json
+import time
+import hashlib
+import tarfile
+import threading
+import docker
+from .container_pool import shutdown_container_pool
+
+logger = logging.getLogger(__name__)
+
+
+class DependencyImageCache:
+    """
+    Builds and caches one derived image per set of dependency manifests, so a
+    sandbox starts with the target repo's dependencies already installed.
+
+    Images are tagged <repository>:<manifest hash> and tracked in a small JSON
+    index of last-use times that drives LRU garbage collection.
+    """
+    def __init__(self, client, repository: str, index_path: str, max_images: int = 10):
+        self.client = client
+        self.repository = repository
+        self.index_path = index_path
+        self.max_images = max_images
+
+        self._lock = threading.Lock()
+        self._build_locks = {}
+        self._index = self._load_index()
+
+    def _load_index(self) -> dict:
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save_index(self):
+        directory = os.path.dirname(self.index_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self.index_path)
+
+    @staticmethod
+    def _read_manifests(workspace_dir: str, dependency_files: list) -> dict:
+        manifests = {}
+        for name in dependency_files:
+            path = os.path.join(workspace_dir, name)
+            if os.path.isfile(path):
+                with open(path, 'rb') as f:
+                    manifests[name] = f.read()
+        return manifests
+
+    @staticmethod
+    def cache_key(base_image: str, install_command: str, manifests: dict) -> str:
+        digest = hashlib.sha256()
+        digest.update(base_image.encode('utf-8'))
+        digest.update(install_command.encode('utf-8'))
+        for name in sorted(manifests):
+            digest.update(name.encode('utf-8'))
+            digest.update(hashlib.sha256(manifests[name]).digest())
+        return digest.hexdigest()[:16]
+
+    @staticmethod
+    def _build_context(base_image: str, install_command: str, manifests: dict, env: dict) -> io.BytesIO:
+        lines = [f"FROM {base_image}", "WORKDIR /deps"]
+        lines += [f"COPY {name} /deps/{name}" for name in sorted(manifests)]
+        lines.append(f"RUN {install_command}")
+        lines += [f"ENV {key}={value}" for key, value in (env or {}).items()]
+        dockerfile = ("\n".join(lines) + "\n").encode('utf-8')
+
+        stream = io.BytesIO()
+        with tarfile.open(fileobj=stream, mode='w') as tar:
+            for name, data in [("Dockerfile", dockerfile)] + sorted(manifests.items()):
+                info = tarfile.TarInfo(name=name)
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+        stream.seek(0)
+        return stream
+
+    def _image_exists(self, tag: str) -> bool:
+        try:
+            self.client.images.get(tag)
+            return True
+        except docker.errors.ImageNotFound:
+            return False
+
+    def resolve(self, workspace_dir: str, language_config: dict) -> str:
+        """
+        Return the image to run the workspace in: a cached dependency image when the
+        language's manifests are present, building it on a miss, else the base image.
+        """
+        base_image = language_config['base_image']
+        install_command = language_config.get('install_command')
+        manifests = self._read_manifests(workspace_dir, language_config.get('dependency_files', []))
+        if not install_command or not manifests:
+            return base_image
+
+        tag = f"{self.repository}:{self.cache_key(base_image, install_command, manifests)}"
+        with self._lock:
+            build_lock = self._build_locks.setdefault(tag, threading.Lock())
+
+        # Concurrent runs with the same manifests wait for a single build.
+        with build_lock:
+            if self._image_exists(tag):
+                logger.debug(f"Using cached dependency image {tag}")
+            else:
+                logger.info(f"Building dependency image {tag} from {', '.join(sorted(manifests))}...")
+                started = time.time()
+                try:
+                    context = self._build_context(base_image, install_command, manifests,
+                                                  language_config.get('dependency_env'))
+                    self.client.images.build(fileobj=context, custom_context=True, tag=tag, rm=True,
+                                             labels={"momentum.dependency_cache": "true"})
+                except (docker.errors.BuildError, docker.errors.APIError) as e:
+                    logger.warning(f"Dependency image build failed, falling back to {base_image}: {e}")
+                    return base_image
+                logger.info(f"Built {tag} in {time.time() - started:.1f}s")
+
+        with self._lock:
+            self._index[tag] = time.time()
+            self._collect_garbage()
+            self._save_index()
+        return tag
+
+    def _collect_garbage(self):
+        """Remove least recently used images beyond max_images."""
+        excess = len(self._index) - self.max_images
+        if excess <= 0:
+            return
+        for tag, _ in sorted(self._index.items(), key=lambda item: item[1])[:excess]:
+            shutdown_container_pool(tag)
+            try:
+                self.client.images.remove(tag)
+                logger.info(f"Removed least recently used dependency image {tag}")
+            except docker.errors.ImageNotFound:
+                pass
+            except docker.errors.APIError as e:
+                # Still in use by a running sandbox; retried on the next collection.
+                logger.warning(f"Could not remove dependency image {tag}: {e}")
+                continue
+            del self._index[tag]
+            self._build_locks.pop(tag, None)
+
+
+_cache_instance = None
+_cache_lock = threading.Lock()
+
+
+def get_dependency_image_cache(client, cache_config: dict) -> DependencyImageCache:
+    """Get the process-wide dependency image cache."""
+    global _cache_instance
+    with _cache_lock:
+        if _cache_instance is None:
+            _cache_instance = DependencyImageCache(
+                client,
+                repository=cache_config.get('repository', 'momentum-deps'),
+                index_path=cache_config.get('index_path', 'backend/dependency_images.json'),
+                max_images=cache_config.get('max_images', 10),
+            )
+        return _cache_instance
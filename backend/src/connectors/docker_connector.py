@@ -1,57 +1,333 @@
+import logging
 import docker
 import io 
 import tarfile
 import os
+import time
+import codecs
+import posixpath
+from collections import deque
+from .container_pool import get_container_pool
+from .dependency_image_cache import get_dependency_image_cache
+from .resources import get_docker_client
+from ..config.config_loader import get_config
+from ..observability.metrics import DOCKER_EXEC
+
+logger = logging.getLogger(__name__)
+
+
+def _command_name(command) -> str:
+    """The program being run ("pytest", "sh", ...), to keep metric labels low-cardinality."""
+    argv = command.split() if isinstance(command, str) else list(command)
+    return posixpath.basename(argv[0]) if argv else ""
+
+
+class OutputTail:
+    """
+    Keeps the last max_chars characters of a command's output, so a long test
+    run never has to sit in memory whole.
+    """
+    def __init__(self, max_chars: int):
+        self.max_chars = max_chars
+        self.chunks = deque()
+        self.size = 0
+        self.dropped = 0
+
+    def append(self, text: str):
+        if not text:
+            return
+        self.chunks.append(text)
+        self.size += len(text)
+        while self.size > self.max_chars and self.chunks:
+            overflow = self.size - self.max_chars
+            head = self.chunks[0]
+            if len(head) <= overflow:
+                self.chunks.popleft()
+                self.size -= len(head)
+                self.dropped += len(head)
+            else:
+                self.chunks[0] = head[overflow:]
+                self.size -= overflow
+                self.dropped += overflow
+
+    def text(self) -> str:
+        tail = "".join(self.chunks)
+        return f"... ({self.dropped} characters truncated)\n{tail}" if self.dropped else tail
+
 
 class DockerConnector:
     """
     It will manage the connection with docker engine
     """
     def __init__(self):
+        self.container = None
+        self.pool = None
+        self.workdir = None
+        self.host_workdir = None  # the workspace on this host: bind-mounted at workdir, or copied there when pooled
+        self.docker_config = get_config().get_section('docker')
         try:
-            self.client = docker.from_env()
-            print("Docker client initialised.")
+            self.client = get_docker_client()
         except docker.errors.DockerException as e:
-            print(f"Error in initialising Docker: {e}")
-            print("Make sure Docker is running")
+            logger.error(f"Error in initialising Docker: {e}")
+            logger.warning("Make sure Docker is running")
             raise
 
-    def create_container(self, image="python:3.10-slim"):
+    def create_container(self, image="python:3.10-slim", volumes=None):
         """
         Create and starts new docker container
         """
         try:
-            print(f"Creating new Docker container with image {image}")
-            container = self.client.container.run(image, detach=True, tty=True)
-            print(f"{container.short_id} container created")
+            logger.info(f"Creating new Docker container with image {image}")
+            container = self.client.containers.run(image, detach=True, tty=True, volumes=volumes)
+            logger.debug(f"{container.short_id} container created")
             return container
         except docker.errors.ImageNotFound:
-            print(f"Image {image} not found. Pulling from Docker Hub...")
+            logger.warning(f"Image {image} not found. Pulling from Docker Hub...")
             self.client.images.pull(image)
-            container = self.client.containers.run(image, detach=True, tty=True)
+            container = self.client.containers.run(image, detach=True, tty=True, volumes=volumes)
             return container
         except docker.errors.APIError as e:
-            print(f"Error in creating container: {e}")
+            logger.error(f"Error in creating container: {e}")
             raise
 
-    def execute_command(self, container, command: str):
+    def resolve_image(self, workspace_dir: str, language_config: dict = None) -> str:
+        """
+        Pick the sandbox image for a workspace, reusing (or building) a cached image
+        with the repo's dependencies preinstalled when the cache is enabled.
+        """
+        cache_config = self.docker_config.get('dependency_cache', {})
+        if not language_config or 'base_image' not in language_config:
+            return self.docker_config['image']
+        if not cache_config.get('enabled', False):
+            return language_config['base_image']
+        return get_dependency_image_cache(self.client, cache_config).resolve(workspace_dir, language_config)
+
+    def start_container(self, workspace_dir: str, image: str = None):
+        """
+        Lease a sandbox for the workspace: a warm pooled container with a copy of the
+        workspace, otherwise a dedicated cold-started one with only this workspace
+        bind-mounted. Either way the sandbox can't see other runs' workspaces.
+        """
+        image = image or self.docker_config['image']
+        pool_config = self.docker_config.get('pool', {})
+        workspace_dir = os.path.realpath(workspace_dir)
+        mount_point = self.docker_config['workspace_mount']
+
+        if pool_config.get('enabled', False):
+            self.pool = get_container_pool(self.client, image, pool_config)
+            self.container = self.pool.lease(timeout=pool_config.get('lease_timeout', 300))
+            self.workdir = mount_point
+            try:
+                self._copy_workspace_in(workspace_dir)
+            except Exception:
+                self.pool.release(self.container)
+                self.container, self.pool, self.workdir = None, None, None
+                raise
+            logger.debug(f"Leased pooled container {self.container.short_id} for {workspace_dir}")
+        else:
+            volumes = {workspace_dir: {"bind": mount_point, "mode": "rw"}}
+            self.container = self.create_container(image, volumes=volumes)
+            self.workdir = mount_point
+        self.host_workdir = workspace_dir
+        return self.container
+
+    def _copy_workspace_in(self, workspace_dir: str):
+        """Copy the workspace (without .git) into the leased container at workdir, as one archive."""
+        stream = io.BytesIO()
+        with tarfile.open(fileobj=stream, mode='w') as tar:
+            tar.add(workspace_dir, arcname=self.workdir.lstrip('/'),
+                    filter=lambda info: None if posixpath.basename(info.name) == '.git' else info)
+        stream.seek(0)
+        self.container.put_archive('/', stream)
+        logger.debug(f"Copied workspace into {self.workdir} ({stream.getbuffer().nbytes} bytes)")
+
+    def _uses_mount(self) -> bool:
+        """Whether the container sees the host workspace directly (a dedicated, bind-mounted sandbox)."""
+        return (self.host_workdir is not None and self.pool is None
+                and self.docker_config.get('workspace_sync', 'mount') == 'mount')
+
+    def _write_host_files(self, files: dict):
+        for file_path, content in files.items():
+            target = os.path.join(self.host_workdir, *file_path.split('/'))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'w', encoding='utf-8') as file:
+                file.write(content)
+
+    @staticmethod
+    def _relative(file_path: str) -> str:
+        """Normalize a workspace-relative path and refuse anything that escapes the workspace."""
+        relative = posixpath.normpath(file_path.replace(os.sep, '/'))
+        if relative.startswith('/') or relative == '..' or relative.startswith('../'):
+            raise ValueError(f"Path escapes the workspace: {file_path}")
+        return relative
+
+    def warm_pool(self, image: str = None):
+        """
+        Create the pool for an image so its reaper starts pre-warming containers,
+        and keep it warm while idle.
+        """
+        pool_config = self.docker_config.get('pool', {})
+        if not pool_config.get('enabled', False):
+            return None
+        return get_container_pool(self.client, image or self.docker_config['image'], pool_config, keep_warm=True)
+
+    def execute_command(self, container, command: str, workdir: str = None, on_output=None):
+        """
+        Run a command and stream its output as it is produced.
+
+        on_output, if given, is called (from this thread) with decoded chunks batched
+        every docker.exec.stream_interval seconds. Only the last docker.exec.tail_chars
+        characters are kept and returned with the exit code.
+        """
         if not container:
             return -1, "Container doesn't exist"
-        
-        print(f"Executing command in container {container.short_id}: {command}")
-        exit_code, output = container.exec_run(command)
-        decoded_output = output.decode('utf-8').strip()
-        print(f"Command executed with exit code {exit_code}. Output: {decoded_output}")
-        return exit_code, decoded_output
+
+        exec_config = self.docker_config.get('exec', {})
+        tail = OutputTail(exec_config.get('tail_chars', 20000))
+        interval = exec_config.get('stream_interval', 0.25)
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        pending, last_flush = [], time.monotonic()
+        started = time.perf_counter()
+
+        logger.info(f"Executing command in container {container.short_id}: {command}")
+        exec_id = self.client.api.exec_create(container.id, command, workdir=workdir)['Id']
+        for chunk in self.client.api.exec_start(exec_id, stream=True):
+            text = decoder.decode(chunk)
+            tail.append(text)
+            if on_output is not None and text:
+                pending.append(text)
+                if time.monotonic() - last_flush >= interval:
+                    on_output("".join(pending))
+                    pending, last_flush = [], time.monotonic()
+        text = decoder.decode(b"", final=True)
+        tail.append(text)
+        if on_output is not None and (pending or text):
+            on_output("".join(pending) + text)
+
+        exit_code = self.client.api.exec_inspect(exec_id)['ExitCode']
+        DOCKER_EXEC.labels(
+            command=_command_name(command), exit_status="0" if exit_code == 0 else "nonzero"
+        ).observe(time.perf_counter() - started)
+        output = tail.text().strip()
+        logger.debug(f"Command executed with exit code {exit_code} ({tail.size + tail.dropped} characters of output)")
+        return exit_code, output
+
+    def run_command(self, command: str, on_output=None):
+        """
+        Run a command inside the leased container's workspace, streaming output to on_output.
+        """
+        return self.execute_command(self.container, command, workdir=self.workdir, on_output=on_output)
+
+    def write_file_to_container(self, file_path: str, content: str):
+        """
+        Write a file relative to the workspace inside the container.
+        """
+        self.write_files_to_container({file_path: content})
+
+    def write_files_to_container(self, files: dict):
+        """
+        Write several files (workspace-relative path -> content). A bind-mounted
+        workspace is written in place on the host; otherwise all files go over in
+        one put_archive call (and, for a pooled sandbox, to the host worktree too).
+        """
+        if not files:
+            return
+        files = {self._relative(file_path): content for file_path, content in files.items()}
+        if self._uses_mount():
+            self._write_host_files(files)
+            logger.debug(f"Wrote {len(files)} file(s) to {self.host_workdir}")
+            return
+        if self.pool is not None and self.host_workdir is not None:
+            # The pooled sandbox has its own copy; the host worktree is what gets committed.
+            self._write_host_files(files)
+
+        stream = io.BytesIO()
+        directories = set()
+        with tarfile.open(fileobj=stream, mode='w') as tar:
+            for file_path, content in files.items():
+                missing, parent = [], posixpath.dirname(posixpath.normpath(file_path))
+                while parent and parent not in directories:
+                    missing.append(parent)
+                    parent = posixpath.dirname(parent)
+                for directory in reversed(missing):  # parents before children
+                    directories.add(directory)
+                    info = tarfile.TarInfo(name=directory)
+                    info.type = tarfile.DIRTYPE
+                    info.mode = 0o755
+                    tar.addfile(info)
+
+                data = content.encode('utf-8')
+                info = tarfile.TarInfo(name=posixpath.normpath(file_path))
+                info.size = len(data)
+                info.mode = 0o644
+                tar.addfile(info, io.BytesIO(data))
+        stream.seek(0)
+        self.container.put_archive(self.workdir, stream)
+        logger.debug(f"Wrote {len(files)} file(s), {stream.getbuffer().nbytes} bytes, to {self.workdir}")
+
+    def read_file_from_container(self, file_path: str):
+        """
+        Read a file relative to the workspace inside the container, or None if missing.
+        """
+        return self.read_files_from_container([file_path]).get(self._relative(file_path))
+
+    def read_files_from_container(self, file_paths: list) -> dict:
+        """
+        Read several workspace-relative files; missing ones map to None. A bind-mounted
+        workspace is read in place, otherwise the files come back in a single tar
+        streamed out of the container.
+        """
+        paths = [self._relative(file_path) for file_path in file_paths]
+        contents = dict.fromkeys(paths)
+        if not paths:
+            return contents
+        if self._uses_mount():
+            for file_path in paths:
+                target = os.path.join(self.host_workdir, *file_path.split('/'))
+                if os.path.isfile(target):
+                    with open(target, encoding='utf-8', errors='replace') as file:
+                        contents[file_path] = file.read()
+            return contents
+
+        exec_id = self.client.api.exec_create(
+            self.container.id, ["tar", "-cf", "-", "--ignore-failed-read", "--", *paths],
+            workdir=self.workdir, stderr=False
+        )['Id']
+        stream = io.BytesIO(b"".join(self.client.api.exec_start(exec_id, stream=True)))
+        try:
+            with tarfile.open(fileobj=stream, mode='r') as tar:
+                for member in tar:
+                    name = posixpath.normpath(member.name)
+                    if member.isfile() and name in contents:
+                        contents[name] = tar.extractfile(member).read().decode('utf-8', errors='replace')
+        except tarfile.ReadError:
+            pass  # none of the files exist
+        missing = [file_path for file_path, content in contents.items() if content is None]
+        if missing:
+            logger.warning(f"File(s) not found in container: {', '.join(missing)}")
+        return contents
 
     def cleanup_container(self, container):
         if not container:
             return
 
         try:
-            print(f"Clearing container {container.short_id}")
+            logger.debug(f"Clearing container {container.short_id}")
             container.stop()
             container.remove()
-            print(f"Container {container.short_id} cleared")
+            logger.debug(f"Container {container.short_id} cleared")
         except docker.errors.APIError as e:
-            print(f"Error in cleaning up container: {e}")    
\ No newline at end of file
+            logger.error(f"Error in cleaning up container: {e}")
+
+    def stop_and_remove_container(self):
+        """
+        Tear down the container owned by this connector, or hand it back to its pool.
+        """
+        if self.pool is not None and self.container is not None:
+            self.pool.release(self.container)
+        else:
+            self.cleanup_container(self.container)
+        self.container = None
+        self.pool = None
+        self.workdir = None
+        self.host_workdir = None
@@ -1,71 +1,248 @@
+import logging
 import git
 import os
+import re
+import shutil
+import hashlib
 import tempfile
+import threading
+from contextlib import contextmanager
 from urllib.parse import urlparse
+from ..config.config_loader import get_file_paths, get_git_config
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+_mirror_locks = {}
+_mirror_locks_guard = threading.Lock()
+
+
+def _mirror_dir_name(repo_url: str) -> str:
+    parsed = urlparse(repo_url)
+    readable = re.sub(r'[^A-Za-z0-9._-]+', '_', f"{parsed.netloc}{parsed.path}".strip('/'))[-60:]
+    digest = hashlib.sha1(repo_url.encode('utf-8')).hexdigest()[:8]
+    return f"{readable}-{digest}.git"
+
 
 class GitConnector:
     """
     Manages git ops
+
+    Every remote is kept as one local bare mirror that is refreshed with an
+    incremental fetch; each run checks out its own worktree sharing the mirror's
+    object store.
+
+    With git.sparse_checkout enabled the mirror is a blobless partial clone and
+    worktrees only materialise the directories a run needs; missing blobs are
+    fetched lazily by git when they are checked out.
     """
     def __init__(self, repo_url: str):
-        self repo_url = repo_url
-        self.local_path = tempfile.mkdtemp()
+        self.repo_url = repo_url
+        self.git_config = get_git_config()
+
+        mirror_root = self.git_config['mirror_root']
+        os.makedirs(mirror_root, exist_ok=True)
+        self.mirror_path = os.path.join(mirror_root, _mirror_dir_name(repo_url))
+
+        workspace_root = get_file_paths()['workspace_root']
+        os.makedirs(workspace_root, exist_ok=True)
+        self.local_path = tempfile.mkdtemp(dir=workspace_root)
         self.repo = None
-        print(f"Gitconnector initialised for : {self.repo_url}")
-        print(f"local path : {self.local_path}")
+        self.branch_name = None
+        self.sparse_config = self.git_config.get('sparse_checkout', {})
+        self.sparse_enabled = self.sparse_config.get('enabled', False)
+        self.sparse_dirs = set()
+        logger.debug(f"Gitconnector initialised for : {self.repo_url}")
+        logger.debug(f"local path : {self.local_path}")
+
+    @contextmanager
+    def _mirror_lock(self):
+        """Serialise mirror updates across threads and across processes."""
+        with _mirror_locks_guard:
+            thread_lock = _mirror_locks.setdefault(self.mirror_path, threading.Lock())
+        with thread_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(f"{self.mirror_path}.lock", 'w') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _mirror_git(self) -> git.Git:
+        # A plain command runner: once sparse worktrees enable extensions.worktreeConfig,
+        # core.bare moves to config.worktree and git.Repo no longer detects the mirror as bare.
+        return git.Git(self.mirror_path)
+
+    def _refresh_mirror(self) -> git.Git:
+        """Create the bare mirror on first use, otherwise fetch only what changed."""
+        if not os.path.exists(os.path.join(self.mirror_path, 'HEAD')):
+            logger.info(f"Creating local mirror of {self.repo_url} in {self.mirror_path}")
+            clone_options = {"filter": "blob:none"} if self.sparse_enabled else {}
+            git.Repo.clone_from(self.repo_url, self.mirror_path, bare=True, **clone_options).close()
+            # Track remote branches under refs/remotes so pruning never touches
+            # the per-run branches created in worktrees.
+            self._mirror_git().config('remote.origin.fetch', '+refs/heads/*:refs/remotes/origin/*')
+        mirror = self._mirror_git()
+        logger.debug(f"Fetching updates for mirror {self.mirror_path}")
+        mirror.fetch('origin', '--prune')
+        return mirror
+
+    def _add_worktree(self, start_point: str, branch_name: str = None):
+        """
+        Check out start_point into this run's worktree, detached or on branch_name.
+        Sparse worktrees are re-populated with the directories recorded so far.
+        """
+        os.makedirs(self.local_path, exist_ok=True)
+        branch_args = ['-B', branch_name] if branch_name else ['--detach']
+        checkout_args = ['--no-checkout'] if self.sparse_enabled else []
+        with self._mirror_lock():
+            mirror = self._refresh_mirror()
+            # Drop worktrees whose directories are gone (e.g. left by a crashed process)
+            # so their branches can be checked out again.
+            mirror.worktree('prune')
+            mirror.worktree('add', *checkout_args, *branch_args, self.local_path, start_point)
+        self.repo = git.Repo(self.local_path)
+        if self.sparse_enabled:
+            file_paths = get_file_paths()
+            previous_dirs, self.sparse_dirs = self.sparse_dirs, set()
+            self.add_sparse_paths(
+                [file_paths['default_code_file'], file_paths['default_test_file']],
+                extra_dirs=[*self.sparse_config.get('extra_directories', []), *previous_dirs]
+            )
+            self.repo.git.checkout(branch_name or '--detach')
 
     def clone_repo(self):
         try:
-            print(f"Cloning {self.repo_url} in {self.local_path}")
-            self.repo = git.Repo.clone_from(self.repo_url, self.local_path)
-            print("Repository cloned successfully.")
+            logger.info(f"Checking out {self.repo_url} worktree in {self.local_path}")
+            self._add_worktree(f"origin/{self.git_config['default_base_branch']}")
+            logger.debug("Repository checked out successfully.")
+            return self.local_path
+        except git.exc.GitCommandError as e:
+            logger.error(f"Error cloning repository: {e}")
+            return None
+
+    def checkout_branch(self, branch_name: str):
+        """
+        Recreate the worktree on an already pushed branch, e.g. when a parked run resumes.
+        """
+        try:
+            logger.info(f"Checking out remote branch {branch_name} in {self.local_path}")
+            self._add_worktree(f"origin/{branch_name}", branch_name)
+            self.branch_name = branch_name
+            return self.local_path
+        except git.exc.GitCommandError as e:
+            logger.error(f"Error checking out branch {branch_name}: {e}")
+            return None
+
+    def add_sparse_paths(self, file_paths, extra_dirs=()):
+        """
+        Widen the sparse checkout (cone mode) to the directories containing file_paths.
+        Root-level files are always present. No-op unless sparse checkout is enabled.
+        """
+        if not self.sparse_enabled or not self.repo:
+            return False
+
+        dirs = {os.path.dirname(path).strip('/') for path in file_paths}
+        dirs.update(d.strip('/') for d in extra_dirs)
+        dirs.discard('')
+        if dirs <= self.sparse_dirs and self.sparse_dirs:
+            return True
+
+        self.sparse_dirs |= dirs
+        try:
+            logger.debug(f"Sparse checkout directories: {sorted(self.sparse_dirs)}")
+            self.repo.git.sparse_checkout('set', '--cone', *sorted(self.sparse_dirs))
             return True
         except git.exc.GitCommandError as e:
-            print(f"Error cloning repository: {e}")
+            logger.error(f"Error updating sparse checkout: {e}")
             return False
-        
+
     def create_and_checkout_branch(self, branch_name: str):
         if not self.repo:
-            print("Repo not cloned. Call clone_repo() first")
+            logger.warning("Repo not cloned. Call clone_repo() first")
             return False
-        
+
         try:
-            print(f"Creating and checking out new branch : {bramch_name}")
-            new_branch = self.repo.create_head(branch_name)
-            new_branch.checkout()
-            print(f"Succesfully checked out to new branch: {branch_name}")
+            logger.info(f"Creating and checking out new branch : {branch_name}")
+            self.repo.git.checkout('-b', branch_name)
+            self.branch_name = branch_name
+            logger.debug(f"Succesfully checked out to new branch: {branch_name}")
             return True
         except Exception as e:
-            print(f"Error creating branch: {e}")
+            logger.error(f"Error creating branch: {e}")
             return False
-    
-    def commit_changes(self, commit_message: str):
+
+    def create_branch(self, branch_name: str):
+        return self.create_and_checkout_branch(branch_name)
+
+    def commit_changes(self, commit_message: str, paths=None):
+        """
+        Commit the given paths, or every change in the worktree when paths is None.
+        """
         if not self.repo:
-            print("Repo not cloned")
+            logger.warning("Repo not cloned")
             return False
-        
+
         try:
-            print("Staging all changes...")
-            self.repo.git.add(A=True)
-            print(f"Committing changes with message: {commit_message}")
-            self.repo.index.commit(commit_message)
-            print("Changes committed successfully.")
+            if paths:
+                logger.debug(f"Staging {len(paths)} changed paths...")
+                add_options = ['--sparse'] if self.sparse_enabled else []
+                self.repo.git.add(*add_options, '--', *paths)
+            else:
+                logger.debug("Staging all changes...")
+                self.repo.git.add(A=True)
+            logger.info(f"Committing changes with message: {commit_message}")
+            self.repo.git.commit('-m', commit_message)
+            logger.debug("Changes committed successfully.")
             return True
         except Exception as e:
-            print(f"Error committing changes: {e}")
+            logger.error(f"Error committing changes: {e}")
             return False
-        
+
     def push_changes(self, branch_name: str):
         if not self.repo:
-            print("Repo not cloned")
+            logger.warning("Repo not cloned")
             return False
-        
+
         try:
-            print(f"Pushing changes to remote branch: {branch_name}")
+            logger.info(f"Pushing changes to remote branch: {branch_name}")
             origin = self.repo.remote(name='origin')
             origin.push(refspec=f"{branch_name}:{branch_name}")
-            print("Changes pushed successfully.")
+            logger.debug("Changes pushed successfully.")
             return True
         except Exception as e:
-            print(f"Error pushing changes: {e}")
-            return False
\ No newline at end of file
+            logger.error(f"Error pushing changes: {e}")
+            return False
+
+    def commit_and_push(self, commit_message: str, branch_name: str, paths=None):
+        return self.commit_changes(commit_message, paths) and self.push_changes(branch_name)
+
+    def cleanup(self):
+        """
+        Remove the run's worktree and its local branch; the mirror is kept.
+        """
+        if self.repo is not None:
+            self.repo.close()
+            self.repo = None
+        if os.path.isdir(self.local_path):
+            logger.info(f"Removing local worktree at {self.local_path}")
+            shutil.rmtree(self.local_path, ignore_errors=True)
+        if not os.path.exists(os.path.join(self.mirror_path, 'HEAD')):
+            return
+
+        with self._mirror_lock():
+            mirror = self._mirror_git()
+            # The directory is gone, so prune drops the worktree's metadata.
+            mirror.worktree('prune')
+            if self.branch_name:
+                try:
+                    mirror.branch('-D', self.branch_name)
+                except git.exc.GitCommandError as e:
+                    logger.error(f"Error deleting local branch {self.branch_name}: {e}")
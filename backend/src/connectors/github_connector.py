@@ -1,12 +1,168 @@
+import logging
 import os
+import hmac
+import time
+import hashlib
+import random
+import threading
+from collections import OrderedDict
 import requests
 from dotenv import load_dotenv
+from ..config.config_loader import get_config
+from .resources import get_http_session
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 
+
+class GithubRateLimitedError(requests.exceptions.RequestException):
+    """
+    Raised instead of waiting out the rate limit when that would take longer than
+    the caller can afford (calls run under the http executor's timeout).
+    """
+    def __init__(self, retry_after: float):
+        super().__init__(f"GitHub rate limit reached; next request allowed in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class GithubRateLimiter:
+    """
+    Token bucket shared by every connector using the same token.
+
+    The refill rate follows GitHub's X-RateLimit-Remaining / X-RateLimit-Reset
+    headers so the remaining quota is spread evenly until the window resets,
+    instead of being burned by a burst of concurrent agents.
+    """
+    def __init__(self, burst: int = 10, reserve: int = 50):
+        self.capacity = burst
+        self.reserve = reserve
+        self.tokens = float(burst)
+        self.rate = None  # tokens per second; unlimited until the first response
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.remaining = None
+        self.reset_at = None
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        if self.rate is not None:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        else:
+            self.tokens = self.capacity
+        self.updated = now
+
+    def acquire(self, max_wait: float = None):
+        """
+        Take a token, sleeping until one is available. Raises GithubRateLimitedError
+        if that would take more than max_wait seconds in total.
+        """
+        deadline = None if max_wait is None else time.monotonic() + max_wait
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                else:
+                    wait = (1 - self.tokens) / self.rate if self.rate else 1.0
+            if deadline is not None and time.monotonic() + wait > deadline:
+                raise GithubRateLimitedError(wait)
+            time.sleep(wait)
+
+    def update(self, headers):
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset = headers.get('X-RateLimit-Reset')
+        if remaining is None or reset is None:
+            return
+        with self._lock:
+            self.remaining = int(remaining)
+            self.reset_at = int(reset)
+            window = max(self.reset_at - time.time(), 1.0)
+            usable = max(self.remaining - self.reserve, 0)
+            self.rate = usable / window
+            if usable == 0:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + window)
+
+    def block_for(self, seconds: float):
+        """Stop handing out tokens for the given number of seconds."""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "remaining": self.remaining,
+                "reset_at": self.reset_at,
+                "tokens": round(self.tokens, 2),
+                "rate_per_second": round(self.rate, 3) if self.rate is not None else None,
+                "blocked_for": max(round(self.blocked_until - time.monotonic(), 1), 0),
+            }
+
+
+class ETagCache:
+    """Bounded LRU of url -> (etag, body) for conditional GETs."""
+    def __init__(self, max_entries: int = 500):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, url: str):
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+            return entry
+
+    def set(self, url: str, etag: str, body, next_url: str = None):
+        with self._lock:
+            self._entries[url] = (etag, body, next_url)
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def verify_webhook_signature(secret: str, body: bytes, signature: str) -> bool:
+    """Check a webhook's X-Hub-Signature-256 header against the shared secret."""
+    expected = "sha256=" + hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature or "")
+
+
+# Keyed by token so every agent on the same PAT shares one quota view.
+_limiters = {}
+_etag_caches = {}
+_shared_lock = threading.Lock()
+
+
+def _shared_for_token(token: str, github_config: dict):
+    rate_config = github_config.get('rate_limit', {})
+    with _shared_lock:
+        if token not in _limiters:
+            _limiters[token] = GithubRateLimiter(
+                burst=rate_config.get('burst', 10),
+                reserve=rate_config.get('reserve', 50)
+            )
+            _etag_caches[token] = ETagCache(github_config.get('etag_cache_entries', 500))
+        return _limiters[token], _etag_caches[token]
+
+
+def rate_limit_status() -> list[dict]:
+    """Quota view of every token in use (the tokens themselves are left out)."""
+    with _shared_lock:
+        limiters = list(_limiters.values())
+    return [limiter.status() for limiter in limiters]
+
+
 class GithubConnector:
     """
     Will Handle comm with GitHub API
+
+    Requests go through a pooled session shared by all runs, are paced by a
+    rate limiter fed from GitHub's rate-limit headers, and GETs are conditional
+    (If-None-Match) so unchanged polls return a 304 that costs no quota.
     """
     def __init__(self):
         self.github_token = os.getenv("GITHUB_PAT")
@@ -14,12 +170,113 @@ class GithubConnector:
 
         if not self.github_token or not self.repo_name:
             raise ValueError("github token and repo name must be set in .env file")
-        
-        self.api_base_url = f"https://api.github.com/repos/{self.repo_name}"
+
+        self.github_config = get_config().get_section('github')
+        self.api_base_url = f"{self.github_config.get('api_url', 'https://api.github.com')}/repos/{self.repo_name}"
         self.headers = {
-            "Authorisation" : f"token {self.github_token}",
+            "Authorization" : f"token {self.github_token}",
             "Accept": "application/vnd.github.v3+json",
-        } 
+        }
+        self.session = get_http_session('github', self.github_config.get('pool_size', 10))
+        self.rate_limiter, self.etag_cache = _shared_for_token(self.github_token, self.github_config)
+        self.retry_config = self.github_config.get('retry', {})
+        self.max_wait = self.github_config.get('rate_limit', {}).get('max_wait', 20)
+
+    def _backoff(self, attempt: int, response=None) -> float:
+        """Seconds to wait before retrying, honouring GitHub's hints when present."""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after is not None:
+                return float(retry_after)
+            if response.headers.get('X-RateLimit-Remaining') == '0':
+                reset = int(response.headers.get('X-RateLimit-Reset', 0))
+                return max(reset - time.time(), 1.0)
+        base = self.retry_config.get('backoff_base', 1.0)
+        cap = self.retry_config.get('backoff_max', 60.0)
+        # Full jitter keeps concurrent agents from retrying in lockstep.
+        return random.uniform(0, min(cap, base * 2 ** attempt))
+
+    @staticmethod
+    def _is_rate_limited(response) -> bool:
+        if response.status_code == 429:
+            return True
+        if response.status_code != 403:
+            return False
+        return response.headers.get('X-RateLimit-Remaining') == '0' or 'rate limit' in response.text.lower()
+
+    def _request(self, method: str, url: str, **kwargs):
+        """
+        Send a request through the shared session, limiter and retry policy.
+        Non-GET requests are only retried when GitHub rejected them for rate limiting.
+        Waiting (for quota or between retries) is capped at github.rate_limit.max_wait
+        seconds per request; beyond that GithubRateLimitedError is raised, so the call
+        fails before the executor timeout instead of completing after it.
+        """
+        max_attempts = self.retry_config.get('max_attempts', 5)
+        headers = {**self.headers, **kwargs.pop('headers', {})}
+        timeout = self.github_config.get('timeout', 30)
+        deadline = time.monotonic() + self.max_wait
+
+        for attempt in range(max_attempts):
+            self.rate_limiter.acquire(max_wait=max(deadline - time.monotonic(), 0))
+            try:
+                response = self.session.request(method, url, headers=headers, timeout=timeout, **kwargs)
+            except requests.exceptions.ConnectionError:
+                wait = self._backoff(attempt)
+                if method != 'GET' or attempt == max_attempts - 1 or time.monotonic() + wait > deadline:
+                    raise
+                time.sleep(wait)
+                continue
+
+            self.rate_limiter.update(response.headers)
+            retryable = self._is_rate_limited(response) or (method == 'GET' and response.status_code >= 500)
+            if not retryable or attempt == max_attempts - 1:
+                return response
+
+            wait = self._backoff(attempt, response)
+            if time.monotonic() + wait > deadline:
+                if self._is_rate_limited(response):
+                    self.rate_limiter.block_for(wait)
+                    raise GithubRateLimitedError(wait)
+                return response
+            logger.warning(f"GitHub returned {response.status_code} for {method} {url}; retrying in {wait:.1f}s")
+            if self._is_rate_limited(response):
+                self.rate_limiter.block_for(wait)
+            else:
+                time.sleep(wait)
+        return response
+
+    def _get_json(self, url: str, params: dict = None):
+        """
+        Conditional GET; returns (body, next_page_url). A 304 is served from the ETag cache.
+        """
+        if params:
+            url = requests.Request('GET', url, params=params).prepare().url
+        cached = self.etag_cache.get(url)
+        headers = {"If-None-Match": cached[0]} if cached else {}
+
+        response = self._request('GET', url, headers=headers)
+        if response.status_code == 304 and cached:
+            return cached[1], cached[2]
+        response.raise_for_status()
+
+        body = response.json()
+        next_url = response.links.get('next', {}).get('url')
+        etag = response.headers.get('ETag')
+        if etag:
+            self.etag_cache.set(url, etag, body, next_url)
+        return body, next_url
+
+    def _get_paginated(self, url: str, params: dict = None) -> list:
+        params = {"per_page": self.github_config.get('per_page', 100), **(params or {})}
+        items, next_url = self._get_json(url, params)
+        max_pages = self.github_config.get('max_pages', 10)
+        pages = 1
+        while next_url and pages < max_pages:
+            page_items, next_url = self._get_json(next_url)
+            items = items + page_items
+            pages += 1
+        return items
 
     def create_pull_request(self, title: str, head_branch: str, base_branch: str = "main", body: str = " "):
         pr_url = f"{self.api_base_url}/pulls"
@@ -31,14 +288,28 @@ class GithubConnector:
         }
 
         try:
-            response = requests.post(pr_url, headers=self.headers, json=payload)
+            response = self._request('POST', pr_url, json=payload)
             response.raise_for_status()
-            
+
             pr_data = response.json()
-            print(f"Pull request created sucessfully!: {pr_data['html_url']}")
+            logger.info(f"Pull request created sucessfully!: {pr_data['html_url']}")
             return pr_data
         except requests.exceptions.RequestException as e:
-            print(f"Error creating pull request: {e}")
+            logger.error(f"Error creating pull request: {e}")
             if e.response is not None:
-                print(f"Response Body: {e.response.text}")
-            return None
\ No newline at end of file
+                logger.error(f"Response Body: {e.response.text}")
+            return None
+
+    def get_pr_review_comments(self, pr_number: int, since: str = None) -> list:
+        """
+        Inline review comments on a pull request, oldest first.
+        Polling an unchanged PR returns 304s that don't count against the rate limit.
+        """
+        params = {"sort": "created", "direction": "asc"}
+        if since:
+            params["since"] = since
+        try:
+            return self._get_paginated(f"{self.api_base_url}/pulls/{pr_number}/comments", params)
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error fetching review comments for PR #{pr_number}: {e}")
+            return []
@@ -0,0 +1,156 @@
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from ..observability.metrics import LLM_CACHE_LOOKUPS
+
+
+class LLMResponseCache:
+    """
+    Two-tier cache for LLM completions: an in-memory LRU in front of a SQLite
+    file with TTL and size based eviction. The TTL applies to both tiers.
+    """
+    def __init__(self, path: str, memory_entries: int = 256, max_disk_entries: int = 5000,
+                 max_disk_bytes: int = 100 * 1024 * 1024, ttl_seconds: int = 7 * 24 * 3600):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_seconds = ttl_seconds
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "bypassed": 0, "evictions": 0}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)")
+        self._db.commit()
+
+    @staticmethod
+    def make_key(model: str, prompt: str, temperature: float, max_tokens: int) -> str:
+        prompt_hash = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+        return f"{model}:{prompt_hash}:{temperature}:{max_tokens}"
+
+    def _remember(self, key: str, response: str, created_at: float):
+        self._memory[key] = (response, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _count(self, result: str):
+        self.stats[result] += 1
+        LLM_CACHE_LOOKUPS.labels(result=result).inc()
+
+    def get(self, key: str):
+        """
+        Return the cached response for key, or None on a miss.
+        """
+        with self._lock:
+            now = time.time()
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[1] <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self._count("memory_hits")
+                    return entry[0]
+                del self._memory[key]  # its disk row is expired too and is dropped below
+
+            row = self._db.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+                self._count("misses")
+                return None
+
+            self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self._remember(key, row[0], row[1])
+            self._count("disk_hits")
+            return row[0]
+
+    def set(self, key: str, response: str):
+        with self._lock:
+            now = time.time()
+            self._remember(key, response, now)
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, response, len(response.encode('utf-8')), now, now)
+            )
+            self._evict(now)
+            self._db.commit()
+
+    def record_bypass(self):
+        with self._lock:
+            self._count("bypassed")
+
+    def _evict(self, now: float):
+        """Drop expired rows, then least recently used rows until under the size limits."""
+        expired = self._db.execute(
+            "DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,)
+        ).rowcount
+        self.stats["evictions"] += max(expired, 0)
+
+        count, total_bytes = self._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        while count > self.max_disk_entries or total_bytes > self.max_disk_bytes:
+            row = self._db.execute(
+                "SELECT key, size FROM responses ORDER BY last_access ASC LIMIT 1"
+            ).fetchone()
+            if row is None:
+                break
+            self._db.execute("DELETE FROM responses WHERE key = ?", (row[0],))
+            self._memory.pop(row[0], None)
+            self.stats["evictions"] += 1
+            count -= 1
+            total_bytes -= row[1]
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["disk_entries"] = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        lookups = hits + stats["misses"]
+        stats["hit_rate"] = hits / lookups if lookups else 0.0
+        return stats
+
+
+_cache_instance = None
+
+
+def get_llm_cache(cache_config: dict):
+    """Get the process-wide LLM response cache, or None when caching is disabled."""
+    global _cache_instance
+    if not cache_config.get('enabled', False):
+        return None
+    if _cache_instance is None:
+        _cache_instance = LLMResponseCache(
+            path=cache_config.get('path', 'backend/llm_cache.sqlite3'),
+            memory_entries=cache_config.get('memory_entries', 256),
+            max_disk_entries=cache_config.get('max_disk_entries', 5000),
+            max_disk_bytes=cache_config.get('max_disk_mb', 100) * 1024 * 1024,
+            ttl_seconds=cache_config.get('ttl_seconds', 7 * 24 * 3600),
+        )
+    return _cache_instance
@@ -1,57 +1,159 @@
+import logging
 import os
-import requests
+import json
+import asyncio
+import time
+from urllib.parse import urlparse
+import httpx
 from dotenv import load_dotenv
 from ..config.config_loader import get_model_config
+from .llm_cache import LLMResponseCache, get_llm_cache
+from .resources import get_llm_http_client, get_token_counter
+from ..observability.metrics import LLM_ERRORS, LLM_LATENCY, LLM_TOKENS, LLM_TTFB
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 
+# Shared across connector instances so every agent run is held to the same
+# per-host concurrency limits.
+_host_semaphores = {}
+
+
+def _get_host_semaphore(url: str, limit: int) -> asyncio.Semaphore:
+    host = urlparse(url).netloc
+    if host not in _host_semaphores:
+        _host_semaphores[host] = asyncio.Semaphore(limit)
+    return _host_semaphores[host]
+
+
 class LlamaConnector:
     def __init__(self):
         self.api_url = os.getenv("CEREBRAS_API_URL")
         self.api_key = os.getenv("CEREBRAS_API_KEY")
         if not self.api_url or not self.api_key:
             raise ValueError("CEREBRAS_API_URL and CEREBRAS_API_KEY must be set in .env")
-        
+
         self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
-        
+
         # Load LLM configuration
         self.llm_config = get_model_config('llm')
+        self.client = get_llm_http_client(self.llm_config)
+        self.host_semaphore = _get_host_semaphore(self.api_url, self.llm_config.get('per_host_concurrency', 4))
+        self.cache_config = self.llm_config.get('cache', {})
+        self.cache = get_llm_cache(self.cache_config)
 
-    def generate_text(self, prompt: str) -> str:
+    def _build_payload(self, prompt: str, stream: bool, temperature: float) -> dict:
         payload = {
             "model": self.llm_config['name'],
             "prompt": prompt,
             "max_tokens": self.llm_config['max_tokens'],
-            "temperature": self.llm_config['temperature']
+            "temperature": temperature
         }
+        if stream:
+            payload["stream"] = True
+        return payload
 
-        try:
-            print("Sending request to Cerebras API...")
-            response = requests.post(
-                self.api_url, 
-                headers=self.headers, 
-                json=payload, 
-                timeout=self.llm_config['timeout']
+    async def stream_text(self, prompt: str, temperature: float = None):
+        """
+        Yield completion tokens as they arrive from the server-sent event stream.
+        """
+        if temperature is None:
+            temperature = self.llm_config['temperature']
+        payload = self._build_payload(prompt, stream=True, temperature=temperature)
+        async with self.host_semaphore:
+            async with self.client.stream("POST", self.api_url, headers=self.headers, json=payload) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    choices = json.loads(data).get("choices") or []
+                    if choices and choices[0].get("text"):
+                        yield choices[0]["text"]
+
+    def _is_cacheable(self, use_cache: bool, temperature: float) -> bool:
+        if self.cache is None or not use_cache:
+            return False
+        # A sampled completion is one draw of many; replaying it would pin every retry to it.
+        return temperature <= self.cache_config.get('max_temperature', 0)
+
+    def _count_tokens(self, prompt_type: str, prompt: str, completion: str):
+        from ..config.config_loader import get_config
+        counter = get_token_counter(get_config().get_section('context_packing').get('tokenizer'))
+        LLM_TOKENS.labels(prompt_type=prompt_type, direction="prompt").inc(counter.count(prompt))
+        LLM_TOKENS.labels(prompt_type=prompt_type, direction="completion").inc(counter.count(completion))
+
+    async def generate_text(self, prompt: str, on_token=None, use_cache: bool = True,
+                            prompt_type: str = "unknown", temperature: float = None) -> str:
+        """
+        Generate a completion for the prompt.
+
+        When on_token is given the response is streamed and every token is passed
+        to the (async) callback as soon as it arrives. Responses are served from the
+        response cache when enabled, unless use_cache is False or the temperature
+        is above the cacheable limit. temperature overrides the configured one for
+        this call; calls whose answer should not vary pass 0, which also makes them
+        cacheable. prompt_type only labels metrics.
+        """
+        started = time.perf_counter()
+        if temperature is None:
+            temperature = self.llm_config['temperature']
+        cache_key = None
+        if self._is_cacheable(use_cache, temperature):
+            cache_key = LLMResponseCache.make_key(
+                self.llm_config['name'], prompt, temperature, self.llm_config['max_tokens']
             )
-            response.raise_for_status()
+            cached = await asyncio.to_thread(self.cache.get, cache_key)
+            if cached is not None:
+                logger.debug("Serving response from LLM cache.")
+                if on_token is not None:
+                    await on_token(cached)
+                LLM_LATENCY.labels(prompt_type=prompt_type, source="cache").observe(time.perf_counter() - started)
+                return cached
+        elif self.cache is not None:
+            self.cache.record_bypass()
 
-            gen_text = response.json().get("choices")[0].get("text")
-            print("Received response from Cerebras API.")
-            return gen_text.strip()
-        
-        except requests.exceptions.RequestException as e:
+        try:
+            logger.debug("Sending request to Cerebras API...")
+            if on_token is not None and self.llm_config.get('stream', True):
+                chunks = []
+                async for token in self.stream_text(prompt, temperature):
+                    if not chunks:
+                        LLM_TTFB.labels(prompt_type=prompt_type).observe(time.perf_counter() - started)
+                    chunks.append(token)
+                    await on_token(token)
+                gen_text = "".join(chunks)
+            else:
+                payload = self._build_payload(prompt, stream=False, temperature=temperature)
+                async with self.host_semaphore:
+                    response = await self.client.post(self.api_url, headers=self.headers, json=payload)
+                response.raise_for_status()
+                gen_text = response.json().get("choices")[0].get("text")
+            logger.debug("Received response from Cerebras API.")
+            gen_text = gen_text.strip()
+            LLM_LATENCY.labels(prompt_type=prompt_type, source="api").observe(time.perf_counter() - started)
+            await asyncio.to_thread(self._count_tokens, prompt_type, prompt, gen_text)
+            if cache_key is not None and gen_text:
+                await asyncio.to_thread(self.cache.set, cache_key, gen_text)
+            return gen_text
+
+        except (httpx.HTTPError, json.JSONDecodeError) as e:
+            LLM_ERRORS.labels(prompt_type=prompt_type).inc()
             error_message = f"Error communicating with Cerebras API: {e}"
-            print(error_message)
+            logger.error(error_message)
             return error_message
 
-    def generate_plan(self, user_prompt: str) -> str:
+    async def generate_plan(self, user_prompt: str) -> str:
         """Legacy method for backward compatibility"""
-        from ..config.config_loader import get_prompt_template
-        
-        planning_prompt = get_prompt_template('planning')
+        from ..config.config_loader import get_config
+
+        planning_prompt = get_config().snapshot().prompt('planning')
         full_prompt = f"{planning_prompt['system']}\n\n{planning_prompt['template'].format(task=user_prompt)}"
-        
-        return self.generate_text(full_prompt)
\ No newline at end of file
+
+        return await self.generate_text(full_prompt, prompt_type='planning', temperature=0)
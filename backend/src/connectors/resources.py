@@ -0,0 +1,165 @@
+import os
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Process-wide registry of expensive connector resources. Each resource is built
+# on first use (heavy libraries are imported only then) and shared by every
+# connector instance and agent run afterwards.
+_resources = {}
+_registry_lock = threading.Lock()
+_key_locks = {}
+
+
+def _get_or_create(key, factory):
+    resource = _resources.get(key)
+    if resource is not None:
+        return resource
+
+    with _registry_lock:
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+    # Per-key lock so loading the embedding model doesn't block e.g. the Docker client.
+    with key_lock:
+        if key not in _resources:
+            _resources[key] = factory()
+        return _resources[key]
+
+
+def get_embedding_model(model_name: str):
+    """Shared SentenceTransformer model (imports torch/transformers on first call)."""
+    def factory():
+        from sentence_transformers import SentenceTransformer
+        logger.info(f"Loading sentence transformer model: {model_name}...")
+        model = SentenceTransformer(model_name)
+        logger.info("Embedding model loaded successfully.")
+        return model
+    return _get_or_create(("embedding_model", model_name), factory)
+
+
+def get_chroma_client(db_path: str):
+    """Shared persistent ChromaDB client for a database path."""
+    def factory():
+        import chromadb
+        return chromadb.PersistentClient(path=db_path)
+    return _get_or_create(("chroma_client", db_path), factory)
+
+
+def get_token_counter(tokenizer_name: str = None):
+    """
+    Shared prompt token counter. It estimates until the tokenizer (a local
+    tokenizer.json path or a Hugging Face repo id) has loaded in a background
+    thread, and keeps estimating if it can't be loaded.
+    """
+    def factory():
+        from ..agent.context_packer import TokenCounter
+        counter = TokenCounter()
+        if tokenizer_name:
+            threading.Thread(target=_load_tokenizer, args=(counter, tokenizer_name),
+                             name="tokenizer-load", daemon=True).start()
+        return counter
+    return _get_or_create(("token_counter", tokenizer_name), factory)
+
+
+def _load_tokenizer(counter, tokenizer_name: str):
+    try:
+        from tokenizers import Tokenizer
+        if os.path.isfile(tokenizer_name):
+            counter.tokenizer = Tokenizer.from_file(tokenizer_name)
+        else:
+            counter.tokenizer = Tokenizer.from_pretrained(tokenizer_name)
+        logger.info(f"Tokenizer {tokenizer_name} loaded.")
+    except Exception as e:
+        logger.warning(f"Tokenizer {tokenizer_name} unavailable, estimating token counts: {e}")
+
+
+def get_docker_client():
+    """Shared Docker engine client."""
+    def factory():
+        import docker
+        return docker.from_env()
+    return _get_or_create(("docker_client",), factory)
+
+
+def get_llm_http_client(llm_config: dict):
+    """Shared keep-alive HTTP client for LLM requests."""
+    key = ("llm_http_client",)
+    client = _resources.get(key)
+    if client is not None and client.is_closed:
+        with _registry_lock:
+            _resources.pop(key, None)
+
+    def factory():
+        import httpx
+        limits = httpx.Limits(
+            max_connections=llm_config.get('max_connections', 20),
+            max_keepalive_connections=llm_config.get('max_keepalive_connections', 10),
+            keepalive_expiry=llm_config.get('keepalive_expiry', 30),
+        )
+        timeout = httpx.Timeout(llm_config['timeout'], connect=10)
+        return httpx.AsyncClient(limits=limits, timeout=timeout)
+    return _get_or_create(key, factory)
+
+
+def get_http_session(name: str, pool_size: int = 10):
+    """Shared requests.Session with a connection pool sized for concurrent agents."""
+    def factory():
+        import requests
+        from requests.adapters import HTTPAdapter
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+    return _get_or_create(("http_session", name), factory)
+
+
+def warm_up(config, in_background: bool = True):
+    """
+    Build the heavy shared resources ahead of the first run.
+    Failures are logged and left for the first real use to surface.
+    """
+    def run():
+        warm_config = config.get_section('resources').get('warm_up', {})
+        # The embedding model and vector DB only serve retrieval; don't pay for them when it's off.
+        retrieval = config.get_section('context_packing').get('retrieval', {}).get('enabled', False)
+        steps = []
+        if warm_config.get('docker', True):
+            steps.append(("Docker client and sandbox pool", _warm_docker))
+        if retrieval and warm_config.get('embedding_model', True):
+            steps.append(("embedding model", lambda: get_embedding_model(config.get('models.embedding.name'))))
+        if retrieval and warm_config.get('vector_db', True):
+            steps.append(("vector DB client", lambda: get_chroma_client(config.get('vector_db.path'))))
+        if warm_config.get('tokenizer', True):
+            steps.append(("tokenizer", lambda: get_token_counter(config.get('context_packing.tokenizer', ''))))
+
+        for name, step in steps:
+            try:
+                step()
+                logger.info(f"Warmed up {name}.")
+            except Exception as e:
+                logger.warning(f"Could not warm up {name}: {e}")
+
+    if not in_background:
+        run()
+        return None
+    thread = threading.Thread(target=run, name="resource-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def _warm_docker():
+    from .docker_connector import DockerConnector
+    DockerConnector().warm_pool()
+
+
+async def aclose_resources():
+    """Close shared network clients (call on application shutdown)."""
+    with _registry_lock:
+        client = _resources.pop(("llm_http_client",), None)
+        sessions = [key for key in _resources if key[0] == "http_session"]
+        session_objects = [_resources.pop(key) for key in sessions]
+    if client is not None:
+        await client.aclose()
+    for session in session_objects:
+        session.close()
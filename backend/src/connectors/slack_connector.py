@@ -1,35 +1,49 @@
 import os
-from slack_bolt import App
-from slack_bolt.adapter.fastapi import SlackRequestHandler
-from ..config.config_loader import get_config
-
-slack_app = App(
-    token=os.environ.get("SLACK_BOT_TOKEN"),
-    signing_secret=os.environ.get("SLACK_SIGNING_SECRET")
-)
-
-app_handler = SlackRequestHandler(slack_app)
-
-@slack_app.command("/momentum")
-def handle_momentum_command(ack, body, say, client, logger):
-    ack()
-    
-    user_id = body['user_id']
-    prompt = body.get('text', '').strip()
-    
-    slack_config = get_config().get_section('slack')
-
-    if not prompt:
-        say(slack_config['no_prompt_error'])
-        return
-
-    try:
-        initial_msg_response = client.chat_postMessage(
-            channel=user_id,
-            text=slack_config['initial_response'].format(prompt=prompt)
-        )
-        logger.info(f"Received task from Slack user {user_id}: {prompt}")
-        
-    except Exception as e:
-        logger.error(f"Error handling Slack command: {e}")
-        say(slack_config['error_response'])
\ No newline at end of file
+import threading
+
+# slack_bolt is imported when the first Slack request arrives, not at API boot.
+_slack_app = None
+_app_handler = None
+_slack_lock = threading.Lock()
+_pending_commands = []
+
+
+def register_command(command: str):
+    """
+    Decorator that registers a slash-command listener on the (lazily created) Slack app.
+    """
+    def decorator(func):
+        with _slack_lock:
+            if _slack_app is not None:
+                _slack_app.command(command)(func)
+            else:
+                _pending_commands.append((command, func))
+        return func
+    return decorator
+
+
+def get_slack_app():
+    global _slack_app
+    with _slack_lock:
+        if _slack_app is None:
+            from slack_bolt import App
+            app = App(
+                token=os.environ.get("SLACK_BOT_TOKEN"),
+                signing_secret=os.environ.get("SLACK_SIGNING_SECRET")
+            )
+            for command, func in _pending_commands:
+                app.command(command)(func)
+            _pending_commands.clear()
+            _slack_app = app
+        return _slack_app
+
+
+def get_app_handler():
+    global _app_handler
+    app = get_slack_app()
+    with _slack_lock:
+        if _app_handler is None:
+            from slack_bolt.adapter.fastapi import SlackRequestHandler
+            _app_handler = SlackRequestHandler(app)
+        return _app_handler
+
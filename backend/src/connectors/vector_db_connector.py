@@ -1,10 +1,18 @@
 import os
-import chromadb
-from sentence_transformers import SentenceTransformer
+import json
+import time
+import queue
+import hashlib
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import git
 import logging
+from .code_chunker import chunk_code
+from .resources import get_embedding_model, get_chroma_client
 from ..config.config_loader import get_config, get_model_config, get_vector_db_config, get_file_paths
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
 
 class VectorDBConnector:
     def __init__(self, db_path=None):
@@ -16,24 +24,32 @@ class VectorDBConnector:
             model_name = embedding_config['name']
             show_progress = embedding_config.get('show_progress', True)
             
-            logging.info(f"Loading sentence transformer model: {model_name}...")
-            self.model = SentenceTransformer(model_name)
-            logging.info("Embedding model loaded successfully.")
+            # Shared, lazily loaded: only the first connector pays for torch and the model.
+            self.model = get_embedding_model(model_name)
 
             db_path = db_path or vector_db_config['path']
-            self.client = chromadb.PersistentClient(path=db_path)
+            self.client = get_chroma_client(db_path)
+            self.index_state_path = os.path.join(db_path, 'index_state.json')
+            self.indexing_config = vector_db_config.get('indexing', {})
 
             self.collection_name = vector_db_config['collection_name']
-            logging.info(f"Accessing ChromaDB collection: {self.collection_name}")
+            logger.info(f"Accessing ChromaDB collection: {self.collection_name}")
             self.collection = self.client.get_or_create_collection(name=self.collection_name)
-            logging.info("Vector DB Connector initialized successfully.")
+            logger.info("Vector DB Connector initialized successfully.")
 
         except Exception as e:
-            logging.error(f"Failed to initialize VectorDBConnector: {e}", exc_info=True)
+            logger.error(f"Failed to initialize VectorDBConnector: {e}", exc_info=True)
             raise
 
-    def _get_code_files(self, root_dir: str) -> list[str]:
-        code_files = []
+    def _is_indexable(self, relative_path: str) -> bool:
+        file_config = get_file_paths()
+        parts = relative_path.split('/')
+        if any(part in file_config['ignore_dirs'] for part in parts[:-1]):
+            return False
+        return os.path.splitext(parts[-1])[1] not in file_config['ignore_extensions']
+
+    def _get_code_files(self, root_dir: str):
+        """Yield indexable file paths under root_dir."""
         file_config = get_file_paths()
         ignore_dirs = set(file_config['ignore_dirs'])
         ignore_extensions = set(file_config['ignore_extensions'])
@@ -43,72 +59,306 @@ class VectorDBConnector:
 
             for filename in filenames:
                 if os.path.splitext(filename)[1] not in ignore_extensions:
-                    code_files.append(os.path.join(dirpath, filename))
-        return code_files
+                    yield os.path.join(dirpath, filename)
+
+    @staticmethod
+    def _blob_sha(content: bytes) -> str:
+        """Hash content the way git hashes a blob, so untracked trees get stable keys too."""
+        return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+    @staticmethod
+    def _entry_id(repo_key: str, path: str, blob: str) -> str:
+        return f"{repo_key}:{path}@{blob}"
+
+    def _read_file_chunks(self, workspace_dir: str, repo_key: str, path: str, blob: str) -> list:
+        """Read and chunk one file into (id, document, metadata) tuples. Runs on the reader pool."""
+        max_lines = self.indexing_config.get('chunk_max_lines', 40)
+        max_chars = self.indexing_config.get('chunk_max_chars', 1200)
+        overlap = self.indexing_config.get('chunk_overlap_lines', 5)
+
+        file_path = os.path.join(workspace_dir, path)
+        try:
+            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+                content = f.read()
+        except Exception as e:
+            logger.warning(f"Could not read or process file {file_path}: {e}")
+            return []
 
-    def populate_from_directory(self, workspace_dir: str):
-        logging.info(f"Scanning directory '{workspace_dir}' to populate vector database...")
-        files_to_process = self._get_code_files(workspace_dir)
+        entry_id = self._entry_id(repo_key, path, blob)
+        chunks = []
+        for index, (start, end, text) in enumerate(chunk_code(path, content, max_lines, max_chars, overlap)):
+            metadata = {"source": path, "path": path, "blob": blob, "repo": repo_key,
+                        "start_line": start, "end_line": end}
+            chunks.append((f"{entry_id}#{index}", text, metadata))
+        return chunks
 
-        if not files_to_process:
-            logging.warning("No code files found to populate the database.")
-            return
+    def _read_ahead(self, executor, workspace_dir: str, repo_key: str, pending: dict, depth: int):
+        """Yield chunked files in order while keeping at most depth reads in flight."""
+        in_flight = deque()
+        for path, blob in pending.items():
+            in_flight.append(executor.submit(self._read_file_chunks, workspace_dir, repo_key, path, blob))
+            if len(in_flight) >= depth:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
 
-        documents, metadatas, ids = [], [], []
+    def _encode_workers(self) -> int:
+        workers = self.indexing_config.get('encode_workers', 1)
+        if workers == 'auto':
+            workers = os.cpu_count() or 1
+        return max(1, int(workers))
 
-        for file_path in files_to_process:
-            try:
-                if self.collection.get(ids=[file_path])['ids']:
-                    logging.info(f"Skipping already indexed file: {file_path}")
+    def _index_files(self, workspace_dir: str, repo_key: str, pending: dict) -> dict:
+        """
+        Embed and store pending {path: blob} files through an overlapped pipeline:
+        a thread pool reads and chunks files, the calling thread encodes batches
+        (sharded over a process pool when configured) and a writer thread upserts them.
+        """
+        batch_size = self.indexing_config.get('batch_size', 64)
+        read_workers = self.indexing_config.get('read_workers', 4)
+        encode_workers = self._encode_workers()
+        started = time.time()
+
+        encode_pool = None
+        if encode_workers > 1 and len(pending) >= self.indexing_config.get('multiprocess_min_files', 200):
+            logger.info(f"Starting {encode_workers} embedding worker processes...")
+            encode_pool = self.model.start_multi_process_pool(target_devices=['cpu'] * encode_workers)
+            # Give every worker process a full batch per encode call.
+            batch_size *= encode_workers
+
+        write_queue = queue.Queue(maxsize=self.indexing_config.get('write_queue_size', 4))
+        writer_errors = []
+
+        def writer():
+            while True:
+                batch = write_queue.get()
+                if batch is None:
+                    return
+                if writer_errors:
                     continue
+                try:
+                    self.collection.upsert(**batch)
+                except Exception as e:
+                    writer_errors.append(e)
 
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read()
-                    if content.strip():
-                        documents.append(content)
-                        metadatas.append({"source": file_path})
-                        ids.append(file_path)
-            except Exception as e:
-                logging.warning(f"Could not read or process file {file_path}: {e}")
-
-        if not documents:
-            logging.info("No new files to add to the vector database.")
-            return
-
-        embedding_config = get_model_config('embedding')
-        show_progress = embedding_config.get('show_progress', True)
-        
-        logging.info(f"Generating embeddings for {len(documents)} new documents...")
-        embeddings = self.model.encode(documents, show_progress_bar=show_progress).tolist()
-
-        logging.info("Adding new documents to ChromaDB collection...")
-        self.collection.add(
-            embeddings=embeddings,
-            documents=documents,
-            metadatas=metadatas,
-            ids=ids
+        def flush(ids, documents, metadatas):
+            if writer_errors:
+                raise writer_errors[0]
+            if encode_pool is not None:
+                embeddings = self.model.encode_multi_process(documents, encode_pool, batch_size=len(documents) // encode_workers + 1)
+            else:
+                embeddings = self.model.encode(documents, batch_size=len(documents), show_progress_bar=False)
+            write_queue.put({"ids": ids, "documents": documents, "metadatas": metadatas,
+                             "embeddings": embeddings.tolist()})
+
+        writer_thread = threading.Thread(target=writer, name="vector-db-writer", daemon=True)
+        writer_thread.start()
+        file_count, chunk_count = 0, 0
+        try:
+            with ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix="vector-db-reader") as readers:
+                ids, documents, metadatas = [], [], []
+                for file_chunks in self._read_ahead(readers, workspace_dir, repo_key, pending, read_workers * 4):
+                    file_count += 1
+                    for chunk_id, document, metadata in file_chunks:
+                        ids.append(chunk_id)
+                        documents.append(document)
+                        metadatas.append(metadata)
+                        if len(ids) >= batch_size:
+                            flush(ids, documents, metadatas)
+                            chunk_count += len(ids)
+                            ids, documents, metadatas = [], [], []
+                if ids:
+                    flush(ids, documents, metadatas)
+                    chunk_count += len(ids)
+        finally:
+            write_queue.put(None)
+            writer_thread.join()
+            if encode_pool is not None:
+                self.model.stop_multi_process_pool(encode_pool)
+        if writer_errors:
+            raise writer_errors[0]
+
+        elapsed = max(time.time() - started, 1e-6)
+        stats = {
+            "files": file_count,
+            "chunks": chunk_count,
+            "seconds": round(elapsed, 2),
+            "files_per_second": round(file_count / elapsed, 1),
+            "chunks_per_second": round(chunk_count / elapsed, 1),
+            "read_workers": read_workers,
+            "encode_workers": encode_workers if encode_pool is not None else 1,
+        }
+        logger.info(
+            f"Indexed {file_count} files / {chunk_count} chunks in {stats['seconds']}s "
+            f"({stats['files_per_second']} files/s, {stats['chunks_per_second']} chunks/s)"
         )
-        logging.info("Successfully populated vector database from directory.")
+        return stats
+
+    def _load_index_state(self) -> dict:
+        try:
+            with open(self.index_state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save_index_state(self, state: dict):
+        tmp_path = f"{self.index_state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.index_state_path)
+
+    def _dirty_paths(self, repo) -> set:
+        """Paths whose working-tree content differs from the index: modified, added, untracked or deleted."""
+        entries = repo.git.status('--porcelain', '-z', '--untracked-files=all').split('\0')
+        dirty, index = set(), 0
+        while index < len(entries):
+            entry = entries[index]
+            index += 1
+            if len(entry) < 4:
+                continue
+            dirty.add(entry[3:])
+            if entry[0] in 'RC':
+                index += 1  # the rename/copy source follows as its own entry
+        return dirty
+
+    def _scan_blobs(self, workspace_dir: str, repo, dirty=()) -> dict:
+        """
+        Map repo-relative path -> blob SHA for every indexable file, as it is in
+        the working tree (that's what gets chunked).
+        """
+        blobs = {}
+        if repo is not None:
+            # `git ls-files -s` reads blob SHAs straight from the index, no hashing needed.
+            # -t tags skip-worktree entries (S), which sparse checkouts leave off disk.
+            for entry in repo.git.ls_files('-s', '-t', '-z').split('\0'):
+                if not entry:
+                    continue
+                info, path = entry.split('\t', 1)
+                tag, _, sha, _ = info.split()
+                if tag != 'S' and self._is_indexable(path):
+                    blobs[path] = sha
+            # Index SHAs are wrong for edited files; hash what is actually on disk.
+            on_disk = sorted(path for path in dirty
+                             if self._is_indexable(path) and os.path.isfile(os.path.join(workspace_dir, path)))
+            for path in dirty:
+                blobs.pop(path, None)
+            if on_disk:
+                blobs.update(zip(on_disk, repo.git.hash_object('--', *on_disk).split()))
+            return blobs
+
+        for file_path in self._get_code_files(workspace_dir):
+            path = os.path.relpath(file_path, workspace_dir).replace(os.sep, '/')
+            with open(file_path, 'rb') as f:
+                blobs[path] = self._blob_sha(f.read())
+        return blobs
+
+    def _changed_paths(self, repo, last_commit: str, head: str):
+        """Paths touched between two commits, or None if last_commit is not available locally."""
+        try:
+            output = repo.git.diff('--name-only', '-z', '--no-renames', last_commit, head)
+        except git.exc.GitCommandError:
+            return None
+        return [path for path in output.split('\0') if path]
+
+    def _existing_entries(self, repo_key: str, paths=None) -> dict:
+        """One batched lookup of indexed entries for a repo (optionally limited to paths)."""
+        where = {"repo": repo_key}
+        if paths is not None:
+            where = {"$and": [{"repo": repo_key}, {"path": {"$in": paths}}]}
+        result = self.collection.get(where=where, include=["metadatas"])
+        return dict(zip(result['ids'], result['metadatas']))
+
+    def populate_from_directory(self, workspace_dir: str, repo_key: str = None):
+        """
+        Index a workspace keyed on (repo, path, git blob SHA).
+
+        Entries survive across fresh clones of the same repo. When the commit indexed
+        last time is available, only paths changed since then are examined; removed
+        or superseded blobs are deleted from the collection. Returns throughput stats.
+        """
+        logger.info(f"Scanning directory '{workspace_dir}' to populate vector database...")
+        try:
+            repo = git.Repo(workspace_dir)
+        except (git.exc.InvalidGitRepositoryError, git.exc.NoSuchPathError):
+            repo = None
+
+        if repo_key is None:
+            if repo is not None and repo.remotes:
+                repo_key = repo.remotes[0].url
+            else:
+                repo_key = os.path.basename(os.path.abspath(workspace_dir))
+
+        head = repo.head.commit.hexsha if repo is not None else None
+        index_state = self._load_index_state()
+        last_commit = index_state.get(repo_key)
+        # Paths indexed from an edited worktree last time must be re-checked against this tree.
+        previously_dirty = set(index_state.get('dirty', {}).get(repo_key, []))
+        dirty = self._dirty_paths(repo) if repo is not None else set()
+
+        if head is not None and head == last_commit and not dirty and not previously_dirty:
+            logger.info(f"Index for {repo_key} is already at {head[:10]}.")
+            return {"files": 0, "chunks": 0}
+
+        blobs = self._scan_blobs(workspace_dir, repo, dirty)
+        scope = None
+        if head is not None and last_commit:
+            scope = self._changed_paths(repo, last_commit, head)
+        if scope is not None:
+            scope = sorted(set(scope) | dirty | previously_dirty)
+            logger.info(f"Incremental index: {len(scope)} paths changed since {last_commit[:10]}.")
+            changed = set(scope)
+            blobs = {path: blob for path, blob in blobs.items() if path in changed}
+
+        existing = self._existing_entries(repo_key, scope)
+        indexed = {(meta['path'], meta['blob']) for meta in existing.values()}
+
+        stale_ids = [entry_id for entry_id, meta in existing.items()
+                     if blobs.get(meta['path']) != meta['blob']]
+        if stale_ids:
+            logger.info(f"Tombstoning {len(stale_ids)} chunks of removed or superseded files.")
+            self.collection.delete(ids=stale_ids)
+
+        pending = {path: blob for path, blob in blobs.items() if (path, blob) not in indexed}
+        stats = {"files": 0, "chunks": 0}
+        if pending:
+            logger.info(f"Embedding {len(pending)} new or changed files...")
+            stats = self._index_files(workspace_dir, repo_key, pending)
+        else:
+            logger.info("No new files to add to the vector database.")
+
+        if head is not None:
+            index_state[repo_key] = head
+            dirty_state = index_state.setdefault('dirty', {})
+            if dirty:
+                dirty_state[repo_key] = sorted(dirty)
+            else:
+                dirty_state.pop(repo_key, None)
+            self._save_index_state(index_state)
+        logger.info("Successfully populated vector database from directory.")
+        return stats
 
-    def query_codebase(self, query_text: str, n_results: int = 5) -> list[str]:
+    def query_codebase(self, query_text: str, n_results: int = 5, repo_key: str = None) -> list[str]:
         if not query_text:
             return []
 
-        logging.info(f"Querying vector database with: '{query_text[:60]}...'")
+        logger.info(f"Querying vector database with: '{query_text[:60]}...'")
         query_embedding = self.model.encode([query_text]).tolist()
 
         results = self.collection.query(
             query_embeddings=query_embedding,
             n_results=n_results,
+            where={"repo": repo_key} if repo_key else None,
             include=["documents"]
         )
 
         retrieved_docs = results.get('documents', [[]])[0]
-        logging.info(f"Retrieved {len(retrieved_docs)} relevant code snippets.")
+        logger.info(f"Retrieved {len(retrieved_docs)} relevant code snippets.")
         return retrieved_docs
 
     def clear_collection(self):
-        logging.warning(f"Clearing all documents from collection '{self.collection_name}'...")
+        logger.warning(f"Clearing all documents from collection '{self.collection_name}'...")
         self.client.delete_collection(name=self.collection_name)
         self.collection = self.client.get_or_create_collection(name=self.collection_name)
-        logging.info("Collection cleared successfully.")
+        if os.path.exists(self.index_state_path):
+            os.remove(self.index_state_path)
+        logger.info("Collection cleared successfully.")
@@ -0,0 +1,66 @@
+import sys
+import json
+import uuid
+import logging
+import contextvars
+
+_trace_id = contextvars.ContextVar('momentum_trace_id', default=None)
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def get_trace_id():
+    return _trace_id.get()
+
+
+def set_trace_id(trace_id: str):
+    """
+    Bind a trace id to the current context. Tasks created afterwards inherit it,
+    and so do executor pool calls (they run in a copy of the caller's context).
+    """
+    return _trace_id.set(trace_id)
+
+
+class TraceIdFilter(logging.Filter):
+    def filter(self, record):
+        record.trace_id = _trace_id.get() or "-"
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "trace_id": getattr(record, 'trace_id', '-'),
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+def configure_logging(logging_config: dict):
+    """
+    Route all logging through one stderr handler, as text or JSON lines, with the
+    current trace id on every record.
+    """
+    handler = logging.StreamHandler(sys.stderr)
+    handler.addFilter(TraceIdFilter())
+    if logging_config.get('format', 'text') == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(
+            logging_config.get('text_format', '%(asctime)s %(levelname)s %(name)s [%(trace_id)s] %(message)s')
+        ))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(logging_config.get('level', 'INFO'))
+    for name, level in logging_config.get('levels', {}).items():
+        logging.getLogger(name).setLevel(level)
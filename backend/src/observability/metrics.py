@@ -0,0 +1,78 @@
+import time
+from contextlib import contextmanager
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+
+# A registry of our own, so /metrics shows the agent's series and nothing imported by accident.
+REGISTRY = CollectorRegistry(auto_describe=True)
+
+_FAST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+_SLOW_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+STATE_DURATION = Histogram(
+    'momentum_state_duration_seconds', 'Time spent executing one agent state.',
+    ['state', 'outcome'], buckets=_SLOW_BUCKETS, registry=REGISTRY
+)
+RUNS = Counter('momentum_runs_total', 'Agent runs by final state.', ['final_state'], registry=REGISTRY)
+
+LLM_LATENCY = Histogram(
+    'momentum_llm_request_seconds', 'LLM completion latency, request to last token.',
+    ['prompt_type', 'source'], buckets=_SLOW_BUCKETS, registry=REGISTRY
+)
+LLM_TTFB = Histogram(
+    'momentum_llm_ttfb_seconds', 'Time to the first streamed token.',
+    ['prompt_type'], buckets=_FAST_BUCKETS + (30, 60), registry=REGISTRY
+)
+LLM_TOKENS = Counter(
+    'momentum_llm_tokens_total', 'Tokens sent to and received from the LLM.',
+    ['prompt_type', 'direction'], registry=REGISTRY
+)
+LLM_CACHE_LOOKUPS = Counter(
+    'momentum_llm_cache_lookups_total', 'LLM response cache lookups by result (memory_hits, disk_hits, misses, bypassed).',
+    ['result'], registry=REGISTRY
+)
+LLM_ERRORS = Counter('momentum_llm_errors_total', 'Failed LLM requests.', ['prompt_type'], registry=REGISTRY)
+
+CONNECTOR_CALL = Histogram(
+    'momentum_connector_call_seconds', 'Blocking connector calls run on the executor pools (clone, container start, push, ...).',
+    ['pool', 'method', 'outcome'], buckets=_SLOW_BUCKETS, registry=REGISTRY
+)
+DOCKER_EXEC = Histogram(
+    'momentum_docker_exec_seconds', 'Commands executed inside sandboxes.',
+    ['command', 'exit_status'], buckets=_SLOW_BUCKETS, registry=REGISTRY
+)
+
+QUEUE_DEPTH = Gauge('momentum_scheduler_queue_depth', 'Jobs waiting for a scheduler worker.', registry=REGISTRY)
+RUNNING_JOBS = Gauge('momentum_scheduler_running_jobs', 'Jobs currently running.', registry=REGISTRY)
+
+WEBSOCKET_SEND_LAG = Histogram(
+    'momentum_websocket_send_lag_seconds', 'Time a message waits in a client queue before it is sent.',
+    buckets=_FAST_BUCKETS, registry=REGISTRY
+)
+WEBSOCKET_CONNECTIONS = Gauge('momentum_websocket_connections', 'Connected WebSocket clients.', registry=REGISTRY)
+WEBSOCKET_DROPPED = Counter(
+    'momentum_websocket_dropped_total', 'Messages dropped from full client queues.', registry=REGISTRY
+)
+
+
+@contextmanager
+def observe_duration(histogram: Histogram, with_outcome: bool = False, **labels):
+    """
+    Time the block into the histogram. With with_outcome, an 'outcome' label is
+    set to "ok" or "error" depending on whether the block raised.
+    """
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        if with_outcome:
+            labels['outcome'] = outcome
+        histogram.labels(**labels).observe(time.perf_counter() - started)
+
+
+def render_latest() -> tuple[bytes, str]:
+    """The registry in the Prometheus text format, with its content type."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,132 @@
+import asyncio
+import threading
+import contextvars
+
+import pytest
+
+from src.connectors.async_executor import AsyncConnectorProxy, BoundedExecutor
+
+request_id = contextvars.ContextVar("request_id", default=None)
+
+
+@pytest.fixture
+def make_executor():
+    executors = []
+
+    def make(**kwargs):
+        executor = BoundedExecutor("test", **{"max_workers": 2, **kwargs})
+        executors.append(executor)
+        return executor
+    yield make
+    for executor in executors:
+        executor.shutdown()
+
+
+@pytest.fixture
+def release():
+    # set on teardown too, so a failing test never leaves a pool thread blocked
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+async def wait_until(predicate, timeout: float = 5):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not predicate():
+        assert loop.time() < deadline, "condition not reached"
+        await asyncio.sleep(0.01)
+
+
+async def test_saturation_is_counted_while_calls_queue(make_executor, release):
+    executor = make_executor()
+    calls = [asyncio.create_task(executor.run(release.wait)) for _ in range(3)]
+    await wait_until(lambda: executor.stats()["active"] == 2)
+
+    stats = executor.stats()
+    assert (stats["queued"], stats["saturation"]) == (1, 1.0)
+    assert stats["peak_queued"] >= 1
+    release.set()
+    assert await asyncio.gather(*calls) == [True, True, True]
+    stats = executor.stats()
+    assert (stats["active"], stats["queued"], stats["completed"], stats["saturation"]) == (0, 0, 3, 0)
+    assert stats["name"] == "test" and stats["max_workers"] == 2
+
+
+async def test_running_call_times_out_but_finishes_in_the_background(make_executor, release):
+    executor = make_executor(default_timeout=0.05)
+    with pytest.raises(TimeoutError, match="test call wait timed out after 0.05s"):
+        await executor.run(release.wait)
+    assert executor.stats()["timeouts"] == 1
+    assert executor.stats()["active"] == 1
+
+    release.set()
+    await wait_until(lambda: executor.stats()["completed"] == 1)
+    assert executor.stats()["active"] == 0
+
+
+async def test_queued_call_that_times_out_never_runs(make_executor, release):
+    executor = make_executor(max_workers=1)
+    ran = []
+    blocker = asyncio.create_task(executor.run(release.wait))
+    await wait_until(lambda: executor.stats()["active"] == 1)
+
+    with pytest.raises(TimeoutError):
+        await executor.run(ran.append, "queued", timeout=0.05)
+    assert executor.stats()["queued"] == 0
+    release.set()
+    await blocker
+    await asyncio.sleep(0.05)
+    assert ran == []
+    assert executor.stats()["completed"] == 1
+
+
+async def test_per_call_timeout_overrides_the_default(make_executor):
+    executor = make_executor(default_timeout=0.01)
+    assert await executor.run(lambda: threading.Event().wait(0.05) or "done", timeout=5) == "done"
+
+
+async def test_failures_are_raised_and_counted(make_executor):
+    executor = make_executor()
+
+    def fail():
+        raise ValueError("boom")
+    with pytest.raises(ValueError, match="boom"):
+        await executor.run(fail)
+    stats = executor.stats()
+    assert (stats["failed"], stats["completed"], stats["active"]) == (1, 0, 0)
+
+
+async def test_cancelled_queued_call_is_dropped(make_executor, release):
+    executor = make_executor(max_workers=1)
+    ran = []
+    blocker = asyncio.create_task(executor.run(release.wait))
+    await wait_until(lambda: executor.stats()["active"] == 1)
+
+    queued = asyncio.create_task(executor.run(ran.append, "queued"))
+    await wait_until(lambda: executor.stats()["queued"] == 1)
+    queued.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await queued
+    assert (executor.stats()["cancelled"], executor.stats()["queued"]) == (1, 0)
+    release.set()
+    await blocker
+    assert ran == []
+
+
+async def test_calls_run_in_the_callers_context(make_executor):
+    executor = make_executor()
+    request_id.set("run-1")
+    assert await executor.run(request_id.get) == "run-1"
+
+
+async def test_proxy_keeps_timeout_for_the_pool(make_executor):
+    class Connector:
+        repo_url = "https://example.com/repo.git"
+
+        def clone(self, depth, timeout="not passed"):
+            return depth, timeout
+
+    proxy = AsyncConnectorProxy(Connector(), make_executor())
+    assert proxy.repo_url == "https://example.com/repo.git"
+    assert await proxy.clone(1, timeout=5) == (1, "not passed")
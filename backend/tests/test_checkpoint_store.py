@@ -0,0 +1,124 @@
+import pytest
+
+from src.agent.checkpoint_store import CheckpointStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = CheckpointStore(str(tmp_path / "checkpoints.sqlite3"))
+    yield store
+    store._db.close()
+
+
+@pytest.fixture
+def orchestrator(monkeypatch):
+    pytest.importorskip("docker")
+    from src.agent import orchestrator
+
+    class FakeConnector:
+        def __init__(self, *args, **kwargs):
+            pass
+
+    for name in ("LlamaConnector", "DockerConnector", "GithubConnector", "GitConnector"):
+        monkeypatch.setattr(orchestrator, name, FakeConnector)
+    monkeypatch.setenv("GIT_REPO_URL", "https://example.com/repo.git")
+    return orchestrator
+
+
+def test_save_load_delete_round_trip(store):
+    snapshot = {"plan": "p", "file_contents": {"app.py": "print('hi')\n"}, "seen_comment_ids": [1, 2]}
+    store.save("run1", "PLANNING", "task", snapshot)
+    checkpoint = store.load("run1")
+    assert checkpoint["task_id"] == "run1"
+    assert checkpoint["state"] == "PLANNING"
+    assert checkpoint["prompt"] == "task"
+    assert checkpoint["snapshot"] == snapshot
+
+    store.save("run1", "TESTING", "task", {**snapshot, "fix_attempts": 1})
+    updated = store.load("run1")
+    assert updated["state"] == "TESTING"
+    assert updated["snapshot"]["fix_attempts"] == 1
+    assert updated["updated_at"] >= checkpoint["updated_at"]
+
+    store.delete("run1")
+    assert store.load("run1") is None
+    assert store.load("missing") is None
+
+
+def test_list_runs_keeps_first_save_order(store):
+    store.save("run1", "PLANNING", "first", {})
+    store.save("run2", "PLANNING", "second", {})
+    store.save("run1", "TESTING", "first", {})
+    assert [(run["task_id"], run["state"]) for run in store.list_runs()] == [("run1", "TESTING"), ("run2", "PLANNING")]
+
+
+def test_checkpoints_survive_reopening(tmp_path):
+    path = str(tmp_path / "nested" / "checkpoints.sqlite3")
+    first = CheckpointStore(path)
+    first.save("run1", "FIXING", "task", {"fix_attempts": 2})
+    first._db.close()
+
+    reopened = CheckpointStore(path)
+    try:
+        assert reopened.load("run1")["snapshot"] == {"fix_attempts": 2}
+    finally:
+        reopened._db.close()
+
+
+def test_cancel_drops_later_saves(store):
+    store.save("run1", "PLANNING", "task", {"plan": "p"})
+    store.cancel("run1")
+    assert store.load("run1") is None
+
+    # A save that was already on its way when the run was cancelled.
+    store.save("run1", "CODE_GENERATION", "task", {"plan": "p"})
+    assert store.load("run1") is None
+    assert store.list_runs() == []
+
+    store.save("run2", "PLANNING", "task", {})
+    assert store.load("run2")["state"] == "PLANNING"
+
+
+@pytest.mark.parametrize("state", ["STARTING", "PLANNING", "CODE_GENERATION", "TESTING",
+                                   "AWAITING_REVIEW", "PARKED", "FIXING"])
+def test_agent_resumes_from_checkpointed_state(store, orchestrator, tmp_path, state):
+    stale_workspace = tmp_path / "stale-worktree"
+    stale_workspace.mkdir()
+    agent = orchestrator.MomentumAgent(task_id="run1")
+    agent.plan = "1. write app.py"
+    agent.feature_branch = "momentum/abc123"
+    agent.pull_request_info = {"number": 7, "html_url": "https://example.com/pull/7"}
+    agent.review_comments = [{"id": 3, "path": "app.py", "body": "rename"}]
+    agent.seen_comment_ids = {3}
+    agent.file_contents = {"app.py": "x = 1\n", "tests/test_app.py": "def test_x(): pass\n"}
+    agent.code_files = ["app.py"]
+    agent.speculative_test = "def test_x(): pass\n"
+    agent.failing_tests = ["tests/test_app.py::test_x"]
+    agent.test_durations = {"tests/test_app.py": 0.5}
+    agent.test_regenerations = 1
+    agent.fix_attempts = 2
+    agent.workspace_dir = str(stale_workspace)
+    store.save(agent.task_id, state, "task", agent.snapshot())
+
+    resumed = orchestrator.MomentumAgent.from_checkpoint(store.load("run1"), checkpoint_store=store)
+
+    assert resumed.state_machine.get_state() == orchestrator.AgentState[state]
+    assert resumed.task_id == "run1"
+    assert resumed.trace_id == agent.trace_id
+    assert resumed.checkpoint_store is store
+    for field in ("plan", "feature_branch", "pull_request_info", "review_comments", "seen_comment_ids",
+                  "file_contents", "code_files", "speculative_test", "failing_tests", "test_durations",
+                  "test_regenerations", "fix_attempts"):
+        assert getattr(resumed, field) == getattr(agent, field), field
+    assert resumed.written_files == set(agent.file_contents)
+    # the old process's worktree is freed; the resumed run recreates its own
+    assert resumed.workspace_dir is None
+    assert not stale_workspace.exists()
+
+
+def test_agent_without_connectors_resumes_as_error(store, orchestrator, monkeypatch):
+    monkeypatch.delenv("GIT_REPO_URL")
+    agent = orchestrator.MomentumAgent(task_id="run1")
+    store.save(agent.task_id, "TESTING", "task", agent.snapshot())
+    resumed = orchestrator.MomentumAgent.from_checkpoint(store.load("run1"))
+    assert resumed.state_machine.get_state() == orchestrator.AgentState.ERROR
@@ -0,0 +1,114 @@
+import os
+import time
+
+import pytest
+import yaml
+
+from src.config.config_loader import ConfigLoader, ConfigSnapshot
+
+
+def make_raw(**overrides) -> dict:
+    raw = {
+        'models': {'llm': {'name': 'model', 'cache': {'max_temperature': 0}}},
+        'vector_db': {},
+        'file_system': {'workspace_root': 'workspace'},
+        'git': {},
+        'agent': {'max_retries': 3, 'flags': ['a', 'b']},
+        'languages': {'python': {'extension': '.py'}},
+        'prompts': {'planning': {'system': 'Plan.', 'template': 'Plan {task}', 'max_tokens': 100}},
+        'status_messages': {'planning': {'start': 'Planning {task}'}},
+    }
+    raw.update(overrides)
+    return raw
+
+
+def write_config(path, raw: dict, mtime: float = None):
+    path.write_text(yaml.safe_dump(raw))
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def test_snapshot_flattens_dotted_keys():
+    snapshot = ConfigSnapshot(make_raw())
+    assert snapshot.get('models.llm.cache.max_temperature') == 0
+    assert snapshot.get('agent.max_retries') == 3
+    assert snapshot.get('models.llm')['name'] == 'model'
+    assert snapshot.get_section('models.llm.cache')['max_temperature'] == 0
+    assert snapshot.prompt('planning')['template'] == 'Plan {task}'
+    assert snapshot.status_message('planning', 'start') == 'Planning {task}'
+    assert snapshot.language_for_extension('.py')['name'] == 'python'
+
+
+def test_missing_keys_fall_back_to_default_or_raise():
+    snapshot = ConfigSnapshot(make_raw())
+    assert snapshot.get('agent.missing', 5) == 5
+    assert snapshot.get_section('missing') == {}
+    with pytest.raises(KeyError):
+        snapshot.get('agent.missing')
+
+
+def test_snapshot_is_immutable_and_independent_of_its_source():
+    raw = make_raw()
+    snapshot = ConfigSnapshot(raw)
+    raw['agent']['max_retries'] = 99
+    assert snapshot.get('agent.max_retries') == 3
+
+    with pytest.raises(TypeError):
+        snapshot.get_section('agent')['max_retries'] = 1
+    with pytest.raises(TypeError):
+        snapshot.get('models.llm')['cache']['max_temperature'] = 1
+    assert snapshot.get('agent.flags') == ('a', 'b')
+
+
+def test_invalid_config_fails_the_load():
+    with pytest.raises(ValueError, match="git"):
+        ConfigSnapshot({key: value for key, value in make_raw().items() if key != 'git'})
+    with pytest.raises(ValueError, match="prompts.planning.template"):
+        ConfigSnapshot(make_raw(prompts={'planning': {'template': 'Plan {task'}}))
+
+
+def test_reload_swaps_in_a_new_version_when_the_file_changes(tmp_path):
+    path = tmp_path / "config.yaml"
+    write_config(path, make_raw(), mtime=1000)
+    loader = ConfigLoader(str(path))
+    first = loader.snapshot()
+    assert not loader.reload_if_changed()
+
+    write_config(path, make_raw(agent={'max_retries': 7}), mtime=2000)
+    assert loader.reload_if_changed()
+    assert loader.get('agent.max_retries') == 7
+    assert loader.snapshot().version == first.version + 1
+    # a held snapshot keeps its own view
+    assert first.get('agent.max_retries') == 3
+
+
+def test_broken_file_keeps_the_current_snapshot_until_the_next_edit(tmp_path, monkeypatch):
+    path = tmp_path / "config.yaml"
+    write_config(path, make_raw(), mtime=1000)
+    loader = ConfigLoader(str(path))
+    current = loader.snapshot()
+
+    path.write_text("models: [unclosed")
+    os.utime(path, (2000, 2000))
+    assert not loader.reload_if_changed()
+    assert loader.snapshot() is current
+
+    loads = []
+    monkeypatch.setattr(loader, "_load_config", lambda: loads.append(1))
+    assert not loader.reload_if_changed()
+    assert loads == []  # the same broken file isn't parsed again on every poll
+
+
+def test_watcher_picks_up_changes(tmp_path):
+    path = tmp_path / "config.yaml"
+    write_config(path, make_raw(), mtime=1000)
+    loader = ConfigLoader(str(path))
+    loader.start_watching(poll_interval=0.01)
+    try:
+        write_config(path, make_raw(agent={'max_retries': 9}), mtime=2000)
+        deadline = time.monotonic() + 5
+        while loader.get('agent.max_retries') != 9 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert loader.get('agent.max_retries') == 9
+    finally:
+        loader.stop_watching()
@@ -0,0 +1,160 @@
+import time
+import itertools
+import threading
+
+import pytest
+
+pytest.importorskip("docker")
+
+from src.connectors import container_pool
+from src.connectors.container_pool import ContainerPool, PooledContainer, get_container_pool, shutdown_container_pool
+
+_ids = itertools.count()
+
+
+class FakeContainer:
+    def __init__(self, image: str):
+        self.id = f"container-{next(_ids)}"
+        self.short_id = self.id
+        self.image = image
+        self.status = "running"
+        self.removed = False
+
+    def reload(self):
+        pass
+
+    def exec_run(self, command):
+        return (0 if self.status == "running" else 1), b""
+
+    def remove(self, force=False):
+        self.removed = True
+
+
+class FakeContainers:
+    def __init__(self):
+        self.started = []
+
+    def run(self, image, **kwargs):
+        container = FakeContainer(image)
+        self.started.append(container)
+        return container
+
+
+class FakeClient:
+    def __init__(self):
+        self.containers = FakeContainers()
+
+
+@pytest.fixture
+def make_pool(monkeypatch):
+    # no background reaper: the tests drive _reap and _top_up themselves
+    monkeypatch.setattr(ContainerPool, "_reap_loop", lambda self: None)
+    pools = []
+
+    def make(**kwargs):
+        pool = ContainerPool(FakeClient(), "image", **{"health_check_interval": 3600, **kwargs})
+        pools.append(pool)
+        return pool
+    yield make
+    for pool in pools:
+        pool.shutdown()
+
+
+def test_lease_takes_a_warm_container(make_pool):
+    pool = make_pool(min_size=1, max_size=2)
+    pool._top_up()
+    warm, = pool.client.containers.started
+    assert pool.lease(timeout=1) is warm
+    assert len(pool.client.containers.started) == 1
+
+
+def test_lease_cold_starts_when_nothing_is_idle(make_pool):
+    pool = make_pool(min_size=0, max_size=2)
+    container = pool.lease(timeout=1)
+    assert pool.client.containers.started == [container]
+
+
+def test_unhealthy_idle_container_is_replaced_on_lease(make_pool):
+    pool = make_pool(min_size=1, max_size=2)
+    pool._top_up()
+    broken = pool.client.containers.started[0]
+    broken.status = "exited"
+    container = pool.lease(timeout=1)
+    assert container is not broken
+    assert broken.removed
+
+
+def test_release_destroys_the_container_and_frees_its_slot(make_pool):
+    pool = make_pool(min_size=0, max_size=1)
+    first = pool.lease(timeout=1)
+    with pytest.raises(TimeoutError):
+        pool.lease(timeout=0.05)
+
+    leased = []
+    waiter = threading.Thread(target=lambda: leased.append(pool.lease(timeout=5)))
+    waiter.start()
+    time.sleep(0.05)
+    pool.release(first)
+    waiter.join(5)
+
+    assert first.removed
+    # single-use: the next run gets a fresh container, never the released one
+    assert leased and leased[0] is not first
+
+
+def test_top_up_stays_within_max_size(make_pool):
+    pool = make_pool(min_size=2, max_size=2)
+    pool.lease(timeout=1)
+    pool._top_up()
+    assert len(pool._idle) == 1
+
+
+def test_reap_removes_surplus_idle_containers_after_idle_timeout(make_pool):
+    pool = make_pool(min_size=1, max_size=4, idle_timeout=60)
+    old = [PooledContainer(FakeContainer("image")) for _ in range(2)]
+    for pooled in old:
+        pooled.last_used -= 120
+    fresh = [PooledContainer(FakeContainer("image")) for _ in range(2)]
+    pool._idle = old + fresh
+    pool._reap()
+    # three are surplus, but only the two older than idle_timeout go
+    assert sorted(p.container.id for p in pool._idle) == sorted(p.container.id for p in fresh)
+    assert all(p.container.removed for p in old)
+
+
+def test_unused_pool_scales_down_to_no_idle_containers(make_pool):
+    pool = make_pool(min_size=1, max_size=4, idle_timeout=60)
+    pool._top_up()
+    idle = pool.client.containers.started[0]
+    pool.last_leased -= 120
+    pool._reap()
+    pool._top_up()
+    assert pool._idle == []
+    assert idle.removed
+    assert len(pool.client.containers.started) == 1
+
+    pool.lease(timeout=1)
+    pool._top_up()
+    assert len(pool._idle) == 1  # warm again once it is used
+
+
+def test_kept_warm_pool_keeps_min_size_while_unused(make_pool):
+    pool = make_pool(min_size=1, max_size=4, idle_timeout=60, keep_warm=True)
+    pool._top_up()
+    pool.last_leased -= 120
+    pool._reap()
+    pool._top_up()
+    assert len(pool._idle) == 1
+
+
+def test_get_container_pool_pins_an_existing_pool(monkeypatch):
+    monkeypatch.setattr(ContainerPool, "_reap_loop", lambda self: None)
+    client = FakeClient()
+    try:
+        pool = get_container_pool(client, "pinned-image", {})
+        assert not pool.keep_warm
+        assert get_container_pool(client, "pinned-image", {}, keep_warm=True) is pool
+        assert pool.keep_warm
+    finally:
+        shutdown_container_pool("pinned-image")
+    assert "pinned-image" not in container_pool._pools
@@ -0,0 +1,85 @@
+from src.agent.context_packer import ContextPacker, Section, TokenCounter
+
+TEMPLATE = "Fix {file}:\n{code}\nFeedback:\n{feedback}\nContext:\n{context}"
+
+
+def make_packer(budget: int) -> ContextPacker:
+    return ContextPacker(TokenCounter(), budget_tokens=budget, focus_radius=1)
+
+
+def test_estimated_counts():
+    counter = TokenCounter()
+    assert counter.count("") == 0
+    assert counter.count("abcde") == 2
+    assert counter.count_many(["abcd", "abcdefgh"]) == [1, 2]
+    assert not counter.exact
+
+
+def test_everything_fits():
+    packed = make_packer(1000).pack(TEMPLATE, {"file": "a.py"}, [
+        Section("code", "x = 1"), Section("feedback", "rename x"), Section("context", "y = 2"),
+    ])
+    assert packed.shrunk == []
+    assert "x = 1" in packed.text and "rename x" in packed.text and "y = 2" in packed.text
+    assert packed.total_tokens == sum(packed.section_tokens.values())
+
+
+def test_sections_are_packed_in_order_and_shrunk_or_dropped():
+    seen = {}
+
+    def shrink(text, max_tokens):
+        seen["max_tokens"] = max_tokens
+        return text[:max_tokens * 4]
+
+    packer = make_packer(40)
+    packed = packer.pack(TEMPLATE, {"file": "a.py"}, [
+        Section("code", "c" * 40),
+        Section("feedback", "f" * 400, shrink),
+        Section("context", "z" * 400),
+    ])
+    assert packed.section_tokens["code"] == 10
+    assert packed.shrunk == ["feedback", "context"]
+    assert packed.section_tokens["feedback"] == seen["max_tokens"]
+    assert packed.section_tokens["context"] == 0
+    assert "z" not in packed.text
+    assert packed.total_tokens <= packed.budget
+
+
+def test_elide_code_keeps_focus_and_signatures_within_budget():
+    lines = ["import os", "def load(path):"] + [f"    value_{i} = {i}" for i in range(40)] + ["def save(path):", "    pass"]
+    code = "\n".join(lines)
+    packer = make_packer(1000)
+    elided = packer.elide_code(code, 100, focus_lines=[20])
+
+    assert "    value_17 = 17" in elided  # line 20, with one line of radius either side
+    assert "import os" in elided and "def load(path):" in elided and "def save(path):" in elided
+    assert "lines elided)" in elided
+    assert "    value_35 = 35" not in elided
+    assert packer.counter.count(elided) <= 100
+
+
+def test_elide_code_leaves_small_code_alone():
+    code = "def f():\n    return 1"
+    assert make_packer(1000).elide_code(code, 100) == code
+
+
+def test_trim_lines_and_snippets():
+    packer = make_packer(1000)
+    trimmed = packer.trim_lines("\n".join(["a" * 8] * 10), 12)
+    assert trimmed.endswith("more omitted)")
+    assert trimmed.count("a" * 8) < 10
+
+    snippets = packer.format_snippets(["one", "two", "one", "already here"], exclude="already here!")
+    assert snippets == "one\n\n---\n\ntwo"
+    assert packer.trim_snippets(snippets, 1) == "one"
+
+
+def test_format_comments_dedupes_and_locates():
+    packer = ContextPacker(TokenCounter(), comment_max_chars=10)
+    text = packer.format_comments([
+        {"body": "Rename this variable", "path": "a.py", "line": 3},
+        {"body": "rename   this variable"},
+        {"body": "ok", "path": "b.py"},
+        {"body": ""},
+    ])
+    assert text == "- [a.py:3] Rename thi ...\n- [b.py] ok"
@@ -0,0 +1,123 @@
+import json
+import os
+import time
+
+import pytest
+
+from src.api.event_log import EventLog
+
+
+@pytest.fixture
+def make_log(tmp_path):
+    logs = []
+
+    def make(**kwargs):
+        log = EventLog(str(tmp_path / "events"), **kwargs)
+        logs.append(log)
+        return log
+    yield make
+    for log in logs:
+        log.close()
+
+
+def seqs(entries):
+    return [event["seq"] for event, _ in entries]
+
+
+def test_append_numbers_events_and_writes_them(make_log):
+    log = make_log()
+    first, text = log.append({"task_id": "run1", "type": "status", "message": "hi"})
+    assert first["seq"] == 1
+    assert json.loads(text) == first
+    log.append({"task_id": "run1", "type": "status"})
+    log.close()
+    with open(log._path("run1")) as log_file:
+        assert [json.loads(line)["seq"] for line in log_file] == [1, 2]
+
+
+def test_messages_without_a_valid_task_id_are_not_logged(make_log):
+    log = make_log()
+    message = {"task_id": "../etc", "type": "status"}
+    assert log.append(message) == (message, json.dumps(message))
+    assert log.append({"type": "status"})[0] == {"type": "status"}
+    assert os.listdir(log.directory) == []
+
+
+def test_ring_buffer_keeps_only_recent_events(make_log):
+    log = make_log(buffer_size=3)
+    for i in range(10):
+        log.append({"task_id": "run1", "i": i})
+    run_log = log._runs["run1"]
+    assert [event["seq"] for event, _ in run_log.buffer] == [8, 9, 10]
+    assert run_log.covers(7)
+    assert not run_log.covers(6)
+
+
+def test_read_pages_from_disk_past_the_buffer(make_log):
+    log = make_log(buffer_size=3)
+    for i in range(10):
+        log.append({"task_id": "run1", "i": i})
+    assert seqs(log.read_entries("run1", 0)) == list(range(1, 11))
+    assert seqs(log.read_entries("run1", 2, limit=3)) == [3, 4, 5]
+    assert seqs(log.read_entries("run1", 6, limit=10)) == [7, 8, 9, 10]
+    assert seqs(log.read_entries("run1", 10)) == []
+    assert log.read("missing") == []
+
+
+def test_recent_entries_flags_history_outside_the_buffer(make_log):
+    log = make_log(buffer_size=3)
+    for i in range(5):
+        log.append({"task_id": "run1", "i": i})
+    entries, truncated = log.recent_entries("run1", 1)
+    assert seqs(entries) == [3, 4, 5] and truncated
+    entries, truncated = log.recent_entries("run1", 2)
+    assert seqs(entries) == [3, 4, 5] and not truncated
+
+
+def test_recent_entries_never_reads_disk(make_log):
+    log = make_log()
+    log.append({"task_id": "run1"})
+    log.close()
+    reopened = make_log()
+    assert reopened.recent_entries("run1", 0) == ([], False)
+    assert not reopened.is_loaded("run1")
+
+
+async def test_ensure_loaded_restores_the_tail_off_the_loop(make_log):
+    log = make_log(buffer_size=2)
+    for i in range(4):
+        log.append({"task_id": "run1", "i": i})
+    log.close()
+
+    reopened = make_log(buffer_size=2)
+    await reopened.ensure_loaded(["run1", "missing", "bad id!"])
+    assert reopened.is_loaded("run1")
+    assert not reopened.is_loaded("missing")
+    entries, truncated = reopened.recent_entries("run1", 0)
+    assert seqs(entries) == [3, 4] and truncated
+    assert reopened.append({"task_id": "run1"})[0]["seq"] == 5
+
+
+def test_evicted_run_keeps_counting(make_log):
+    log = make_log(max_runs=1)
+    log.append({"task_id": "run1"})
+    log.append({"task_id": "run2"})
+    assert not log.is_loaded("run1")
+    assert log.append({"task_id": "run1"})[0]["seq"] == 2
+    assert log.last_seq("run1") == 2
+
+
+def test_prune_deletes_old_logs_only(make_log):
+    log = make_log()
+    log.append({"task_id": "old"})
+    log.append({"task_id": "new"})
+    log.writer.wait_for(log._path("old"))
+    log.writer.wait_for(log._path("new"))
+    week_ago = time.time() - 8 * 24 * 3600
+    os.utime(log._path("old"), (week_ago, week_ago))
+
+    log.prune()
+    assert sorted(os.listdir(log.directory)) == ["new.jsonl"]
+    assert not log.is_loaded("old")
+    assert log.last_seq("old") == 0
+    assert log.last_seq("new") == 1
@@ -0,0 +1,129 @@
+import hmac
+import json
+import time
+import hashlib
+import itertools
+
+import pytest
+import requests
+
+from src.connectors import github_connector
+from src.connectors.github_connector import (
+    GithubConnector, GithubRateLimiter, GithubRateLimitedError, rate_limit_status, verify_webhook_signature
+)
+
+_tokens = itertools.count()
+
+
+def make_response(status: int, body=None, headers: dict = None) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    response._content = json.dumps(body).encode() if body is not None else b""
+    return response
+
+
+class FakeSession:
+    """Plays back queued responses and records what was requested."""
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def request(self, method, url, headers=None, **kwargs):
+        self.calls.append((method, url, headers or {}))
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def connector(monkeypatch):
+    # a fresh token per test so the shared limiter and ETag cache start empty
+    monkeypatch.setenv("GITHUB_PAT", f"test-token-{next(_tokens)}")
+    monkeypatch.setenv("GITHUB_REPO_NAME", "owner/repo")
+    monkeypatch.setattr(github_connector.time, "sleep", lambda seconds: None)
+    return GithubConnector()
+
+
+def test_bucket_allows_burst_then_fails_fast_past_max_wait():
+    limiter = GithubRateLimiter(burst=2, reserve=0)
+    limiter.update({"X-RateLimit-Remaining": "10", "X-RateLimit-Reset": str(int(time.time()) + 1000)})
+    limiter.acquire(max_wait=0)
+    limiter.acquire(max_wait=0)
+    with pytest.raises(GithubRateLimitedError) as raised:
+        limiter.acquire(max_wait=0)
+    # 10 requests over ~1000s refill a token roughly every 100s
+    assert 50 < raised.value.retry_after <= 101
+
+
+def test_bucket_blocks_until_reset_once_only_the_reserve_is_left():
+    limiter = GithubRateLimiter(burst=10, reserve=50)
+    limiter.update({"X-RateLimit-Remaining": "50", "X-RateLimit-Reset": str(int(time.time()) + 600)})
+    with pytest.raises(GithubRateLimitedError) as raised:
+        limiter.acquire(max_wait=5)
+    assert raised.value.retry_after > 500
+    status = limiter.status()
+    assert status["remaining"] == 50
+    assert status["rate_per_second"] == 0
+    assert status["blocked_for"] > 500
+
+
+def test_conditional_get_reuses_cached_body_on_304(connector):
+    url = f"{connector.api_base_url}/pulls/1/comments"
+    connector.session = FakeSession([
+        make_response(200, [{"id": 1}], {"ETag": '"abc"'}),
+        make_response(304),
+    ])
+    assert connector._get_json(url) == ([{"id": 1}], None)
+    assert connector._get_json(url) == ([{"id": 1}], None)
+    first, second = connector.session.calls
+    assert "If-None-Match" not in first[2]
+    assert second[2]["If-None-Match"] == '"abc"'
+
+
+def test_paginated_get_follows_next_links_up_to_max_pages(connector):
+    base = f"{connector.api_base_url}/pulls/1/comments"
+    connector.github_config = {**connector.github_config, "max_pages": 2}
+    connector.session = FakeSession([
+        make_response(200, [{"id": 1}], {"Link": f'<{base}?page=2>; rel="next"'}),
+        make_response(200, [{"id": 2}], {"Link": f'<{base}?page=3>; rel="next"'}),
+        make_response(200, [{"id": 3}]),
+    ])
+    assert connector._get_paginated(base) == [{"id": 1}, {"id": 2}]
+    assert [call[1] for call in connector.session.calls] == [f"{base}?per_page=100", f"{base}?page=2"]
+
+
+def test_rate_limited_request_fails_fast_instead_of_outwaiting_max_wait(connector):
+    connector.session = FakeSession([make_response(429, headers={"Retry-After": "60"})])
+    with pytest.raises(GithubRateLimitedError) as raised:
+        connector._request('GET', connector.api_base_url)
+    assert raised.value.retry_after == 60
+    assert len(connector.session.calls) == 1
+    # later requests on the same token don't hit GitHub until the wait is over
+    with pytest.raises(GithubRateLimitedError):
+        connector.rate_limiter.acquire(max_wait=connector.max_wait)
+
+
+def test_get_is_retried_on_server_errors(connector):
+    connector.session = FakeSession([make_response(502), make_response(200, {"ok": True})])
+    response = connector._request('GET', connector.api_base_url)
+    assert response.status_code == 200
+    assert len(connector.session.calls) == 2
+
+
+def test_post_is_not_retried_on_server_errors(connector):
+    connector.session = FakeSession([make_response(502), make_response(200, {"ok": True})])
+    assert connector._request('POST', connector.api_base_url).status_code == 502
+    assert len(connector.session.calls) == 1
+
+
+def test_rate_limit_status_leaves_tokens_out(connector):
+    connector.rate_limiter.update({"X-RateLimit-Remaining": "4000", "X-RateLimit-Reset": str(int(time.time()) + 60)})
+    statuses = rate_limit_status()
+    assert any(status["remaining"] == 4000 for status in statuses)
+    assert connector.github_token not in json.dumps(statuses)
+
+
+def test_webhook_signature():
+    signature = "sha256=" + hmac.new(b"secret", b"{}", hashlib.sha256).hexdigest()
+    assert verify_webhook_signature("secret", b"{}", signature)
+    assert not verify_webhook_signature("secret", b"{}", "sha256=bad")
+    assert not verify_webhook_signature("secret", b"{}", None)
@@ -0,0 +1,117 @@
+import time
+
+import pytest
+
+from src.connectors.llm_cache import LLMResponseCache
+
+
+@pytest.fixture
+def make_cache(tmp_path):
+    caches = []
+
+    def make(**kwargs):
+        cache = LLMResponseCache(str(tmp_path / f"cache-{len(caches)}.sqlite3"), **kwargs)
+        caches.append(cache)
+        return cache
+    yield make
+    for cache in caches:
+        cache._db.close()
+
+
+def test_key_covers_every_sampling_input():
+    key = LLMResponseCache.make_key("model", "prompt", 0, 500)
+    assert key == LLMResponseCache.make_key("model", "prompt", 0, 500)
+    assert key != LLMResponseCache.make_key("model", "prompt", 0.5, 500)
+    assert key != LLMResponseCache.make_key("model", "prompt", 0, 100)
+    assert key != LLMResponseCache.make_key("other", "prompt", 0, 500)
+    assert key != LLMResponseCache.make_key("model", "prompt!", 0, 500)
+
+
+def test_memory_lru_promotes_on_hit(make_cache):
+    cache = make_cache(memory_entries=2)
+    cache.set("a", "A")
+    cache.set("b", "B")
+    assert cache.get("a") == "A"  # a is now the most recently used
+    cache.set("c", "C")
+    assert list(cache._memory) == ["a", "c"]
+    assert cache.stats["memory_hits"] == 1
+
+
+def test_memory_miss_falls_back_to_disk(make_cache):
+    cache = make_cache(memory_entries=1)
+    cache.set("a", "A")
+    cache.set("b", "B")
+    assert "a" not in cache._memory
+    assert cache.get("a") == "A"
+    assert cache.stats["disk_hits"] == 1
+    assert "a" in cache._memory
+
+
+def test_entries_survive_a_new_instance(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    first = LLMResponseCache(path)
+    first.set("a", "A")
+    first._db.close()
+    second = LLMResponseCache(path)
+    assert second.get("a") == "A"
+    second._db.close()
+
+
+def test_ttl_expires_both_tiers(make_cache, monkeypatch):
+    cache = make_cache(ttl_seconds=10)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    cache.set("a", "A")
+    assert cache.get("a") == "A"
+
+    monkeypatch.setattr(time, "time", lambda: now + 11)
+    assert cache.get("a") is None
+    assert "a" not in cache._memory
+    assert cache._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 0
+    assert cache.stats["misses"] == 1
+
+
+def test_disk_evicts_least_recently_used_over_entry_limit(make_cache, monkeypatch):
+    cache = make_cache(memory_entries=1, max_disk_entries=2)
+    clock = iter(range(1000, 2000))
+    monkeypatch.setattr(time, "time", lambda: next(clock))
+    cache.set("a", "A")
+    cache.set("b", "B")
+    assert cache.get("a") == "A"  # read from disk, so b is now least recently used
+    cache.set("c", "C")
+    keys = {row[0] for row in cache._db.execute("SELECT key FROM responses")}
+    assert keys == {"a", "c"}
+    assert cache.stats["evictions"] == 1
+
+
+def test_disk_evicts_over_byte_limit(make_cache):
+    cache = make_cache(max_disk_bytes=10)
+    cache.set("a", "x" * 6)
+    cache.set("b", "y" * 6)
+    keys = {row[0] for row in cache._db.execute("SELECT key FROM responses")}
+    assert keys == {"b"}
+    assert "a" not in cache._memory
+
+
+def test_stats(make_cache):
+    cache = make_cache()
+    assert cache.get_stats()["hit_rate"] == 0.0
+    cache.set("a", "A")
+    cache.get("a")
+    cache.get("missing")
+    cache.record_bypass()
+    stats = cache.get_stats()
+    assert stats["memory_hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["bypassed"] == 1
+    assert stats["memory_entries"] == 1
+    assert stats["disk_entries"] == 1
+    assert stats["hit_rate"] == 0.5
+
+
+def test_clear(make_cache):
+    cache = make_cache()
+    cache.set("a", "A")
+    cache.clear()
+    assert cache.get("a") is None
+    assert cache.get_stats()["disk_entries"] == 0
@@ -0,0 +1,121 @@
+from src.agent.patcher import (
+    EditBlock, apply_block, apply_blocks, closest_region, parse_edit_blocks, splice_region, strip_code_fence,
+)
+
+SOURCE = """import os
+
+
+def load(path):
+    with open(path) as handle:
+        return handle.read()
+
+
+def save(path, text):
+    with open(path, "w") as handle:
+        handle.write(text)
+"""
+
+
+def test_parse_search_replace_blocks_with_and_without_path():
+    response = """Here you go:
+
+src/app.py
+<<<<<<< SEARCH
+def load(path):
+=======
+def load(path, encoding="utf-8"):
+>>>>>>> REPLACE
+
+<<<<<<< SEARCH
+old
+=======
+new
+>>>>>>> REPLACE
+"""
+    blocks = parse_edit_blocks(response, "default.py")
+    assert blocks == [
+        EditBlock("src/app.py", "def load(path):", 'def load(path, encoding="utf-8"):'),
+        EditBlock("src/app.py", "old", "new"),
+    ]
+
+
+def test_parse_without_path_uses_default():
+    blocks = parse_edit_blocks("<<<<<<< SEARCH\na\n=======\nb\n>>>>>>> REPLACE", "main.py")
+    assert blocks == [EditBlock("main.py", "a", "b")]
+
+
+def test_parse_unified_diff_hunks():
+    diff = """--- a/src/app.py
++++ b/src/app.py
+@@ -4,2 +4,2 @@
+ def load(path):
+-    with open(path) as handle:
++    with open(path, encoding="utf-8") as handle:
+"""
+    assert parse_edit_blocks(diff, "other.py") == [EditBlock(
+        "src/app.py",
+        "def load(path):\n    with open(path) as handle:",
+        'def load(path):\n    with open(path, encoding="utf-8") as handle:',
+    )]
+
+
+def test_apply_exact_match():
+    block = EditBlock("app.py", "def load(path):", "def load(path, mode='r'):")
+    patched = apply_block(SOURCE, block, 0.85)
+    assert "def load(path, mode='r'):" in patched
+    assert patched.endswith("\n")
+
+
+def test_apply_ignores_surrounding_whitespace_and_reindents():
+    block = EditBlock(
+        "app.py",
+        "with open(path) as handle:\n    return handle.read()",
+        "with open(path) as handle:\n    return handle.read().strip()",
+    )
+    patched = apply_block(SOURCE, block, 0.85)
+    assert "        return handle.read().strip()\n" in patched
+    assert "    with open(path) as handle:\n" in patched
+
+
+def test_apply_fuzzy_fallback_tolerates_small_differences():
+    block = EditBlock(
+        "app.py",
+        'def save(path, text):\n    with open(path, "w") as handle:\n        handle.write(txt)',
+        'def save(path, text):\n    with open(path, "w") as handle:\n        handle.write(text + "\\n")',
+    )
+    patched = apply_block(SOURCE, block, 0.85)
+    assert 'handle.write(text + "\\n")' in patched
+    assert "handle.write(text)\n" not in patched
+
+
+def test_apply_fuzzy_fallback_respects_threshold():
+    block = EditBlock("app.py", "class Unrelated:\n    pass", "class Other:\n    pass")
+    assert apply_block(SOURCE, block, 0.85) is None
+
+
+def test_empty_search_appends():
+    patched = apply_block("a\n", EditBlock("x.py", "", "b"), 0.85)
+    assert patched == "a\nb\n"
+    assert apply_block("", EditBlock("x.py", "", "new"), 0.85) == "new\n"
+
+
+def test_apply_blocks_collects_failures_and_keeps_going():
+    good = EditBlock("app.py", "import os", "import os\nimport sys")
+    bad = EditBlock("app.py", "nothing like this\nat all", "x")
+    result = apply_blocks(SOURCE, [bad, good])
+    assert result.failed == [bad]
+    assert result.applied == [good]
+    assert "import sys" in result.content
+
+
+def test_closest_region_widens_by_context():
+    start, end = closest_region(SOURCE, "def save(path, txt):", 1)
+    lines = SOURCE.splitlines()
+    assert lines.index("def save(path, text):") in range(start, end)
+    assert end - start == 3
+
+
+def test_splice_region_and_strip_code_fence():
+    assert splice_region("a\nb\nc\n", 1, 2, "x\ny") == "a\nx\ny\nc\n"
+    assert strip_code_fence("```python\nprint(1)\n```") == "print(1)"
+    assert strip_code_fence("print(1)") == "print(1)"
@@ -0,0 +1,54 @@
+from src.agent.plan_parser import extract_file_paths, extract_interfaces, extract_work_items, is_test_path, split_steps
+
+EXTENSIONS = ('.py', '.js', '.ts')
+
+
+def test_paths_need_backticks_or_a_directory():
+    plan = "Build it with Node.js and Express.js. Edit `app.py` and src/routes/users.js, not notes.py."
+    assert extract_file_paths(plan, EXTENSIONS) == ["app.py", "src/routes/users.js"]
+
+
+def test_framework_names_are_not_files_even_in_backticks():
+    assert extract_file_paths("Use `Node.js` with `server.js`", EXTENSIONS) == ["server.js"]
+
+
+def test_paths_are_normalized_and_deduplicated():
+    plan = "Create `./src/app.py`, then update `src/app.py` and ../secret.py and /etc/passwd.py"
+    assert extract_file_paths(plan, EXTENSIONS) == ["src/app.py"]
+
+
+def test_only_configured_extensions():
+    assert extract_file_paths("Edit `src/a.py` and `src/b.rb`", ('.py',)) == ["src/a.py"]
+    assert extract_file_paths("", EXTENSIONS) == []
+
+
+def test_longer_extension_wins():
+    assert extract_file_paths("Edit `src/App.tsx`", ('.ts', '.tsx')) == ["src/App.tsx"]
+
+
+def test_is_test_path():
+    assert is_test_path("tests/test_app.py")
+    assert is_test_path("src/app.test.js")
+    assert is_test_path("test_app.py")
+    assert not is_test_path("src/contest.py")
+
+
+def test_split_steps_keeps_preamble():
+    plan = "Overview\n1. Create `a.py`\n   details\n2. Edit `b.py`"
+    assert split_steps(plan) == ["Overview", "1. Create `a.py`\n   details", "2. Edit `b.py`"]
+
+
+def test_work_items_group_steps_by_file_and_skip_tests():
+    plan = "1. Create `src/app.py`\n2. Add `tests/test_app.py`\n3. Wire `src/app.py` into `src/main.py`"
+    items = extract_work_items(plan, EXTENSIONS)
+    assert [item.path for item in items] == ["src/app.py", "src/main.py"]
+    assert len(items[0].steps) == 2
+    assert items[0].existing is None
+
+    with_tests = extract_work_items(plan, EXTENSIONS, include_tests=True)
+    assert "tests/test_app.py" in [item.path for item in with_tests]
+
+
+def test_extract_interfaces():
+    plan = "1. Add `parse(text) -> dict`\n```python\ndef load(path):\n    pass\nclass Store:\n```"
+    assert extract_interfaces(plan) == ["def load(path):", "class Store:", "parse(text) -> dict"]
@@ -0,0 +1,143 @@
+import asyncio
+
+import pytest
+
+from src.agent.scheduler import JobScheduler, JobStatus, QueueFullError
+
+
+@pytest.fixture
+async def scheduler():
+    scheduler = JobScheduler(max_workers=1, max_queue_depth=2, retry_after_seconds=7)
+    scheduler.start()
+    yield scheduler
+    await scheduler.shutdown()
+
+
+def blocker(release: asyncio.Event, started: asyncio.Event = None):
+    async def runner(job):
+        if started is not None:
+            started.set()
+        await release.wait()
+    return runner
+
+
+async def test_lower_priority_number_runs_first(scheduler):
+    release, started, order = asyncio.Event(), asyncio.Event(), []
+
+    def record(name):
+        async def runner(job):
+            order.append(name)
+        return runner
+
+    scheduler.submit(blocker(release, started))
+    await started.wait()
+    scheduler.submit(record("low"), priority=9)
+    scheduler.submit(record("high"), priority=1)
+    release.set()
+    await scheduler._queue.join()
+    assert order == ["high", "low"]
+
+
+async def test_same_priority_is_fifo(scheduler):
+    release, started, order = asyncio.Event(), asyncio.Event(), []
+
+    async def first(job):
+        order.append("first")
+
+    async def second(job):
+        order.append("second")
+
+    scheduler.submit(blocker(release, started))
+    await started.wait()
+    scheduler.submit(first, priority=3)
+    scheduler.submit(second, priority=3)
+    release.set()
+    await scheduler._queue.join()
+    assert order == ["first", "second"]
+
+
+async def test_invalid_priority_is_rejected(scheduler):
+    async def runner(job):
+        pass
+
+    for priority in ("1", 1.5, True):
+        with pytest.raises(ValueError):
+            scheduler.submit(runner, priority=priority)
+    assert scheduler.queue_depth() == 0
+
+
+async def test_cancel_queued_job_never_runs(scheduler):
+    release, started, ran = asyncio.Event(), asyncio.Event(), []
+
+    async def runner(job):
+        ran.append(job.task_id)
+
+    scheduler.submit(blocker(release, started))
+    await started.wait()
+    job = scheduler.submit(runner)
+    assert scheduler.cancel(job.task_id)
+    assert job.status == JobStatus.CANCELLED
+    assert scheduler.queue_depth() == 0
+    release.set()
+    await scheduler._queue.join()
+    assert ran == []
+    assert not scheduler.cancel(job.task_id)
+
+
+async def test_cancel_running_job(scheduler):
+    release, started = asyncio.Event(), asyncio.Event()
+    job = scheduler.submit(blocker(release, started))
+    await started.wait()
+    assert job.status == JobStatus.RUNNING
+    assert scheduler.cancel(job.task_id)
+    await scheduler._queue.join()
+    assert job.status == JobStatus.CANCELLED
+    assert job.finished_at is not None
+
+
+async def test_failed_job_records_error(scheduler):
+    async def runner(job):
+        raise RuntimeError("boom")
+
+    job = scheduler.submit(runner)
+    await scheduler._queue.join()
+    assert job.status == JobStatus.FAILED
+    assert job.error == "boom"
+
+
+async def test_full_queue_raises_with_retry_after(scheduler):
+    release, started = asyncio.Event(), asyncio.Event()
+    scheduler.submit(blocker(release, started))
+    await started.wait()
+    scheduler.submit(blocker(release))
+    scheduler.submit(blocker(release))
+
+    with pytest.raises(QueueFullError) as error:
+        scheduler.submit(blocker(release))
+    assert error.value.retry_after == 7
+    assert scheduler.queue_depth() == 2
+
+    forced = scheduler.submit(blocker(release), force=True)
+    assert forced.status == JobStatus.QUEUED
+    release.set()
+
+
+async def test_retry_after_uses_average_duration(scheduler):
+    scheduler._avg_duration = 10.0
+    release, started = asyncio.Event(), asyncio.Event()
+    scheduler.submit(blocker(release, started))
+    await started.wait()
+    scheduler.submit(blocker(release))
+    scheduler.submit(blocker(release))
+    with pytest.raises(QueueFullError) as error:
+        scheduler.submit(blocker(release))
+    assert error.value.retry_after == 30  # (2 queued + 1) waves of 10s on one worker
+    release.set()
+
+
+def test_submit_requires_start():
+    async def runner(job):
+        pass
+
+    with pytest.raises(RuntimeError):
+        JobScheduler().submit(runner)
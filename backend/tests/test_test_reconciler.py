@@ -0,0 +1,42 @@
+from src.agent.test_reconciler import unresolved_names
+
+CODE = {
+    "src/shop/cart.py": "import math\n\nTAX = 0.2\n\n\nclass Cart:\n    pass\n\n\ndef total(items):\n    return sum(items)\n",
+}
+
+
+def test_resolved_from_import():
+    test = "from src.shop.cart import Cart, total\n\ndef test_total():\n    assert total([1]) == 1\n"
+    assert unresolved_names(test, CODE) == []
+
+
+def test_missing_from_import():
+    test = "from shop.cart import Cart, subtotal\n"
+    assert unresolved_names(test, CODE) == ["shop.cart.subtotal"]
+
+
+def test_module_attribute_access():
+    test = "import src.shop.cart as cart\n\ndef test_it():\n    cart.total([])\n    cart.discount(1)\n"
+    assert unresolved_names(test, CODE) == ["src.shop.cart.discount"]
+
+
+def test_module_imported_from_its_package():
+    test = "from shop import cart\n\ndef test_it():\n    assert cart.TAX\n    cart.refund()\n"
+    assert unresolved_names(test, CODE) == ["shop.cart.refund"]
+
+
+def test_test_that_imports_no_generated_module_is_not_accepted():
+    test = "import math\n\ndef test_nothing():\n    assert math.pi\n"
+    assert unresolved_names(test, CODE) is None
+
+
+def test_unchecked_cases():
+    assert unresolved_names("import cart", {"cart.js": "export {}"}) is None
+    assert unresolved_names("def broken(:", CODE) is None
+    assert unresolved_names("from cart import Cart", {}) is None
+    assert unresolved_names("from cart import Cart", {"cart.py": "class Cart(:"}) is None
+
+
+def test_package_init_is_importable_by_package_name():
+    code = {"src/shop/__init__.py": "from .cart import Cart\n"}
+    assert unresolved_names("from src.shop import Cart, Basket\n", code) == ["src.shop.Basket"]
@@ -0,0 +1,126 @@
+from src.agent import test_runner
+
+JUNIT = """<?xml version="1.0" encoding="utf-8"?>
+<testsuites>
+  <testsuite name="pytest" tests="4">
+    <testcase classname="tests.test_app" name="test_ok" file="tests/test_app.py" line="3" time="0.5"/>
+    <testcase classname="tests.test_app" name="test_bad" file="tests/test_app.py" line="7" time="1.5">
+      <failure message="assert 1 == 2">Traceback
+  line 1
+AssertionError</failure>
+    </testcase>
+    <testcase classname="tests.test_db" name="test_boom" file="tests/test_db.py" time="2">
+      <error message="ConnectionError"/>
+    </testcase>
+    <testcase classname="tests.test_db" name="test_later" file="tests/test_db.py" line="x">
+      <skipped message="todo"/>
+    </testcase>
+  </testsuite>
+</testsuites>
+"""
+
+
+def test_parse_junit_statuses():
+    cases = test_runner.parse_junit_xml(JUNIT)
+    assert [(case.name, case.status) for case in cases] == [
+        ("test_ok", "passed"), ("test_bad", "failed"), ("test_boom", "error"), ("test_later", "skipped"),
+    ]
+    bad = cases[1]
+    assert bad.message == "assert 1 == 2"
+    assert "AssertionError" in bad.details
+    assert bad.line == 7
+    assert bad.node == "tests.test_app.test_bad"
+    assert cases[3].line is None
+
+
+def test_parse_bare_testsuite_and_garbage():
+    bare = '<testsuite><testcase name="test_a" time="0.1"/></testsuite>'
+    assert [case.name for case in test_runner.parse_junit_xml(bare)] == ["test_a"]
+    assert test_runner.parse_junit_xml("not xml") == []
+
+
+def test_report_passed_and_counts():
+    cases = test_runner.parse_junit_xml(JUNIT)
+    report = test_runner.TestReport(cases, exit_code=1)
+    assert not report.passed
+    assert report.counts() == {"passed": 1, "failed": 1, "error": 1, "skipped": 1}
+
+    passing = test_runner.TestReport(cases[:1], exit_code=0)
+    assert passing.passed
+    assert test_runner.TestReport([], exit_code=1, structured=False).passed is False
+
+
+def test_file_durations():
+    durations = test_runner.file_durations(test_runner.parse_junit_xml(JUNIT))
+    assert durations == {"tests/test_app.py": 2.0, "tests/test_db.py": 2.0}
+
+
+def test_failure_comments():
+    report = test_runner.TestReport(test_runner.parse_junit_xml(JUNIT), exit_code=1)
+    comments = test_runner.failure_comments(report, max_failures=1, traceback_lines=2)
+    assert comments[0]["path"] == "tests/test_app.py"
+    assert comments[0]["line"] == 7
+    assert comments[0]["body"].startswith("Test tests.test_app.test_bad failed: assert 1 == 2")
+    assert "(1 lines omitted)" in comments[0]["body"]
+    assert comments[1] == {"body": "1 more failing test(s) not shown."}
+
+    unstructured = test_runner.TestReport([], exit_code=2, output="boom", structured=False)
+    assert test_runner.failure_comments(unstructured, 5, 10) == [{"body": "Tests failed (exit code 2):\nboom"}]
+
+
+def test_shard_balances_longest_first():
+    files = ["a.py", "b.py", "c.py", "d.py"]
+    durations = {"a.py": 10.0, "b.py": 6.0, "c.py": 5.0}  # d.py unknown, counts as 1s
+    shards = test_runner.TestRunner.shard(files, 2, durations)
+    assert shards == [["a.py", "d.py"], ["b.py", "c.py"]]
+    assert sorted(path for shard in shards for path in shard) == files
+
+
+def test_shard_drops_empty_buckets():
+    assert test_runner.TestRunner.shard(["a.py"], 4, {}) == [["a.py"]]
+
+
+class FakeDocker:
+    def __init__(self, results):
+        self.results = results
+        self.commands = []
+
+    async def run_command(self, command, on_output=None):
+        self.commands.append(command)
+        if command == ["nproc"]:
+            return 0, "2\n"
+        return 1, "output"
+
+    async def read_files_from_container(self, paths):
+        return {path: self.results.get(path, "") for path in paths}
+
+
+async def test_run_shards_reads_junit_back():
+    docker = FakeDocker({".momentum-test-results/junit-0.xml": JUNIT})
+    runner = test_runner.TestRunner(
+        docker, {"test_runner": {"command": "pytest --junitxml={junit} {files} {extra}", "line_offset": 1}}, {}
+    )
+    report = await runner.run(["tests/test_app.py", "tests/test_db.py"])
+    assert report.shards == 2
+    assert report.structured
+    assert [case.name for case in report.failures] == ["test_bad", "test_boom"]
+    assert report.failures[0].line == 8
+    script = docker.commands[-1][2]
+    assert "junit-0.xml" in script and "junit-1.xml" in script
+
+
+def test_broken_test_file_detects_collection_errors():
+    junit = """<testsuite>
+      <testcase classname="" name="tests.test_generated" time="0">
+        <error message="collection failure">ImportError while importing test module</error>
+      </testcase>
+    </testsuite>"""
+    report = test_runner.TestReport(test_runner.parse_junit_xml(junit), exit_code=2)
+    assert test_runner.broken_test_file(report, "tests/test_generated.py").message == "collection failure"
+    assert test_runner.broken_test_file(report, "tests/test_other.py") is None
+
+
+def test_broken_test_file_ignores_failing_assertions():
+    report = test_runner.TestReport(test_runner.parse_junit_xml(JUNIT), exit_code=1)
+    assert test_runner.broken_test_file(report, "tests/test_app.py") is None
+    assert test_runner.broken_test_file(report, "tests/test_db.py") is None
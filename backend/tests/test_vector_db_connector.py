@@ -0,0 +1,222 @@
+import os
+import threading
+
+import git
+import pytest
+
+from src.connectors import vector_db_connector
+from src.connectors.vector_db_connector import VectorDBConnector
+
+
+class FakeEmbeddings(list):
+    def tolist(self):
+        return list(self)
+
+
+class FakeModel:
+    def __init__(self):
+        self.encoded = []
+        self.error = None
+
+    def encode(self, documents, batch_size=None, show_progress_bar=None):
+        if self.error is not None:
+            raise self.error
+        self.encoded.extend(documents)
+        return FakeEmbeddings([[float(len(document))] for document in documents])
+
+
+class FakeCollection:
+    """In-memory stand-in for a Chroma collection, for the where filters the connector uses."""
+    def __init__(self):
+        self.entries = {}
+        self.error = None
+
+    @staticmethod
+    def _matches(metadata: dict, where: dict) -> bool:
+        if "$and" in where:
+            return all(FakeCollection._matches(metadata, clause) for clause in where["$and"])
+        for key, condition in where.items():
+            if isinstance(condition, dict):
+                if metadata.get(key) not in condition["$in"]:
+                    return False
+            elif metadata.get(key) != condition:
+                return False
+        return True
+
+    def get(self, where, include):
+        ids = [entry_id for entry_id, (_, metadata) in self.entries.items() if self._matches(metadata, where)]
+        return {"ids": ids, "metadatas": [self.entries[entry_id][1] for entry_id in ids]}
+
+    def upsert(self, ids, documents, metadatas, embeddings):
+        if self.error is not None:
+            raise self.error
+        for entry_id, document, metadata in zip(ids, documents, metadatas):
+            self.entries[entry_id] = (document, metadata)
+
+    def delete(self, ids):
+        for entry_id in ids:
+            self.entries.pop(entry_id, None)
+
+    def paths(self) -> set:
+        return {metadata["path"] for _, metadata in self.entries.values()}
+
+
+class FakeClient:
+    def __init__(self):
+        self.collection = FakeCollection()
+
+    def get_or_create_collection(self, name):
+        return self.collection
+
+
+@pytest.fixture
+def connector(tmp_path, monkeypatch):
+    client, model = FakeClient(), FakeModel()
+    monkeypatch.setattr(vector_db_connector, "get_chroma_client", lambda path: client)
+    monkeypatch.setattr(vector_db_connector, "get_embedding_model", lambda name: model)
+    db_path = tmp_path / "db"
+    db_path.mkdir()
+    connector = VectorDBConnector(db_path=str(db_path))
+    connector.indexing_config = {**connector.indexing_config, "batch_size": 2, "read_workers": 2}
+    return connector
+
+
+@pytest.fixture
+def repo(tmp_path):
+    workspace = tmp_path / "workspace"
+    workspace.mkdir()
+    repo = git.Repo.init(workspace)
+    repo.git.config("user.email", "dev@example.com")
+    repo.git.config("user.name", "dev")
+    write(repo, "app.py", "def main():\n    return 1\n")
+    write(repo, "util.py", "def helper():\n    return 2\n")
+    write(repo, "README.md", "# docs\n")
+    commit(repo)
+    return repo
+
+
+def write(repo, path: str, content: str):
+    target = f"{repo.working_tree_dir}/{path}"
+    with open(target, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def commit(repo, message: str = "change"):
+    repo.git.add("-A")
+    repo.git.commit("-m", message)
+
+
+def writer_threads() -> list:
+    return [thread for thread in threading.enumerate() if thread.name == "vector-db-writer"]
+
+
+def test_blob_sha_matches_git(repo):
+    with open(f"{repo.working_tree_dir}/app.py", "rb") as f:
+        content = f.read()
+    assert VectorDBConnector._blob_sha(content) == repo.git.hash_object("app.py")
+
+
+def test_dirty_paths_cover_edits_untracked_deletes_and_renames(connector, repo):
+    write(repo, "app.py", "def main():\n    return 3\n")
+    write(repo, "new.py", "x = 1\n")
+    repo.git.mv("util.py", "helpers.py")
+    repo.git.rm("README.md")
+    assert connector._dirty_paths(repo) == {"app.py", "new.py", "helpers.py", "README.md"}
+
+
+def test_scan_hashes_what_is_on_disk(connector, repo):
+    indexed_sha = repo.git.rev_parse("HEAD:app.py")
+    write(repo, "app.py", "def main():\n    return 3\n")
+    write(repo, "new.py", "x = 1\n")
+    os.remove(f"{repo.working_tree_dir}/util.py")
+
+    blobs = connector._scan_blobs(repo.working_tree_dir, repo, connector._dirty_paths(repo))
+    assert set(blobs) == {"app.py", "new.py"}  # README.md is an ignored extension, util.py is gone
+    assert blobs["app.py"] != indexed_sha
+    assert blobs["app.py"] == repo.git.hash_object("app.py")
+    assert blobs["new.py"] == repo.git.hash_object("new.py")
+
+
+def test_entries_are_keyed_on_repo_path_and_blob(connector, repo):
+    stats = connector.populate_from_directory(repo.working_tree_dir, repo_key="repo")
+    assert stats["files"] == 2
+    blob = repo.git.rev_parse("HEAD:app.py")
+    entry_ids = set(connector.collection.entries)
+    assert f"repo:app.py@{blob}#0" in entry_ids
+    assert connector.collection.paths() == {"app.py", "util.py"}
+
+    # nothing changed: the head recorded last time short-circuits the scan
+    assert connector.populate_from_directory(repo.working_tree_dir, repo_key="repo") == {"files": 0, "chunks": 0}
+
+
+def test_incremental_index_embeds_changes_and_tombstones_old_blobs(connector, repo):
+    connector.populate_from_directory(repo.working_tree_dir, repo_key="repo")
+    util_ids = {entry_id for entry_id in connector.collection.entries if ":util.py@" in entry_id}
+    connector.model.encoded.clear()
+
+    write(repo, "app.py", "def main():\n    return 3\n")
+    repo.git.rm("README.md", "util.py")
+    write(repo, "new.py", "x = 1\n")
+    commit(repo)
+    stats = connector.populate_from_directory(repo.working_tree_dir, repo_key="repo")
+
+    assert stats["files"] == 2
+    assert connector.collection.paths() == {"app.py", "new.py"}
+    assert not util_ids & set(connector.collection.entries)
+    app_blobs = {metadata["blob"] for _, metadata in connector.collection.entries.values()
+                 if metadata["path"] == "app.py"}
+    assert app_blobs == {repo.git.rev_parse("HEAD:app.py")}
+    assert "return 3" in "".join(connector.model.encoded)
+    assert "helper" not in "".join(connector.model.encoded)
+
+
+def test_uncommitted_edits_are_reindexed_once_reverted(connector, repo):
+    original = repo.git.rev_parse("HEAD:app.py")
+    write(repo, "app.py", "def main():\n    return 3\n")
+    connector.populate_from_directory(repo.working_tree_dir, repo_key="repo")
+    edited = repo.git.hash_object("app.py")
+    assert {meta["blob"] for _, meta in connector.collection.entries.values() if meta["path"] == "app.py"} == {edited}
+
+    # same head, clean tree: the previously dirty path is still checked again
+    repo.git.checkout("--", "app.py")
+    connector.populate_from_directory(repo.working_tree_dir, repo_key="repo")
+    assert {meta["blob"] for _, meta in connector.collection.entries.values() if meta["path"] == "app.py"} == {original}
+
+
+def test_plain_directories_are_indexed_by_content_hash(connector, tmp_path):
+    workspace = tmp_path / "plain"
+    workspace.mkdir()
+    (workspace / "app.py").write_text("def main():\n    return 1\n")
+    connector.populate_from_directory(str(workspace), repo_key="plain")
+    (workspace / "app.py").write_text("def main():\n    return 2\n")
+    stats = connector.populate_from_directory(str(workspace), repo_key="plain")
+    assert stats["files"] == 1
+    blobs = {metadata["blob"] for _, metadata in connector.collection.entries.values()}
+    assert blobs == {VectorDBConnector._blob_sha(b"def main():\n    return 2\n")}
+
+
+def test_writer_error_stops_the_pipeline_and_is_raised(connector, repo):
+    connector.collection.error = RuntimeError("disk full")
+    with pytest.raises(RuntimeError, match="disk full"):
+        connector.populate_from_directory(repo.working_tree_dir, repo_key="repo")
+    assert writer_threads() == []
+    # the head isn't recorded, so the next run tries again
+    connector.collection.error = None
+    assert connector.populate_from_directory(repo.working_tree_dir, repo_key="repo")["files"] == 2
+
+
+def test_encoder_error_shuts_the_writer_down(connector, repo):
+    connector.model.error = ValueError("bad batch")
+    with pytest.raises(ValueError, match="bad batch"):
+        connector.populate_from_directory(repo.working_tree_dir, repo_key="repo")
+    assert writer_threads() == []
+    assert connector.collection.entries == {}
+
+
+def test_reader_error_shuts_the_writer_down(connector, repo, monkeypatch):
+    def broken_chunker(path, *args):
+        raise OSError(f"cannot chunk {path}")
+    monkeypatch.setattr(vector_db_connector, "chunk_code", broken_chunker)
+    with pytest.raises(OSError, match="cannot chunk"):
+        connector.populate_from_directory(repo.working_tree_dir, repo_key="repo")
+    assert writer_threads() == []
@@ -0,0 +1,187 @@
+import json
+import asyncio
+
+import pytest
+
+from src.api.event_log import EventLog
+from src.api.websocket_manager import ClientConnection, WebSocketManager
+
+
+class FakeWebSocket:
+    def __init__(self, blocked: bool = False):
+        self.sent = []
+        self.closed = False
+        self.unblocked = asyncio.Event()
+        if not blocked:
+            self.unblocked.set()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text: str):
+        await self.unblocked.wait()
+        self.sent.append(json.loads(text))
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def event_log(tmp_path):
+    log = EventLog(str(tmp_path / "events"), buffer_size=3)
+    yield log
+    log.close()
+
+
+@pytest.fixture
+async def manager():
+    manager = WebSocketManager(max_queue=8, send_timeout=1)
+    yield manager
+    await manager.close_all()
+
+
+async def drain(*websockets, count: int = None):
+    """Let the writer tasks send what is queued."""
+    for _ in range(100):
+        await asyncio.sleep(0)
+    if count is not None:
+        assert sum(len(ws.sent) for ws in websockets) == count
+
+
+def status(task_id: str, message: str) -> dict:
+    return {"task_id": task_id, "type": "status", "state": "PLANNING", "message": message}
+
+
+def token(task_id: str, message: str, file: str = None) -> dict:
+    message = {"task_id": task_id, "type": "token", "state": "CODE_GENERATION", "message": message}
+    if file:
+        message["file"] = file
+    return message
+
+
+def enqueue(connection: ClientConnection, message: dict):
+    connection.enqueue(message, json.dumps(message))
+
+
+def test_queue_is_bounded_and_drops_the_oldest_status():
+    connection = ClientConnection(FakeWebSocket(), max_queue=3, send_timeout=1)
+    for index in range(5):
+        enqueue(connection, status("run1", str(index)))
+    assert [message["message"] for message, _, _ in connection.queue] == ["2", "3", "4"]
+    assert connection.dropped == 2
+
+
+def test_full_queue_coalesces_tokens_of_the_same_stream():
+    connection = ClientConnection(FakeWebSocket(), max_queue=2, send_timeout=1)
+    enqueue(connection, status("run1", "start"))
+    enqueue(connection, token("run1", "a", "app.py"))
+    enqueue(connection, token("run1", "b", "app.py"))
+    enqueue(connection, token("run1", "c", "app.py"))
+    merged, text, _ = connection.queue[-1]
+    assert merged["message"] == "abc"
+    assert json.loads(text) == merged
+    assert len(connection.queue) == 2
+    assert (connection.coalesced, connection.dropped) == (2, 0)
+
+
+def test_full_queue_drops_tokens_before_status_updates():
+    connection = ClientConnection(FakeWebSocket(), max_queue=3, send_timeout=1)
+    enqueue(connection, status("run1", "start"))
+    enqueue(connection, token("run1", "a", "app.py"))
+    enqueue(connection, status("run1", "middle"))
+    # a token of another file isn't merged into the last message
+    enqueue(connection, token("run1", "b", "util.py"))
+    assert [message["message"] for message, _, _ in connection.queue] == ["start", "middle", "b"]
+    assert connection.dropped == 1
+
+
+def test_replayed_history_is_exempt_from_the_bound():
+    connection = ClientConnection(FakeWebSocket(), max_queue=2, send_timeout=1)
+    history = [status("run1", f"old{index}") for index in range(3)]
+    connection.replay([(message, json.dumps(message)) for message in history])
+    for index in range(3):
+        enqueue(connection, status("run1", f"new{index}"))
+    assert [message["message"] for message, _, _ in connection.queue] == ["old0", "old1", "old2", "new1", "new2"]
+    assert connection.dropped == 1
+
+
+async def test_broadcast_reaches_only_subscribed_clients(manager):
+    everything, run1_only = FakeWebSocket(), FakeWebSocket()
+    await manager.connect(everything)
+    await manager.connect(run1_only, task_ids=["run1"])
+    await manager.broadcast(status("run1", "one"))
+    await manager.broadcast(status("run2", "two"))
+    await drain(everything, run1_only)
+    assert [message["message"] for message in everything.sent] == ["one", "two"]
+    assert [message["message"] for message in run1_only.sent] == ["one"]
+
+
+async def test_subscribe_and_unsubscribe(manager):
+    websocket = FakeWebSocket()
+    await manager.connect(websocket, task_ids=["run1"])
+    await manager.handle_client_message(websocket, json.dumps({"action": "subscribe", "task_ids": ["run2"]}))
+    await manager.handle_client_message(websocket, json.dumps({"action": "unsubscribe", "task_ids": ["run1"]}))
+    await manager.handle_client_message(websocket, "not json")
+    await manager.handle_client_message(websocket, json.dumps(["subscribe"]))
+    for task_id in ("run1", "run2", "run3"):
+        await manager.broadcast(status(task_id, task_id))
+    await drain(websocket)
+    assert [message["message"] for message in websocket.sent] == ["run2"]
+
+
+async def test_connect_with_after_replays_logged_events_before_live_ones(event_log):
+    manager = WebSocketManager(event_log=event_log)
+    for index in range(3):
+        await manager.broadcast(status("run1", f"logged{index}"))
+    await manager.broadcast(token("run1", "not logged"))
+
+    websocket = FakeWebSocket()
+    await manager.connect(websocket, task_ids=["run1"], after=1)
+    await manager.broadcast(status("run1", "live"))
+    await drain(websocket)
+    await manager.close_all()
+    assert [(message.get("seq"), message["message"]) for message in websocket.sent] == [
+        (2, "logged1"), (3, "logged2"), (4, "live")
+    ]
+
+
+async def test_replay_marks_history_older_than_the_buffer(event_log):
+    manager = WebSocketManager(event_log=event_log)
+    for index in range(5):
+        await manager.broadcast(status("run1", f"logged{index}"))
+
+    websocket = FakeWebSocket()
+    await manager.connect(websocket, task_ids=["run1"], after=0)
+    await drain(websocket)
+    await manager.close_all()
+    marker, *replayed = websocket.sent
+    assert marker == {"type": "replay_truncated", "task_id": "run1", "after": 0, "first_seq": 3}
+    assert [message["seq"] for message in replayed] == [3, 4, 5]
+
+
+async def test_subscribe_with_after_replays_that_run(event_log):
+    manager = WebSocketManager(event_log=event_log)
+    await manager.broadcast(status("run2", "earlier"))
+    websocket = FakeWebSocket()
+    await manager.connect(websocket, task_ids=["run1"])
+    await manager.handle_client_message(
+        websocket, json.dumps({"action": "subscribe", "task_ids": ["run2"], "after": 0})
+    )
+    await manager.broadcast(status("run2", "later"))
+    await drain(websocket)
+    await manager.close_all()
+    assert [message["message"] for message in websocket.sent] == ["earlier", "later"]
+
+
+async def test_slow_client_is_dropped_without_holding_up_others(manager):
+    manager.send_timeout = 0.05
+    slow, fast = FakeWebSocket(blocked=True), FakeWebSocket()
+    await manager.connect(slow)
+    await manager.connect(fast)
+    await manager.broadcast(status("run1", "one"))
+    await drain(fast, count=1)
+    await asyncio.sleep(0.1)
+    await drain()
+    assert slow not in manager.active_connections
+    assert slow.closed
+    assert fast in manager.active_connections